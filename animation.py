@@ -0,0 +1,205 @@
+"""
+Frame animation for any number of sprites, updated in one batch.
+
+A Clip is a list of texture pairs (facing right, facing left) and how long
+each one shows, in seconds. When an Animator first sees a clip it lays the
+clip out as a frame table with one entry per TABLE_RATE-th of a second, so
+finding a sprite's frame is a lookup rather than a search.
+
+The Animator keeps every animated sprite's clip, elapsed time and facing in
+NumPy arrays. Each update moves all of them on by delta_time with in-place
+array operations, and only sprites whose frame changed get a new texture.
+The mirrored textures are built once, when the clip is made. Paused sprites,
+e.g. enemies asleep far from the player, keep their frame and cost nothing.
+"""
+import math
+
+import numpy
+
+from constants import *
+
+#frame tables hold this many entries per second of a clip
+TABLE_RATE = TICK_RATE
+
+#slots added whenever an animator fills up
+ANIMATOR_GROWTH = 64
+
+
+class Clip:
+	"""frames of one animation, each a texture pair, with how long each shows"""
+	def __init__(self, frames, frame_times, loop = True):
+		self.frames = [tuple(frame) for frame in frames]
+		self.frame_times = list(frame_times)
+		self.loop = loop
+
+
+class Animator:
+	"""moves the frames of many sprites' clips on together"""
+	def __init__(self, capacity = ANIMATOR_GROWTH):
+		#slot -> sprite, slots are kept packed at the front of the arrays
+		self.sprites = [ ]
+		self.slots = { }
+		self.clips = [ ]
+
+		#every frame of every clip seen so far, the right facing texture of a
+		#pair is at an even id and the left facing one right after it
+		self.textures = [ ]
+		self.table = numpy.zeros(0, dtype = numpy.int64)
+		#clip -> (offset of its frame table, length in table entries)
+		self.layout = { }
+
+		self.elapsed = numpy.zeros(0)
+		self.offset = numpy.zeros(0, dtype = numpy.int64)
+		self.length = numpy.zeros(0)
+		self.loop = numpy.zeros(0, dtype = bool)
+		self.hold = numpy.zeros(0)
+		self.facing = numpy.zeros(0, dtype = numpy.int64)
+		self.shown = numpy.zeros(0, dtype = numpy.int64)
+		#1 for sprites that are playing, 0 for paused ones
+		self.speed = numpy.zeros(0)
+		#scratch space for update, so it never allocates
+		self._step = numpy.zeros(0)
+		self._sample = numpy.zeros(0, dtype = numpy.int64)
+		self._wanted = numpy.zeros(0, dtype = numpy.int64)
+		self._changed = numpy.zeros(0, dtype = bool)
+		self._grow(capacity)
+
+	_ARRAYS = ("elapsed", "offset", "length", "loop", "hold", "facing", "shown", "speed",
+			   "_step", "_sample", "_wanted", "_changed")
+
+	def _grow(self, extra):
+		for name in self._ARRAYS:
+			array = getattr(self, name)
+			setattr(self, name, numpy.concatenate((array, numpy.zeros(extra, dtype = array.dtype))))
+
+	def __len__(self):
+		return len(self.sprites)
+
+	def __contains__(self, sprite):
+		return sprite in self.slots
+
+	def _lay_out(self, clip):
+		"""adds a clip's frames and frame table the first time it is played"""
+		if clip in self.layout:
+			return self.layout[clip]
+		first_texture = len(self.textures)
+		for right, left in clip.frames:
+			self.textures.extend((right, left))
+
+		table = [ ]
+		end = 0.0
+		for frame, frame_time in enumerate(clip.frame_times):
+			end += frame_time * TABLE_RATE
+			table.extend([first_texture + 2 * frame] * (max(1, round(end)) - len(table)))
+		layout = self.layout[clip] = (len(self.table), len(table))
+		self.table = numpy.concatenate((self.table, numpy.array(table, dtype = numpy.int64)))
+		return layout
+
+	def _start(self, slot, clip, elapsed):
+		offset, length = self._lay_out(clip)
+		self.clips[slot] = clip
+		self.offset[slot] = offset
+		self.length[slot] = length
+		self.loop[slot] = clip.loop
+		#clips that don't loop stop on their last frame
+		self.hold[slot] = math.inf if clip.loop else length - 1
+		self.elapsed[slot] = elapsed * TABLE_RATE
+
+	def add(self, sprite, clip, facing = RIGHT_FACING, elapsed = 0.0):
+		"""starts animating a sprite, elapsed is how many seconds into the clip it starts"""
+		if sprite in self.slots:
+			self.remove(sprite)
+		slot = len(self.sprites)
+		if slot == len(self.elapsed):
+			self._grow(ANIMATOR_GROWTH)
+		self.sprites.append(sprite)
+		self.clips.append(None)
+		self.slots[sprite] = slot
+		self._start(slot, clip, elapsed)
+		self.facing[slot] = facing
+		self.shown[slot] = -1
+		self.speed[slot] = 1.0
+
+	def add_list(self, sprite_list, clip, stagger = 0.0):
+		"""animates every sprite of a list with one clip, each stagger seconds behind the last"""
+		for i, sprite in enumerate(sprite_list):
+			self.add(sprite, clip, elapsed = i * stagger)
+
+	def remove(self, sprite):
+		"""stops animating a sprite, safe to call for sprites that were never added"""
+		slot = self.slots.pop(sprite, None)
+		if slot is None:
+			return
+		#the last slot moves into the gap
+		last = len(self.sprites) - 1
+		if slot != last:
+			moved = self.sprites[last]
+			self.sprites[slot] = moved
+			self.clips[slot] = self.clips[last]
+			self.slots[moved] = slot
+			for name in self._ARRAYS:
+				array = getattr(self, name)
+				array[slot] = array[last]
+		self.sprites.pop()
+		self.clips.pop()
+
+	def play(self, sprite, clip, restart = False):
+		"""switches a sprite to a clip, from the start unless it is playing it already"""
+		slot = self.slots[sprite]
+		if restart or self.clips[slot] is not clip:
+			self._start(slot, clip, 0.0)
+
+	def face(self, sprite, facing):
+		self.facing[self.slots[sprite]] = facing
+
+	def pause(self, sprite, paused = True):
+		"""stops a sprite's clip where it is, or starts it again"""
+		self.speed[self.slots[sprite]] = 0.0 if paused else 1.0
+
+	def update(self, delta_time):
+		"""moves every clip on by delta_time, and changes the textures that need it"""
+		count = len(self.sprites)
+		if not count:
+			return
+		elapsed = self.elapsed[:count]
+		step = self._step[:count]
+		sample = self._sample[:count]
+		wanted = self._wanted[:count]
+		changed = self._changed[:count]
+		shown = self.shown[:count]
+
+		numpy.multiply(self.speed[:count], delta_time * TABLE_RATE, out = step)
+		elapsed += step
+		numpy.fmod(elapsed, self.length[:count], out = elapsed, where = self.loop[:count])
+		numpy.minimum(elapsed, self.hold[:count], out = elapsed)
+		#whole entries first, adding the offset as floats can round up past the clip's end
+		numpy.copyto(sample, elapsed, casting = "unsafe")
+		sample += self.offset[:count]
+		numpy.take(self.table, sample, out = wanted)
+		wanted += self.facing[:count]
+		numpy.not_equal(wanted, shown, out = changed)
+		if changed.any():
+			for slot in numpy.flatnonzero(changed):
+				self.sprites[slot].texture = self.textures[wanted[slot]]
+			shown[changed] = wanted[changed]
+
+	def snapshot(self):
+		"""everything update changes, for restore"""
+		count = len(self.sprites)
+		return (list(self.sprites), list(self.clips),
+				{name: getattr(self, name)[:count].copy() for name in self._ARRAYS})
+
+	def restore(self, state):
+		"""puts every sprite back on the clip and frame it had in a snapshot"""
+		sprites, clips, arrays = state
+		count = len(sprites)
+		while len(self.elapsed) < count:
+			self._grow(ANIMATOR_GROWTH)
+		self.sprites = list(sprites)
+		self.clips = list(clips)
+		self.slots = {sprite: slot for slot, sprite in enumerate(sprites)}
+		for name, values in arrays.items():
+			getattr(self, name)[:count] = values
+		for slot, sprite in enumerate(sprites):
+			if self.shown[slot] >= 0:
+				sprite.texture = self.textures[self.shown[slot]]
@@ -0,0 +1,191 @@
+"""
+Texture registry backed by the Kenney spritesheets in art/Spritesheet.
+
+	python atlas.py
+
+Every sprite under art/PNG also ships packed into one of the spritesheets,
+with an XML file giving where each one sits. Textures asked for by their
+loose file name are cut out of the sheet instead, so each sheet is decoded
+once however many textures come from it. Files the sheets don't have, like
+the lasers, are still loaded from disk as before.
+
+arcade 2.4 textures can't flip their texture coordinates, so flipped variants
+are made by transposing the already cut out image rather than decoding the
+file a second time. Sheets can be decoded ahead of time from worker threads,
+see loader.py. Running the module checks every loose PNG against what
+the sheets would hand out for it.
+"""
+import glob
+import os
+import threading
+import xml.etree.ElementTree as ElementTree
+
+import arcade
+import PIL.Image
+
+SPRITESHEET_FOLDER = "art/Spritesheet"
+
+#spritesheet_complete repeats every other sheet in one huge image, so it is
+#only used for sprites none of the smaller sheets have
+COMPLETE_SHEET = "spritesheet_complete.xml"
+
+#the loose grey player walk frames were renumbered from 0, with the last one
+#repeating the fourth, so they point at differently named frames in the sheet
+ALIASES = {
+	"playerGrey_walk0.png": "playerGrey_walk1.png",
+	"playerGrey_walk1.png": "playerGrey_walk2.png",
+	"playerGrey_walk2.png": "playerGrey_walk3.png",
+	"playerGrey_walk3.png": "playerGrey_walk4.png",
+	"playerGrey_walk4.png": "playerGrey_walk5.png",
+	"playerGrey_walk5.png": "playerGrey_walk4.png"
+}
+
+#loose files whose sheet version is drawn differently, these stay on disk
+EXCLUDED = {"plantStem_vertical.png"}
+
+
+class TextureRegistry:
+	"""hands out textures cut from the spritesheets, decoding each sheet once"""
+	def __init__(self, folder = SPRITESHEET_FOLDER):
+		#sub texture name -> (sheet image file, x, y, width, height)
+		self.subtextures = { }
+		xml_files = sorted(glob.glob(os.path.join(folder, "*.xml")),
+						   key = lambda name: os.path.basename(name) == COMPLETE_SHEET)
+		for xml_file in xml_files:
+			image_file = os.path.splitext(xml_file)[0] + ".png"
+			for element in ElementTree.parse(xml_file).getroot().iter("SubTexture"):
+				name = element.get("name")
+				if name not in self.subtextures:
+					self.subtextures[name] = (image_file,
+											  int(element.get("x")), int(element.get("y")),
+											  int(element.get("width")), int(element.get("height")))
+
+		#decoded sheet images and textures handed out so far
+		self.sheets = { }
+		self.textures = { }
+
+		#one lock per sheet, so two threads never decode the same sheet
+		self._lock = threading.Lock()
+		self._sheet_locks = { }
+
+		#keeps track of where textures came from
+		self.sheet_hits = 0
+		self.file_loads = 0
+
+	def find(self, file_name):
+		"""where a loose file sits in the sheets, or None if it isn't in one"""
+		name = os.path.basename(file_name)
+		if name in EXCLUDED:
+			return None
+		return self.subtextures.get(ALIASES.get(name, name))
+
+	def sheet_files(self):
+		"""the sheet images textures can come from, leaving out the complete sheet"""
+		files = {entry[0] for entry in self.subtextures.values()}
+		return sorted(name for name in files
+					  if os.path.basename(name) != os.path.splitext(COMPLETE_SHEET)[0] + ".png")
+
+	def sheet(self, image_file):
+		"""the decoded image of a sheet, safe to call from any thread"""
+		image = self.sheets.get(image_file)
+		if image is None:
+			with self._lock:
+				lock = self._sheet_locks.setdefault(image_file, threading.Lock())
+			with lock:
+				image = self.sheets.get(image_file)
+				if image is None:
+					image = PIL.Image.open(image_file).convert("RGBA")
+					self.sheets[image_file] = image
+		return image
+
+	def load_texture(self, file_name, flipped_horizontally = False, flipped_vertically = False,
+					 flipped_diagonally = False):
+		"""the texture for a loose image file, taken from a sheet when possible"""
+		key = (file_name, flipped_horizontally, flipped_vertically, flipped_diagonally)
+		texture = self.textures.get(key)
+		if texture is not None:
+			return texture
+
+		entry = self.find(file_name)
+		if entry is None:
+			self.file_loads += 1
+			texture = arcade.load_texture(file_name,
+										  flipped_horizontally = flipped_horizontally,
+										  flipped_vertically = flipped_vertically,
+										  flipped_diagonally = flipped_diagonally)
+		elif flipped_horizontally or flipped_vertically or flipped_diagonally:
+			#flip the unflipped texture's pixels instead of cutting them out again
+			image = self.load_texture(file_name).image
+			if flipped_diagonally:
+				image = image.transpose(PIL.Image.TRANSPOSE)
+			if flipped_horizontally:
+				image = image.transpose(PIL.Image.FLIP_LEFT_RIGHT)
+			if flipped_vertically:
+				image = image.transpose(PIL.Image.FLIP_TOP_BOTTOM)
+			texture = arcade.Texture(f"{entry[0]}:{entry[1]}:{entry[2]}:"
+									 f"{int(flipped_horizontally)}{int(flipped_vertically)}"
+									 f"{int(flipped_diagonally)}", image)
+		else:
+			self.sheet_hits += 1
+			image_file, x, y, width, height = entry
+			image = self.sheet(image_file).crop((x, y, x + width, y + height))
+			texture = arcade.Texture(f"{image_file}:{x}:{y}:000", image)
+
+		self.textures[key] = texture
+		return texture
+
+	def stats(self):
+		return {
+			"sheets decoded": len(self.sheets),
+			"textures": len(self.textures),
+			"from sheets": self.sheet_hits,
+			"from files": self.file_loads
+		}
+
+
+_registry = None
+
+def registry():
+	"""the shared registry, the XML is only read the first time it is needed"""
+	global _registry
+	if _registry is None:
+		_registry = TextureRegistry()
+	return _registry
+
+def load_texture(file_name, flipped_horizontally = False, flipped_vertically = False,
+				 flipped_diagonally = False):
+	"""drop in for arcade.load_texture on whole image files"""
+	return registry().load_texture(file_name, flipped_horizontally, flipped_vertically,
+								   flipped_diagonally)
+
+def load_texture_pair(file_name):
+	"""a texture facing right and its mirror image facing left"""
+	return [
+		load_texture(file_name),
+		load_texture(file_name, flipped_horizontally = True)
+	]
+
+
+def main():
+	"""checks that every loose PNG the sheets claim to have matches them"""
+	import PIL.ImageChops
+
+	textures = registry()
+	matched = 0
+	for file_name in sorted(glob.glob("art/PNG/**/*.png", recursive = True)):
+		entry = textures.find(file_name)
+		if entry is None:
+			print(f"not in a sheet: {file_name}")
+			continue
+		image_file, x, y, width, height = entry
+		loose = PIL.Image.open(file_name).convert("RGBA")
+		cut = textures.sheet(image_file).crop((x, y, x + width, y + height))
+		if loose.size != cut.size or PIL.ImageChops.difference(loose, cut).getbbox():
+			print(f"DIFFERENT in {os.path.basename(image_file)}: {file_name}")
+		else:
+			matched += 1
+	print(f"{matched} loose images match their sheet")
+
+
+if __name__ == "__main__":
+	main()
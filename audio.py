@@ -0,0 +1,143 @@
+"""
+Sound effects and music for the game views.
+
+Every effect is decoded once into a cache shared by all game views, the
+loader decodes them in the background along with the level. Effects play on
+a fixed set of voices. When they are all busy, a new sound takes over the
+voice of the lowest priority sound that is no more important than it,
+oldest first, or is dropped if there is none. Music is streamed from disk
+instead of being decoded whole, and keeps playing across restarts.
+
+Without a working sound device everything here quietly does nothing.
+"""
+import threading
+
+import arcade
+import arcade.sound
+
+from constants import *
+
+#effects by name, with their file and priority
+SOUNDS = {
+	"jump": (":resources:sounds/jump1.wav", 1)
+}
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def _audiolib():
+	#arcade sets this up on import, it stays None if there's no sound device
+	return arcade.sound._audiolib
+
+
+class AudioManager:
+	"""decoded effects, the voices they play on and the music stream"""
+	def __init__(self, voices = AUDIO_VOICES):
+		#name -> arcade.Sound
+		self.sounds = { }
+		self._lock = threading.Lock()
+
+		#one entry per voice, built up front so playing never allocates
+		self.handles = [None] * voices
+		self.priorities = [0] * voices
+		self.started = [0] * voices
+		self.plays = 0
+
+		#keeps track of how the voices are coping
+		self.stolen = 0
+		self.dropped = 0
+
+		self.music = None
+		self.music_file = None
+		self.music_handle = None
+
+	def load(self, name):
+		"""decodes an effect once, safe to call from the loader's threads"""
+		with self._lock:
+			sound = self.sounds.get(name)
+			if sound is None:
+				file_name, priority = SOUNDS[name]
+				sound = self.sounds[name] = arcade.Sound(file_name)
+			return sound
+
+	def _voice(self, priority):
+		"""a free voice, or the one to steal, None if every voice is more important"""
+		audiolib = _audiolib()
+		victim = None
+		for voice, handle in enumerate(self.handles):
+			if handle is None or not audiolib.is_valid_voice_handle(handle):
+				return voice
+			if self.priorities[voice] > priority:
+				continue
+			if (victim is None or self.priorities[voice] < self.priorities[victim] or
+					(self.priorities[voice] == self.priorities[victim] and
+					 self.started[voice] < self.started[victim])):
+				victim = voice
+		if victim is not None:
+			audiolib.stop(self.handles[victim])
+			self.stolen += 1
+		return victim
+
+	def play(self, name, volume = 1.0, pan = 0.0):
+		"""plays an effect on a free or stolen voice"""
+		sound = self.sounds.get(name) or self.load(name)
+		audiolib = _audiolib()
+		if not audiolib:
+			return
+		priority = SOUNDS[name][1]
+		voice = self._voice(priority)
+		if voice is None:
+			self.dropped += 1
+			return
+		self.plays += 1
+		self.handles[voice] = audiolib.play(sound.wav_file, aVolume = volume, aPan = pan,
+											aPaused = 0, aBus = 0)
+		self.priorities[voice] = priority
+		self.started[voice] = self.plays
+
+	def play_music(self, file_name = MUSIC_FILE, volume = MUSIC_VOLUME):
+		"""streams a looping track, carries on if it is already playing"""
+		audiolib = _audiolib()
+		if not audiolib:
+			return
+		if (file_name == self.music_file and self.music_handle is not None and
+				audiolib.is_valid_voice_handle(self.music_handle)):
+			return
+		self.stop_music()
+		self.music = arcade.Sound(file_name, streaming = True)
+		self.music_file = file_name
+		self.music_handle = audiolib.play(self.music.wav_file, aVolume = volume, aPan = 0.0,
+										  aPaused = 0, aBus = 0)
+		audiolib.set_looping(self.music_handle, 1)
+		#never let effects push the music out when the device runs short of voices
+		audiolib.set_protect_voice(self.music_handle, 1)
+
+	def stop_music(self):
+		audiolib = _audiolib()
+		if audiolib and self.music_handle is not None:
+			audiolib.stop(self.music_handle)
+		self.music = None
+		self.music_file = None
+		self.music_handle = None
+
+	def stats(self):
+		"""how many effects played, were stolen from or dropped, and how many are playing"""
+		audiolib = _audiolib()
+		return {
+			"plays": self.plays,
+			"stolen": self.stolen,
+			"dropped": self.dropped,
+			"playing": sum(1 for handle in self.handles
+						   if handle is not None and audiolib and audiolib.is_valid_voice_handle(handle)),
+			"decoded": len(self.sounds)
+		}
+
+
+def manager():
+	"""the audio manager shared by every view"""
+	global _manager
+	with _manager_lock:
+		if _manager is None:
+			_manager = AudioManager()
+		return _manager
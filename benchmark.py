@@ -0,0 +1,316 @@
+"""
+Times the per-frame update, and optionally draw, of every shipped map.
+
+	python benchmark.py
+	python benchmark.py --maps map/world_map.tmx --scenarios running laser_fire
+	python benchmark.py --output after.json --compare before.json
+	python benchmark.py --draw
+
+Each map is run through a set of scripted scenarios (see SCENARIOS) on a fixed
+1/60 timestep. For every scenario the frame time percentiles, the time spent
+in each phase of GameWorld.step and the memory allocated per frame are
+reported and saved as JSON, so two runs can be compared to see whether a
+change made the game faster or slower.
+
+Without --draw no window is opened and GameWorld.step is driven directly,
+which is what GameView.on_update does. With --draw a hidden window is opened
+and GameView.on_update and on_draw are timed instead.
+"""
+import pyglet
+
+#no window is needed unless drawing is benchmarked, so don't let pyglet
+#create a hidden one on import
+pyglet.options['shadow_window'] = False
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import time
+import tracemalloc
+
+import arcade
+
+import instrumentation
+import world
+from constants import *
+
+MAPS = ["map/map.tmx", "map/world_map.tmx", "map/map_overworld.tmx"]
+
+#one simulated frame, the rules assume 60 updates a second
+FRAME_TIME = 1/60
+
+#frames stepped before timing starts, so caches and pools have settled
+WARMUP_FRAMES = 60
+
+#extra enemies added by the mass spawn scenario
+SPAWN_ENEMIES = 200
+SPAWN_PROJECTILE_ENEMIES = 40
+
+
+#----SCENARIOS----#
+#each scenario has a prepare function run once on a freshly set up world and
+#an input function returning the input bitmask for a frame, a prepare
+#function returns False when the scenario can't be played on the map
+
+def _no_prepare(game):
+	pass
+
+def _idle_inputs(game, frame):
+	return 0
+
+def _running_inputs(game, frame):
+	#runs right and hops every so often to get over obstacles
+	if frame % 40 < 10:
+		return INPUT_RIGHT | INPUT_UP
+	return INPUT_RIGHT
+
+def _put_in_water(game):
+	#the bottom of the deepest water, maps without any can't be swum in
+	water = game.terrain.deepest(TERRAIN_WATER, avoid = TERRAIN_SOLID)
+	if water is None:
+		return False
+	game.player_sprite.center_x, game.player_sprite.center_y = water
+	game.player_sprite.change_y = 0
+
+def _swimming_inputs(game, frame):
+	#dying sends the player back to the start, so put them back in the water
+	if not game.in_fluid and frame % 30 == 0:
+		_put_in_water(game)
+	state = INPUT_RIGHT if frame % 240 < 120 else INPUT_LEFT
+	if frame % 20 < 5:
+		state |= INPUT_UP
+	return state
+
+def _arm_player(game):
+	#every shot costs an ability point
+	game.ability_count = 10 ** 6
+
+def _laser_fire_inputs(game, frame):
+	#holding shoot fires a laser every frame, turning round now and then
+	direction = INPUT_RIGHT if frame % 120 < 60 else INPUT_LEFT
+	return direction | INPUT_SHOOT
+
+def _spawn_enemies(game):
+	"""fills the level with copies of its enemies, spread out at random"""
+	#a level without enemies has nothing to copy
+	if not len(game.enemy_list) and not len(game.projectile_enemy_list):
+		return False
+	generator = random.Random(0)
+	width = max(game.view_left + SCREEN_WIDTH,
+				max((sprite.right for sprite in game.wall_list), default = SCREEN_WIDTH))
+	for sprite_list, shoots, count in ((game.enemy_list, False, SPAWN_ENEMIES),
+									   (game.projectile_enemy_list, True, SPAWN_PROJECTILE_ENEMIES)):
+		if not len(sprite_list):
+			continue
+		texture = sprite_list[0].texture
+		for i in range(count):
+			enemy = arcade.Sprite(scale = TILE_SCALING)
+			enemy.texture = texture
+			enemy.center_x = generator.uniform(0, width)
+			enemy.center_y = generator.uniform(2 * GRID_SIZE, game.map_height)
+			game.add_enemy(enemy, shoots)
+
+SCENARIOS = {
+	"idle": (_no_prepare, _idle_inputs),
+	"running": (_no_prepare, _running_inputs),
+	"swimming": (_put_in_water, _swimming_inputs),
+	"laser_fire": (_arm_player, _laser_fire_inputs),
+	"mass_spawn": (_spawn_enemies, _running_inputs)
+}
+
+
+#----MEASURING----#
+
+def percentile(ordered, fraction):
+	"""nearest rank percentile of an already sorted list"""
+	if not ordered:
+		return 0.0
+	index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+	return ordered[index]
+
+
+class Runner:
+	"""steps a world, or a game view when drawing, one frame at a time"""
+	def __init__(self, map_name, draw = False):
+		if draw:
+			import main
+			self.view = main.GameView(map_name)
+			self.view.setup()
+			self.game = self.view.world
+		else:
+			self.view = None
+			self.game = world.GameWorld(map_name)
+			self.game.setup()
+
+	def frame(self, state, timings = None):
+		game = self.game
+		if state != game.input_state:
+			game.apply_input(state)
+		if self.view:
+			self.view.on_update(FRAME_TIME)
+			start = time.perf_counter()
+			self.view.on_draw()
+			if timings is not None:
+				timings["draw"] = timings.get("draw", 0.0) + time.perf_counter() - start
+		else:
+			game.step(FRAME_TIME)
+			game.take_events()
+
+
+def run_scenario(map_name, scenario, frames, alloc_frames, draw = False):
+	"""runs one scenario on a fresh level and returns its measurements, None if it can't be played there"""
+	prepare, inputs = SCENARIOS[scenario]
+	runner = Runner(map_name, draw)
+	game = runner.game
+	if prepare(game) is False:
+		return None
+
+	for frame in range(WARMUP_FRAMES):
+		runner.frame(inputs(game, frame))
+
+	#time whole frames and the sections inside them
+	sections = instrumentation.PhaseTimer()
+	for name, method in instrumentation.WORLD_PHASES:
+		sections.wrap(game, method, name)
+	draw_time = { }
+	frame_times = [ ]
+	checks = 0
+	for frame in range(WARMUP_FRAMES, WARMUP_FRAMES + frames):
+		state = inputs(game, frame)
+		start = time.perf_counter()
+		runner.frame(state, draw_time)
+		frame_times.append(time.perf_counter() - start)
+		checks += game.collision_checks
+	section_totals = sections.take()
+	sections.restore()
+
+	#then measure allocations separately, tracing slows everything down
+	allocated = [ ]
+	retained = [ ]
+	tracemalloc.start()
+	for frame in range(WARMUP_FRAMES + frames, WARMUP_FRAMES + frames + alloc_frames):
+		state = inputs(game, frame)
+		tracemalloc.reset_peak()
+		before = tracemalloc.get_traced_memory()[0]
+		runner.frame(state)
+		current, peak = tracemalloc.get_traced_memory()
+		allocated.append(peak - before)
+		retained.append(current - before)
+	tracemalloc.stop()
+
+	ordered = sorted(frame_times)
+	section_ms = {name: total / frames * 1000 for name, total in section_totals.items()}
+	for name, total in draw_time.items():
+		section_ms[name] = total / frames * 1000
+
+	return {
+		"frames": frames,
+		"frame_ms": {
+			"mean": sum(frame_times) / frames * 1000,
+			"p50": percentile(ordered, 0.5) * 1000,
+			"p90": percentile(ordered, 0.9) * 1000,
+			"p99": percentile(ordered, 0.99) * 1000,
+			"max": ordered[-1] * 1000
+		},
+		"section_ms": section_ms,
+		"alloc_bytes_per_frame": {
+			"mean": sum(allocated) / max(1, len(allocated)),
+			"max": max(allocated, default = 0),
+			"retained_mean": sum(retained) / max(1, len(retained))
+		},
+		"collision_checks_per_frame": checks / frames,
+		"sprites": {
+			"enemies": len(game.enemy_list),
+			"projectile_enemies": len(game.projectile_enemy_list),
+			"lasers": len(game.bullet_pool.active) + len(game.enemy_laser_pool.active),
+			"walls": len(game.wall_list)
+		}
+	}
+
+
+#----REPORTING----#
+
+def print_result(map_name, scenario, result):
+	frame_ms = result["frame_ms"]
+	sections = ", ".join(f"{name} {ms:.3f}" for name, ms in result["section_ms"].items())
+	print(f"{map_name} {scenario}: mean {frame_ms['mean']:.3f}ms, p50 {frame_ms['p50']:.3f}ms, "
+		  f"p90 {frame_ms['p90']:.3f}ms, p99 {frame_ms['p99']:.3f}ms, max {frame_ms['max']:.3f}ms")
+	print(f"	sections (ms): {sections}")
+	print(f"	allocated {result['alloc_bytes_per_frame']['mean']:.0f} bytes/frame, "
+		  f"{result['collision_checks_per_frame']:.1f} collision checks/frame")
+
+def compare(results, baseline):
+	"""prints how each shared map and scenario changed against a baseline run"""
+	print("")
+	print(f"compared with {baseline['meta'].get('created', 'baseline')}:")
+	for map_name, scenarios in results["results"].items():
+		for scenario, result in scenarios.items():
+			old = baseline["results"].get(map_name, { }).get(scenario)
+			if not old:
+				continue
+			changes = [ ]
+			for key in ("mean", "p50", "p99"):
+				before = old["frame_ms"][key]
+				after = result["frame_ms"][key]
+				change = (after - before) / before * 100 if before else 0.0
+				changes.append(f"{key} {before:.3f} -> {after:.3f}ms ({change:+.1f}%)")
+			print(f"{map_name} {scenario}: " + ", ".join(changes))
+
+
+def main():
+	parser = argparse.ArgumentParser(description = "benchmark the per-frame update of every map")
+	parser.add_argument("--maps", nargs = "+", default = MAPS)
+	parser.add_argument("--scenarios", nargs = "+", default = list(SCENARIOS), choices = list(SCENARIOS))
+	parser.add_argument("--frames", type = int, default = 600, help = "timed frames per scenario")
+	parser.add_argument("--alloc-frames", type = int, default = 60,
+						help = "frames traced for allocations after the timed ones")
+	parser.add_argument("--draw", action = "store_true", help = "open a hidden window and time drawing too")
+	parser.add_argument("--output", default = None, help = "where to save the JSON results")
+	parser.add_argument("--compare", default = None, help = "JSON results of an earlier run")
+	args = parser.parse_args()
+
+	if args.draw:
+		window = arcade.Window(SCREEN_WIDTH, SCREEN_HEIGHT)
+		window.set_visible(False)
+
+	results = {
+		"meta": {
+			"created": time.strftime("%Y-%m-%d %H:%M:%S"),
+			"python": platform.python_version(),
+			"arcade": arcade.version.VERSION,
+			"platform": platform.platform(),
+			"frames": args.frames,
+			"draw": args.draw
+		},
+		"results": { }
+	}
+
+	for map_name in args.maps:
+		for scenario in args.scenarios:
+			#the game prints as it goes, which would bury the report
+			with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+				result = run_scenario(map_name, scenario, args.frames, args.alloc_frames, args.draw)
+			if result is None:
+				print(f"{map_name} {scenario}: skipped, it can't be played on this map")
+				continue
+			results["results"].setdefault(map_name, { })[scenario] = result
+			print_result(map_name, scenario, result)
+
+	output = args.output
+	if output is None:
+		os.makedirs("benchmarks", exist_ok = True)
+		output = time.strftime("benchmarks/%Y%m%d_%H%M%S.json")
+	with open(output, "w") as file:
+		json.dump(results, file, indent = 2)
+	print(f"results saved to {output}")
+
+	if args.compare:
+		with open(args.compare) as file:
+			compare(results, json.load(file))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,185 @@
+"""
+Streams the tile layers of large levels in fixed-size chunks.
+
+Only the chunks around the viewport are turned into sprites. Chunks the
+player has left behind are evicted least recently used first, and the next
+chunks in the player's direction of travel are loaded a little at a time
+before they come on screen.
+
+Each loaded chunk also bakes its tiles into static sprite lists, one per
+layer, so streamed layers are drawn a chunk at a time without re-uploading.
+"""
+import math
+from collections import OrderedDict
+
+import arcade
+
+#width and height of a chunk in tiles
+CHUNK_SIZE = 8
+
+#extra rings of chunks kept loaded around the screen
+CHUNK_MARGIN = 1
+
+#how many chunks ahead of the player to prefetch, and how many of those may
+#be built in a single frame
+PREFETCH_CHUNKS = 1
+PREFETCH_PER_FRAME = 1
+
+
+class ChunkStreamer:
+	"""keeps the chunks near the viewport of a compiled level loaded"""
+	def __init__(self, level, layers, screen_width, screen_height,
+				 scaling = 1, chunk_size = CHUNK_SIZE):
+		"""
+		layers maps a layer name in the level to the sprite lists that layer's
+		sprites should be added to, for example the walls go into both the
+		drawn wall list and the physics engine's platform list
+		"""
+		self.level = level
+		self.layers = layers
+		self.scaling = scaling
+		self.chunk_size = chunk_size
+		self.chunk_width = chunk_size * level.tile_width * scaling
+		self.chunk_height = chunk_size * level.tile_height * scaling
+
+		#how many chunks the screen covers, plus the margin and prefetch rows,
+		#this is the most chunks that are ever kept loaded
+		columns = math.ceil(screen_width / self.chunk_width) + 1
+		rows = math.ceil(screen_height / self.chunk_height) + 1
+		self.screen_width = screen_width
+		self.screen_height = screen_height
+		self.capacity = ((columns + 2 * CHUNK_MARGIN + PREFETCH_CHUNKS) *
+						 (rows + 2 * CHUNK_MARGIN + PREFETCH_CHUNKS))
+
+		#tile indices of every chunk, split by layer, worked out once
+		self.chunk_tiles = { }
+		for layer_name in layers:
+			first, count = level.layer_range(layer_name)
+			for index in range(first, first + count):
+				key = (level.columns[index] // chunk_size, level.rows[index] // chunk_size)
+				self.chunk_tiles.setdefault(key, { }).setdefault(layer_name, [ ]).append(index)
+
+		#loaded chunks, oldest first, each holding the sprites it created and
+		#its static draw batches by layer
+		self.loaded = OrderedDict()
+		self.prefetch_queue = [ ]
+		self._last_request = None
+
+		#keeps track of how much streaming is going on
+		self.loads = 0
+		self.evictions = 0
+
+	def _chunk_range(self, view_left, view_bottom):
+		"""chunk columns and rows covered by the screen and its margin"""
+		left = int(view_left // self.chunk_width) - CHUNK_MARGIN
+		bottom = int(view_bottom // self.chunk_height) - CHUNK_MARGIN
+		right = int((view_left + self.screen_width) // self.chunk_width) + CHUNK_MARGIN
+		top = int((view_bottom + self.screen_height) // self.chunk_height) + CHUNK_MARGIN
+		return left, bottom, right, top
+
+	def _load(self, key):
+		sprites = [ ]
+		batches = { }
+		for layer_name, indices in self.chunk_tiles.get(key, { }).items():
+			alpha = self.level.layers[layer_name][0]
+			batch = arcade.SpriteList(is_static = True)
+			for index in indices:
+				sprite = self.level.create_sprite(index, self.scaling)
+				if alpha != 255:
+					sprite.alpha = alpha
+				for sprite_list in self.layers[layer_name]:
+					sprite_list.append(sprite)
+				batch.append(sprite)
+				sprites.append(sprite)
+			batches[layer_name] = batch
+		self.loaded[key] = (sprites, batches)
+		self.loads += 1
+
+	def _evict(self, key):
+		sprites, batches = self.loaded.pop(key)
+		for sprite in sprites:
+			sprite.remove_from_sprite_lists()
+		self.evictions += 1
+
+	def draw_layer(self, layer_name, left, bottom, right, top):
+		"""draws a layer's loaded chunks that are on screen, returns drawn and culled counts"""
+		drawn = 0
+		culled = 0
+		for (x, y), (sprites, batches) in self.loaded.items():
+			batch = batches.get(layer_name)
+			if not batch:
+				continue
+			#tiles can overhang their chunk, so allow a tile of slack
+			chunk_left = x * self.chunk_width - self.level.tile_width * self.scaling
+			chunk_bottom = y * self.chunk_height - self.level.tile_height * self.scaling
+			chunk_right = (x + 1) * self.chunk_width + self.level.tile_width * self.scaling
+			chunk_top = (y + 1) * self.chunk_height + self.level.tile_height * self.scaling
+			if chunk_right >= left and chunk_left <= right and \
+					chunk_top >= bottom and chunk_bottom <= top:
+				batch.draw()
+				drawn += len(batch)
+			else:
+				culled += len(batch)
+		return drawn, culled
+
+	def layer(self, layer_name):
+		"""a drawable view of one streamed layer, for the view culler"""
+		return StreamedLayer(self, layer_name)
+
+	def update(self, view_left, view_bottom, direction_x = 0, direction_y = 0):
+		"""loads what the viewport needs, prefetches ahead and evicts old chunks"""
+		step_x = (direction_x > 0) - (direction_x < 0)
+		step_y = (direction_y > 0) - (direction_y < 0)
+		left, bottom, right, top = self._chunk_range(view_left, view_bottom)
+
+		request = (left, bottom, step_x, step_y)
+		if request != self._last_request:
+			self._last_request = request
+
+			#chunks on or near the screen are needed right now
+			needed = [(x, y) for x in range(left, right + 1) for y in range(bottom, top + 1)
+					  if (x, y) in self.chunk_tiles]
+			for key in needed:
+				if key in self.loaded:
+					self.loaded.move_to_end(key)
+				else:
+					self._load(key)
+
+			#queue up the next ring of chunks in the direction of travel
+			self.prefetch_queue = [ ]
+			if step_x or step_y:
+				for distance in range(1, PREFETCH_CHUNKS + 1):
+					for x in range(left, right + 1):
+						for y in range(bottom, top + 1):
+							key = (x + step_x * distance, y + step_y * distance)
+							if key in self.chunk_tiles and key not in self.loaded \
+									and key not in self.prefetch_queue:
+								self.prefetch_queue.append(key)
+
+		#build a few prefetched chunks each frame so it never causes a hitch
+		for i in range(min(PREFETCH_PER_FRAME, len(self.prefetch_queue))):
+			key = self.prefetch_queue.pop(0)
+			if key not in self.loaded:
+				self._load(key)
+
+		#least recently used chunks go first
+		while len(self.loaded) > self.capacity:
+			self._evict(next(iter(self.loaded)))
+
+	def stats(self):
+		return {
+			"loaded": len(self.loaded),
+			"capacity": self.capacity,
+			"loads": self.loads,
+			"evictions": self.evictions
+		}
+
+
+class StreamedLayer:
+	"""draws one layer of a chunk streamer, chunk by chunk"""
+	def __init__(self, streamer, layer_name):
+		self.streamer = streamer
+		self.layer_name = layer_name
+
+	def draw(self, left, bottom, right, top):
+		return self.streamer.draw_layer(self.layer_name, left, bottom, right, top)
@@ -0,0 +1,126 @@
+"""constants shared by the game views and the world simulation"""
+
+#constants
+SCREEN_HEIGHT = 800 
+SCREEN_WIDTH = 1200
+SCREEN_TITLE = "NAPP"
+TILE_SCALING = 1
+GRID_SIZE = 64
+LASER_SCALING = 0.5
+
+#player constants
+PLAYER_MOVEMENT_SPEED = 5
+PLAYER_SWIM_SPEED = 2
+PLAYER_JUMP_SPEED = 15
+PLAYER_DASH_SPEED = 15
+GRAVITY = 0.5
+FLUID_GRAVITY = 0.3
+LASER_SPEED = 25
+
+#the player constants above by name, a world can be given other values for
+#any of them to try out a different tuning, see sweep.py
+MOVEMENT_CONSTANTS = {
+	"PLAYER_MOVEMENT_SPEED": PLAYER_MOVEMENT_SPEED,
+	"PLAYER_SWIM_SPEED": PLAYER_SWIM_SPEED,
+	"PLAYER_JUMP_SPEED": PLAYER_JUMP_SPEED,
+	"PLAYER_DASH_SPEED": PLAYER_DASH_SPEED,
+	"GRAVITY": GRAVITY,
+	"FLUID_GRAVITY": FLUID_GRAVITY
+}
+
+#enemy constants
+ENEMY_PATROL_SPEED = 3
+ENEMY_LASER_SPEED = 5
+#projectile enemies fire once every this many ticks
+ENEMY_FIRE_INTERVAL = 120
+#each projectile enemy starts this many ticks further into the interval than
+#the one before, so they don't all fire together, shares no factor with it
+ENEMY_FIRE_STAGGER = 7
+#enemies further than this outside the viewport fall asleep and lasers that
+#far out go back to their pools, see GameWorld.update_activity
+ACTIVE_REGION_MARGIN = 4 * GRID_SIZE
+
+#simulation ticks per second, every speed above is in pixels per tick
+TICK_RATE = 60
+#most ticks run for one rendered frame, after a longer stall the game slows
+#down instead of trying to catch up all at once
+MAX_TICKS_PER_FRAME = 5
+#sprites moving further than this in a tick were teleported, so drawing
+#doesn't blend them between their old and new position
+MAX_INTERPOLATION_DISTANCE = 2 * GRID_SIZE
+
+#projectile pool constants, how many lasers are built up front and where
+#unused lasers are parked so they never collide with anything
+PLAYER_LASER_POOL_SIZE = 16
+ENEMY_LASER_POOL_SIZE = 64
+PARKED_POSITION = -1000
+
+#effects that can play at once, and the music streamed behind them
+AUDIO_VOICES = 8
+MUSIC_FILE = ":resources:music/funkyrobot.mp3"
+MUSIC_VOLUME = 0.3
+
+#rendered strings kept for the menus and the HUD
+TEXT_CACHE_SIZE = 256
+
+#level the game starts on
+DEFAULT_MAP_NAME = "map/world_map.tmx"
+
+#levels at least this many tiles wide or tall stream their tiles in chunks
+CHUNKED_WORLD_MIN_SIZE = 64
+
+#the reachability analyzer builds the movement graph of squares this many
+#tiles wide as separate tasks
+REACHABILITY_REGION_SIZE = 32
+
+#names of the layers in the tiled maps
+PLATFORMS_LAYER_NAME = 'Platforms'
+LADDERS_LAYER_NAME = 'Ladders'
+INVISIBLE_PLATFORM_LAYER_NAME = 'Invisible Platforms'
+#layer containing items that will cause death and a reset
+WATER_LAYER_NAME = 'Water'
+#layer containing general enemies loaded in
+ENEMY_LAYER_NAME = 'Enemies'
+#layer contaning enemies that shoot projectiles
+PROJECTILE_ENEMY_LAYER_NAME = 'Projectile Enemies'
+#layer containing checkpoint
+CHECKPOINT_LAYER_NAME = 'Checkpoint'
+#layer containing gems
+GEM_LAYER_NAME = 'Gems'
+#layer containing the objective
+OBJECTIVE_LAYER_NAME = 'Objective'
+
+#bits of a tile in the terrain map, see terrain.py
+TERRAIN_SOLID = 1
+TERRAIN_LADDER = 2
+TERRAIN_WATER = 4
+
+#bits of a frame's input state, one per key the game listens to
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_UP = 4
+INPUT_DOWN = 8
+INPUT_DASH = 16
+INPUT_SHOOT = 32
+INPUT_PARRY = 64
+
+STARTING_POINT = 0
+
+#seconds each frame of an animation shows for
+PLAYER_RUN_FRAME_TIME = 5 / TICK_RATE
+ENEMY_FRAME_TIME = 0.15
+
+#enemy tiles that animate, each cycles through art/PNG/Enemies/<name>_1.png to _4.png
+ENEMY_CYCLES = ("enemyFloating", "enemyFlying", "enemyFlyingAlt", "enemySpikey", "enemySwimming",
+				"enemyWalking")
+ENEMY_CYCLE_FRAMES = 4
+
+# How many pixels to keep as a minimum margin between the character
+# and the edge of the screen.
+LEFT_VIEWPORT_MARGIN = 250
+RIGHT_VIEWPORT_MARGIN = 250
+BOTTOM_VIEWPORT_MARGIN = 50
+TOP_VIEWPORT_MARGIN = 250
+
+RIGHT_FACING = 0
+LEFT_FACING = 1
@@ -0,0 +1,110 @@
+"""
+Viewport culling for GameView.on_draw.
+
+Tile layers that never move are baked once into static region batches, and
+only the batches that overlap the screen are drawn. Layers that move are
+drawn straight from their own sprite lists, which only upload the sprites
+that changed since the last draw.
+"""
+import arcade
+
+#width and height of a static region batch in pixels
+REGION_SIZE = 512
+
+
+class StaticLayer:
+	"""
+	a tile layer that never moves, baked into one static sprite list per region
+
+	the batches are separate from the layer's own sprite list, which is kept for
+	collisions, so their vertex buffers are uploaded once and never again
+	"""
+	def __init__(self, sprite_list, region_size = REGION_SIZE):
+		self.regions = [ ]
+		buckets = { }
+		for sprite in sprite_list:
+			key = (int(sprite.center_x // region_size), int(sprite.center_y // region_size))
+			buckets.setdefault(key, [ ]).append(sprite)
+
+		for sprites in buckets.values():
+			batch = arcade.SpriteList(is_static = True)
+			for sprite in sprites:
+				batch.append(sprite)
+			#sprites overhang their region a little, so keep the true bounds
+			left = min(sprite.center_x - sprite.width / 2 for sprite in sprites)
+			right = max(sprite.center_x + sprite.width / 2 for sprite in sprites)
+			bottom = min(sprite.center_y - sprite.height / 2 for sprite in sprites)
+			top = max(sprite.center_y + sprite.height / 2 for sprite in sprites)
+			self.regions.append((left, bottom, right, top, batch))
+
+	def draw(self, left, bottom, right, top):
+		"""draws the regions on screen, returns how many sprites were drawn and culled"""
+		drawn = 0
+		culled = 0
+		for region_left, region_bottom, region_right, region_top, batch in self.regions:
+			if region_right >= left and region_left <= right and \
+					region_top >= bottom and region_bottom <= top:
+				batch.draw()
+				drawn += len(batch)
+			else:
+				culled += len(batch)
+		return drawn, culled
+
+
+class DynamicLayer:
+	"""
+	a sprite list whose sprites move, appear or disappear, drawn as it is
+
+	working out which of its sprites are on screen would cost a pass over the
+	whole list every frame, while drawing it only uploads the sprites that
+	changed and leaves the clipping to the GPU
+	"""
+	def __init__(self, sprite_list):
+		self.sprite_list = sprite_list
+
+	def draw(self, left, bottom, right, top):
+		"""draws every sprite of the list, returns how many sprites were drawn and culled"""
+		if len(self.sprite_list):
+			self.sprite_list.draw()
+		return len(self.sprite_list), 0
+
+
+class ViewCuller:
+	"""draws a stack of layers, skipping everything outside the viewport"""
+	def __init__(self, screen_width, screen_height):
+		self.screen_width = screen_width
+		self.screen_height = screen_height
+
+		#layers in draw order, as (name, culling helper)
+		self.layers = [ ]
+
+		#sprites drawn and culled during the last frame, in total and per layer
+		self.drawn = 0
+		self.culled = 0
+		self.layer_stats = { }
+
+	def add_static(self, name, sprite_list):
+		"""for layers whose sprites never move or change after setup"""
+		self.layers.append((name, StaticLayer(sprite_list)))
+
+	def add_dynamic(self, name, sprite_list):
+		"""for layers whose sprites move, appear or disappear"""
+		self.layers.append((name, DynamicLayer(sprite_list)))
+
+	def add_layer(self, name, layer):
+		"""for anything else with a draw(left, bottom, right, top) method"""
+		self.layers.append((name, layer))
+
+	def draw(self, view_left, view_bottom):
+		left = view_left
+		bottom = view_bottom
+		right = view_left + self.screen_width
+		top = view_bottom + self.screen_height
+
+		self.drawn = 0
+		self.culled = 0
+		for name, layer in self.layers:
+			drawn, culled = layer.draw(left, bottom, right, top)
+			self.layer_stats[name] = (drawn, culled)
+			self.drawn += drawn
+			self.culled += culled
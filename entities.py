@@ -0,0 +1,299 @@
+"""
+Struct-of-arrays storage for the sprites that move on their own.
+
+Enemies and lasers used to be moved, turned round and hit tested one sprite at
+a time. An EntityStore keeps their positions, velocities, hit box extents and
+alive flags in NumPy arrays instead. A frame's movement is one array addition.
+For overlap tests between two stores, small batches
+compare every pair of bounding boxes at once. Past PAIR_MATRIX_LIMIT pairs
+every box is bucketed by the GRID_SIZE cells it reaches into instead, and
+only boxes sharing a cell are compared, so the cost grows with the sprites
+rather than with every pair of them. Only the pairs whose boxes overlap get
+arcade's exact hit box check, so the results are the same as checking the
+sprites directly.
+
+The arrays hold the real positions while the world steps. Sprites that moved
+are written back once per frame, ready for drawing.
+
+Sprites far from the player can be put to sleep. A sleeping sprite doesn't
+move, count down its timer or collide, and is left out of every batch. When
+it wakes it is moved on in one step by however long it slept, turning at
+its min_x and max_x as it would have, so it turns up about where it would
+have been.
+"""
+import math
+
+import arcade
+import numpy
+
+from constants import *
+
+#slots added whenever a store fills up
+STORE_GROWTH = 64
+
+#bounding boxes are widened by this much, so rounding never drops a pair the
+#exact check would have caught
+BOX_SLACK = 0.01
+
+#collide buckets bounding boxes into square cells this wide, once there are
+#more pairs than the limit, below it comparing every pair is quicker
+CELL_SIZE = GRID_SIZE
+PAIR_MATRIX_LIMIT = 16384
+
+
+def _spread(counts):
+	"""for items owning counts[i] entries each, the owner and the position within it of every entry"""
+	owners = numpy.repeat(numpy.arange(len(counts)), counts)
+	starts = numpy.cumsum(counts) - counts
+	return owners, numpy.arange(len(owners)) - starts[owners]
+
+def _cells(left, right, bottom, top):
+	"""a key for every cell each box reaches into, with the index of the box it belongs to"""
+	first_column = numpy.floor_divide(left, CELL_SIZE).astype(numpy.int64)
+	first_row = numpy.floor_divide(bottom, CELL_SIZE).astype(numpy.int64)
+	columns = numpy.floor_divide(right, CELL_SIZE).astype(numpy.int64) - first_column + 1
+	rows = numpy.floor_divide(top, CELL_SIZE).astype(numpy.int64) - first_row + 1
+	boxes, within = _spread(columns * rows)
+	column = first_column[boxes] + within % columns[boxes]
+	row = first_row[boxes] + within // columns[boxes]
+	return (column << 32) + row, boxes
+
+
+class EntityStore:
+	"""positions, velocities and hit box extents of a group of sprites"""
+	def __init__(self, capacity = STORE_GROWTH):
+		#slot -> sprite, None for empty slots, and the other way round
+		self.sprites = [ ]
+		self.slots = { }
+		self.free = [ ]
+
+		self.x = numpy.zeros(0)
+		self.y = numpy.zeros(0)
+		self.change_x = numpy.zeros(0)
+		self.change_y = numpy.zeros(0)
+		#hit box extents relative to the sprite's centre
+		self.left = numpy.zeros(0)
+		self.right = numpy.zeros(0)
+		self.bottom = numpy.zeros(0)
+		self.top = numpy.zeros(0)
+		self.alive = numpy.zeros(0, dtype = bool)
+		#centre x range a sprite keeps inside, e.g. the limits of an enemy's patrol
+		self.min_x = numpy.zeros(0)
+		self.max_x = numpy.zeros(0)
+		#sleeping sprites are left out of active, slept_at is the tick they fell asleep
+		self.awake = numpy.zeros(0, dtype = bool)
+		self.slept_at = numpy.zeros(0)
+		#ticks until each sprite's next action, e.g. an enemy firing, see countdown
+		self.timer = numpy.zeros(0)
+		self._grow(capacity)
+
+		#exact hit box checks run since the counter was last cleared
+		self.checks = 0
+
+	def _grow(self, extra):
+		for name in ("x", "y", "change_x", "change_y", "left", "right", "bottom", "top", "alive",
+					 "min_x", "max_x", "awake", "slept_at", "timer"):
+			array = getattr(self, name)
+			setattr(self, name, numpy.concatenate((array, numpy.zeros(extra, dtype = array.dtype))))
+		first = len(self.sprites)
+		self.sprites.extend([None] * extra)
+		self.free.extend(range(first + extra - 1, first - 1, -1))
+
+	def __len__(self):
+		return len(self.slots)
+
+	def __contains__(self, sprite):
+		return sprite in self.slots
+
+	def add(self, sprite, min_x = -math.inf, max_x = math.inf, timer = 0):
+		"""starts tracking a sprite awake, reading its position, velocity and hit box"""
+		if sprite in self.slots:
+			self.remove(sprite)
+		if not self.free:
+			self._grow(STORE_GROWTH)
+		slot = self.free.pop()
+		self.sprites[slot] = sprite
+		self.slots[sprite] = slot
+
+		self.x[slot] = sprite.center_x
+		self.y[slot] = sprite.center_y
+		self.change_x[slot] = sprite.change_x
+		self.change_y[slot] = sprite.change_y
+		points = sprite.get_adjusted_hit_box()
+		self.left[slot] = min(point[0] for point in points) - sprite.center_x
+		self.right[slot] = max(point[0] for point in points) - sprite.center_x
+		self.bottom[slot] = min(point[1] for point in points) - sprite.center_y
+		self.top[slot] = max(point[1] for point in points) - sprite.center_y
+		self.alive[slot] = True
+		self.min_x[slot] = min_x
+		self.max_x[slot] = max_x
+		self.awake[slot] = True
+		self.timer[slot] = timer
+		return slot
+
+	def remove(self, sprite):
+		"""stops tracking a sprite, safe to call for sprites that were never added"""
+		slot = self.slots.pop(sprite, None)
+		if slot is None:
+			return
+		self.alive[slot] = False
+		self.sprites[slot] = None
+		self.free.append(slot)
+
+	def clear(self):
+		for sprite in list(self.slots):
+			self.remove(sprite)
+
+	def active(self):
+		"""slots of every tracked sprite that is awake, in slot order"""
+		return numpy.flatnonzero(self.alive & self.awake)
+
+	def sleeping(self):
+		"""how many tracked sprites are asleep"""
+		return int(numpy.count_nonzero(self.alive & ~self.awake))
+
+	def _inside(self, left, right, bottom, top):
+		return (self.x >= left) & (self.x <= right) & (self.y >= bottom) & (self.y <= top)
+
+	def outside(self, left, right, bottom, top):
+		"""tracked sprites whose centres are outside a region, in slot order"""
+		return [self.sprites[slot] for slot in
+				numpy.flatnonzero(self.alive & ~self._inside(left, right, bottom, top))]
+
+	def schedule(self, left, right, bottom, top, tick):
+		"""
+		puts the sprites whose centres are outside a region to sleep and wakes
+		the sleeping ones inside it, returns the sprites put to sleep and woken
+		"""
+		inside = self._inside(left, right, bottom, top)
+		falling_asleep = numpy.flatnonzero(self.alive & self.awake & ~inside)
+		waking = numpy.flatnonzero(self.alive & ~self.awake & inside)
+		self.awake[falling_asleep] = False
+		self.slept_at[falling_asleep] = tick
+		if len(waking):
+			self._catch_up(waking, tick - self.slept_at[waking])
+			self.awake[waking] = True
+		return ([self.sprites[slot] for slot in falling_asleep],
+				[self.sprites[slot] for slot in waking])
+
+	def _catch_up(self, slots, ticks):
+		"""moves sprites on by a number of ticks at once, turning round at min_x and max_x"""
+		x = self.x[slots] + self.change_x[slots] * ticks
+		self.y[slots] += self.change_y[slots] * ticks
+
+		#between two limits the path is a triangle wave, fold it back into the range
+		bounded = (numpy.isfinite(self.min_x[slots]) & numpy.isfinite(self.max_x[slots]) &
+				   (self.change_x[slots] != 0))
+		if bounded.any():
+			turning = slots[bounded]
+			start_x = self.x[turning]
+			change_x = self.change_x[turning]
+			speed = numpy.abs(change_x)
+			#a sprite only ever stands on whole steps from where it is, and turns
+			#on the first step past a limit
+			low = start_x - (numpy.floor((start_x - self.min_x[turning]) / speed) + 1) * speed
+			high = start_x + (numpy.floor((self.max_x[turning] - start_x) / speed) + 1) * speed
+			span = high - low
+			period = 2 * span
+			#where it is in the period, counting from low heading right
+			start = numpy.where(change_x > 0, start_x - low, period - (start_x - low))
+			phase = numpy.mod(start + speed * ticks[bounded], period)
+			heading_right = phase < span
+			x[bounded] = low + numpy.where(heading_right, phase, period - phase)
+			self.change_x[turning] = numpy.where(heading_right, speed, -speed)
+		self.x[slots] = x
+
+		for slot in slots:
+			sprite = self.sprites[slot]
+			sprite.position = (float(self.x[slot]), float(self.y[slot]))
+			sprite.change_x = float(self.change_x[slot])
+
+	def countdown(self, interval):
+		"""counts the timers of awake sprites down a tick, returns the sprites whose timer ran out"""
+		slots = self.active()
+		self.timer[slots] -= 1
+		done = slots[self.timer[slots] <= 0]
+		self.timer[done] += interval
+		return [self.sprites[slot] for slot in done]
+
+	def sleep_state(self, sprite):
+		"""whether a sprite is awake, when it fell asleep and its timer, for set_sleep_state"""
+		slot = self.slots[sprite]
+		return bool(self.awake[slot]), float(self.slept_at[slot]), float(self.timer[slot])
+
+	def set_sleep_state(self, sprite, state):
+		slot = self.slots[sprite]
+		self.awake[slot], self.slept_at[slot], self.timer[slot] = state
+
+	def set_velocity(self, slot, change_x, change_y):
+		self.change_x[slot] = change_x
+		self.change_y[slot] = change_y
+		sprite = self.sprites[slot]
+		sprite.change_x = change_x
+		sprite.change_y = change_y
+
+	def move(self):
+		"""moves every awake sprite by its velocity and writes the ones that moved back"""
+		moving = self.alive & self.awake & ((self.change_x != 0) | (self.change_y != 0))
+		self.x[moving] += self.change_x[moving]
+		self.y[moving] += self.change_y[moving]
+		for slot in numpy.flatnonzero(moving):
+			self.sprites[slot].position = (float(self.x[slot]), float(self.y[slot]))
+
+	def bounds(self, slots):
+		"""left, right, bottom and top of the hit boxes of some slots"""
+		return (self.x[slots] + self.left[slots] - BOX_SLACK, self.x[slots] + self.right[slots] + BOX_SLACK,
+				self.y[slots] + self.bottom[slots] - BOX_SLACK, self.y[slots] + self.top[slots] + BOX_SLACK)
+
+	def _exact(self, pairs):
+		hits = [ ]
+		for sprite, other in pairs:
+			self.checks += 1
+			if arcade.check_for_collision(sprite, other):
+				hits.append((sprite, other))
+		return hits
+
+	def collide(self, other):
+		"""(sprite, other sprite) for every pair whose hit boxes overlap, in slot order"""
+		slots = self.active()
+		other_slots = other.active()
+		if not len(slots) or not len(other_slots):
+			return [ ]
+		left, right, bottom, top = self.bounds(slots)
+		other_left, other_right, other_bottom, other_top = other.bounds(other_slots)
+		if len(slots) * len(other_slots) <= PAIR_MATRIX_LIMIT:
+			boxes = ((left[:, None] <= other_right[None, :]) & (right[:, None] >= other_left[None, :]) &
+					 (bottom[:, None] <= other_top[None, :]) & (top[:, None] >= other_bottom[None, :]))
+			rows, columns = numpy.nonzero(boxes)
+			return self._exact([(self.sprites[slots[row]], other.sprites[other_slots[column]])
+								for row, column in zip(rows, columns)])
+
+		#pair up the boxes that share a cell, boxes sharing several only once
+		keys, boxes = _cells(left, right, bottom, top)
+		other_keys, other_boxes = _cells(other_left, other_right, other_bottom, other_top)
+		order = numpy.argsort(other_keys, kind = "stable")
+		other_keys = other_keys[order]
+		first = numpy.searchsorted(other_keys, keys, side = "left")
+		matches = numpy.searchsorted(other_keys, keys, side = "right") - first
+		entries, within = _spread(matches)
+		pairs = numpy.unique(boxes[entries] * len(other_slots) +
+							 other_boxes[order[first[entries] + within]])
+		rows = pairs // len(other_slots)
+		columns = pairs % len(other_slots)
+
+		overlap = ((left[rows] <= other_right[columns]) & (right[rows] >= other_left[columns]) &
+				   (bottom[rows] <= other_top[columns]) & (top[rows] >= other_bottom[columns]))
+		return self._exact([(self.sprites[slots[row]], other.sprites[other_slots[column]])
+							for row, column in zip(rows[overlap], columns[overlap])])
+
+	def collide_sprite(self, sprite):
+		"""tracked sprites whose hit boxes overlap one other sprite, in slot order"""
+		slots = self.active()
+		if not len(slots):
+			return [ ]
+		points = sprite.get_adjusted_hit_box()
+		left, right, bottom, top = self.bounds(slots)
+		boxes = ((left <= max(point[0] for point in points)) & (right >= min(point[0] for point in points)) &
+				 (bottom <= max(point[1] for point in points)) & (top >= min(point[1] for point in points)))
+		hits = self._exact([(self.sprites[slot], sprite) for slot in slots[boxes]])
+		return [tracked for tracked, other in hits]
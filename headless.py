@@ -0,0 +1,146 @@
+"""
+Runs the game's rules without a window, as fast as the machine allows.
+
+	python headless.py --map map/world_map.tmx --sessions 100 --frames 3600
+
+Every session steps a fresh GameWorld with one input bitmask per frame (see
+the INPUT_* constants) and reports how it ended, so level changes can be
+checked on machines that have no display or GPU.
+
+	python headless.py --map map/world_map.tmx --check
+
+only checks that a laser the player fires flies and goes back to its pool
+once it leaves the screen, and exits with 1 if it doesn't.
+"""
+import pyglet
+
+#no window is ever opened, so don't let pyglet create a hidden one on import
+pyglet.options['shadow_window'] = False
+
+import argparse
+import random
+import sys
+import time
+
+import world
+from constants import *
+
+#one simulated frame, the rules assume 60 updates a second
+FRAME_TIME = 1/60
+
+
+def simulate(map_name, inputs, frames, delta_time = FRAME_TIME):
+	"""
+	steps a new world for a number of frames, inputs is either a list with one
+	input bitmask per frame or a function taking the frame number, returns the
+	world and a summary of what happened
+	"""
+	game = world.GameWorld(map_name)
+	game.setup()
+
+	summary = {"frames": 0, "jump": 0, "death": 0, "checkpoint": 0, "win": 0}
+	for frame in range(frames):
+		if callable(inputs):
+			state = inputs(frame)
+		elif frame < len(inputs):
+			state = inputs[frame]
+		else:
+			state = 0
+		game.apply_input(state)
+		game.step(delta_time)
+		summary["frames"] += 1
+
+		for event in game.take_events():
+			summary[event] = summary.get(event, 0) + 1
+		if game.won:
+			break
+
+	summary["x"] = game.player_sprite.center_x
+	summary["y"] = game.player_sprite.center_y
+	return game, summary
+
+
+def check_projectiles(map_name):
+	"""fires one laser from the start of a level, returns what went wrong with it, if anything"""
+	game = world.GameWorld(map_name)
+	game.setup()
+	game.ability_count = 1
+	game.apply_input(INPUT_SHOOT)
+	game.step(FRAME_TIME)
+	game.apply_input(0)
+	if len(game.bullet_pool.active) != 1:
+		return [f"fired {len(game.bullet_pool.active)} lasers instead of 1"]
+	laser = game.bullet_pool.active[0]
+
+	problems = [ ]
+	start_x = laser.center_x
+	game.step(FRAME_TIME)
+	if laser.center_x - start_x != LASER_SPEED:
+		problems.append(f"laser moved {laser.center_x - start_x:.1f}px in a frame, not {LASER_SPEED}")
+
+	#one screen width at LASER_SPEED, with a little slack
+	for frame in range(SCREEN_WIDTH // LASER_SPEED + 10):
+		if laser not in game.bullet_pool.active:
+			break
+		game.step(FRAME_TIME)
+	else:
+		problems.append(f"laser still flying at ({laser.center_x:.0f}, {laser.center_y:.0f})")
+	if laser in game.bullet_store:
+		problems.append("released laser is still tracked by the bullet store")
+	return problems
+
+
+def random_inputs(seed, hold_frames = 20):
+	"""a made up player that mostly runs right and keeps changing which keys it holds"""
+	generator = random.Random(seed)
+	states = { }
+
+	def inputs(frame):
+		block = frame // hold_frames
+		if block not in states:
+			state = INPUT_RIGHT if generator.random() < 0.7 else INPUT_LEFT
+			if generator.random() < 0.4:
+				state |= INPUT_UP
+			if generator.random() < 0.05:
+				state |= INPUT_DASH
+			if generator.random() < 0.05:
+				state |= INPUT_SHOOT
+			if generator.random() < 0.1:
+				state |= INPUT_PARRY
+			states[block] = state
+		return states[block]
+	return inputs
+
+
+def main():
+	parser = argparse.ArgumentParser(description = "run play sessions without a window")
+	parser.add_argument("--map", default = "map/world_map.tmx")
+	parser.add_argument("--sessions", type = int, default = 10)
+	parser.add_argument("--frames", type = int, default = 3600)
+	parser.add_argument("--seed", type = int, default = 0)
+	parser.add_argument("--check", action = "store_true", help = "only check that fired lasers fly and are released")
+	args = parser.parse_args()
+
+	if args.check:
+		problems = check_projectiles(args.map)
+		for problem in problems:
+			print(problem)
+		print("lasers ok" if not problems else f"{len(problems)} problem(s) with lasers")
+		sys.exit(1 if problems else 0)
+
+	start = time.perf_counter()
+	total_frames = 0
+	for session in range(args.sessions):
+		game, summary = simulate(args.map, random_inputs(args.seed + session), args.frames)
+		total_frames += summary["frames"]
+		print(f"session {session}: {summary['frames']} frames, {summary['death']} deaths, "
+			  f"{summary['checkpoint']} checkpoint visits, won: {bool(summary['win'])}, "
+			  f"ended at ({summary['x']:.0f}, {summary['y']:.0f})")
+
+	elapsed = time.perf_counter() - start
+	print(f"{total_frames} frames in {elapsed:.2f}s, "
+		  f"{total_frames / elapsed / 60:.1f}x real time")
+
+
+if __name__ == "__main__":
+	main()
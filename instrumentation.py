@@ -0,0 +1,302 @@
+"""
+Opt-in frame timing and counters for GameView.
+
+	F3 shows or hides the HUD, F4 starts or stops streaming to profiles/
+
+While switched on, every phase of GameWorld.step and every layer drawn by the
+view culler is timed, and the sprite, drawn, culled and collision check counts
+are taken once per frame. The last few hundred frames are kept as rolling
+histograms for the HUD, and every frame can also be streamed to a JSON lines
+file. Diagnostic messages from the world (lasers leaving the screen, reaching
+the checkpoint...) are collected here instead of being printed.
+
+Nothing is wrapped until it is switched on, and switching it off puts the
+original methods back, so with it off the game runs exactly the code it
+would without it.
+"""
+import collections
+import json
+import os
+import time
+
+import arcade
+
+import text_cache
+from constants import *
+
+#how many frames the rolling histograms remember
+HISTORY_FRAMES = 300
+
+#upper edges of the frame time histogram buckets, in milliseconds
+HISTOGRAM_BUCKETS_MS = [2, 4, 8, 16.7, 33.3]
+
+#how many of the latest world messages the HUD shows
+MESSAGE_LINES = 6
+
+#seconds between refreshes of the HUD's text, its numbers change every frame
+#and each change is a fresh render
+HUD_REFRESH_TIME = 0.25
+
+#the HUD renders through its own small cache, so its changing lines never
+#push the menus' text out of the shared one
+HUD_TEXT_CACHE_SIZE = 64
+
+#GameWorld.step is split into these methods, each one is timed as a phase
+WORLD_PHASES = [
+	("physics", "update_physics"),
+	("projectiles", "update_projectiles"),
+	("enemies", "update_enemies"),
+	("collisions", "update_collisions"),
+	("activity", "update_activity"),
+	("animation", "update_animation"),
+	("viewport", "update_viewport")
+]
+
+
+class PhaseTimer:
+	"""replaces methods of objects with timed versions that add up per phase"""
+	def __init__(self):
+		self.totals = { }
+
+		#(object, attribute, what the object's own attribute was before)
+		self._patched = [ ]
+
+	def patch(self, obj, name, function):
+		"""replaces one attribute of an object until restore is called"""
+		self._patched.append((obj, name, obj.__dict__.get(name)))
+		setattr(obj, name, function)
+
+	def wrap(self, obj, name, phase):
+		"""times every call of obj.name under a phase"""
+		method = getattr(obj, name)
+		totals = self.totals
+		totals.setdefault(phase, 0.0)
+
+		def timed(*args, **kwargs):
+			start = time.perf_counter()
+			result = method(*args, **kwargs)
+			totals[phase] += time.perf_counter() - start
+			return result
+		self.patch(obj, name, timed)
+
+	def take(self):
+		"""the time spent in each phase since the last take, in seconds"""
+		totals = dict(self.totals)
+		for phase in self.totals:
+			self.totals[phase] = 0.0
+		return totals
+
+	def restore(self):
+		"""puts back everything that was patched, newest first"""
+		for obj, name, previous in reversed(self._patched):
+			if previous is None:
+				delattr(obj, name)
+			else:
+				setattr(obj, name, previous)
+		self._patched = [ ]
+
+
+class RollingHistogram:
+	"""the latest samples of one measurement"""
+	def __init__(self, size = HISTORY_FRAMES):
+		self.samples = collections.deque(maxlen = size)
+
+	def add(self, value):
+		self.samples.append(value)
+
+	def mean(self):
+		return sum(self.samples) / len(self.samples) if self.samples else 0.0
+
+	def percentile(self, fraction):
+		if not self.samples:
+			return 0.0
+		ordered = sorted(self.samples)
+		return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+	def max(self):
+		return max(self.samples, default = 0.0)
+
+	def buckets(self, edges):
+		"""how many samples fall under each edge, plus one count for the rest"""
+		counts = [0] * (len(edges) + 1)
+		for value in self.samples:
+			for i, edge in enumerate(edges):
+				if value < edge:
+					counts[i] += 1
+					break
+			else:
+				counts[-1] += 1
+		return counts
+
+
+class Instrumentation:
+	"""measures a GameView while the HUD or streaming is switched on"""
+	def __init__(self, view):
+		self.view = view
+		self.hud_visible = False
+		self.stream = None
+		self.timer = None
+
+		#measurement name -> RollingHistogram, times are in milliseconds
+		self.histograms = { }
+
+		#latest (frame, message) pairs from the world
+		self.messages = collections.deque(maxlen = MESSAGE_LINES)
+
+		#the HUD's lines, rendered again every HUD_REFRESH_TIME and moved with
+		#the viewport in between
+		self.hud_text = text_cache.TextBatch(text_cache.TextCache(HUD_TEXT_CACHE_SIZE))
+		self.hud_refreshed = -HUD_REFRESH_TIME
+		self.hud_origin = (0, 0)
+		self.hud_line_count = 0
+
+	@property
+	def enabled(self):
+		return self.timer is not None
+
+	def toggle_hud(self):
+		self.hud_visible = not self.hud_visible
+		self._update_enabled()
+
+	def toggle_stream(self, file_name = None):
+		"""starts streaming every frame to a file, or stops if already streaming"""
+		if self.stream:
+			self.stream.close()
+			self.stream = None
+		else:
+			if file_name is None:
+				os.makedirs("profiles", exist_ok = True)
+				file_name = time.strftime("profiles/%Y%m%d_%H%M%S.jsonl")
+			self.stream = open(file_name, "w")
+		self._update_enabled()
+
+	def _update_enabled(self):
+		wanted = self.hud_visible or self.stream is not None
+		if wanted and not self.enabled:
+			self.attach()
+		elif not wanted and self.enabled:
+			self.detach()
+
+	def attach(self):
+		"""wraps the world's phases and the culler's layers with timers"""
+		world = self.view.world
+		timer = PhaseTimer()
+		for phase, method in WORLD_PHASES:
+			timer.wrap(world, method, phase)
+		timer.wrap(world, "step", "update")
+
+		culler = self.view.culler
+		for name, layer in culler.layers:
+			timer.wrap(layer, "draw", "draw " + name)
+		timer.wrap(culler, "draw", "draw")
+
+		#a frame's measurements are collected once the world has stepped
+		step = world.step
+		def instrumented_step(delta_time = 1/60):
+			step(delta_time)
+			self.end_frame()
+		timer.patch(world, "step", instrumented_step)
+
+		world.instrumentation = self
+		self.timer = timer
+
+	def detach(self):
+		self.timer.restore()
+		self.timer = None
+		self.view.world.instrumentation = None
+
+	def _add(self, name, value):
+		histogram = self.histograms.get(name)
+		if histogram is None:
+			histogram = self.histograms[name] = RollingHistogram()
+		histogram.add(value)
+
+	def end_frame(self):
+		"""turns the phase totals and counters of the last frame into samples"""
+		world = self.view.world
+		culler = self.view.culler
+		phases = {phase: seconds * 1000 for phase, seconds in self.timer.take().items()}
+		#the draw timed here is the one just before this update
+		phases["frame"] = phases.get("update", 0.0) + phases.get("draw", 0.0)
+		for phase, ms in phases.items():
+			self._add(phase, ms)
+
+		counts = {
+			"sprites": (len(world.wall_list) + len(world.ladder_list) + len(world.water_list) +
+						len(world.enemy_list) + len(world.projectile_enemy_list) +
+						len(world.gem_list) + len(world.checkpoint_list) +
+						len(world.objective_list) + len(world.bullet_pool.active) +
+						len(world.enemy_laser_pool.active) + 1),
+			"drawn": culler.drawn,
+			"culled": culler.culled,
+			"collision checks": world.collision_checks,
+			"asleep": world.sleeping
+		}
+		for name, value in counts.items():
+			self._add(name, value)
+
+		if self.stream:
+			record = {"frame": world.frame_count, "ms": phases, "counts": counts}
+			self.stream.write(json.dumps(record) + "\n")
+
+	def message(self, text):
+		"""a diagnostic from the world, kept for the HUD and the stream"""
+		frame = self.view.world.frame_count
+		self.messages.append((frame, text))
+		if self.stream:
+			self.stream.write(json.dumps({"frame": frame, "message": text}) + "\n")
+
+	def hud_lines(self):
+		lines = [ ]
+		frame = self.histograms.get("frame")
+		if frame:
+			lines.append(f"frame {frame.mean():.2f}ms  p95 {frame.percentile(0.95):.2f}  "
+						 f"max {frame.max():.2f}")
+			labels = ["<2", "<4", "<8", "<16", "<33", "33+"]
+			counts = frame.buckets(HISTOGRAM_BUCKETS_MS)
+			total = max(1, sum(counts))
+			for label, count in zip(labels, counts):
+				lines.append(f"  {label:>4}ms {'#' * round(count / total * 30)}")
+
+		for name, histogram in self.histograms.items():
+			if name == "frame" or name in ("sprites", "drawn", "culled", "collision checks", "asleep"):
+				continue
+			lines.append(f"{name} {histogram.mean():.3f}ms  p95 {histogram.percentile(0.95):.3f}")
+
+		counts = [f"{name} {self.histograms[name].samples[-1]}"
+				  for name in ("sprites", "drawn", "culled", "collision checks", "asleep")
+				  if name in self.histograms]
+		if counts:
+			lines.append(", ".join(counts))
+
+		for frame_number, text in self.messages:
+			lines.append(f"[{frame_number}] {text}")
+		if self.stream:
+			lines.append(f"streaming to {self.stream.name}")
+		return lines
+
+	def draw_hud(self):
+		"""draws the HUD in the top left corner of the screen"""
+		view_left, view_bottom = self.view.viewport
+		left = view_left + 10
+		top = view_bottom + SCREEN_HEIGHT - 10
+		now = time.perf_counter()
+		if now - self.hud_refreshed >= HUD_REFRESH_TIME:
+			self.hud_refreshed = now
+			lines = self.hud_lines()
+			self.hud_text.begin()
+			for i, line in enumerate(lines):
+				self.hud_text.add(line, left, top - (i + 1) * 16, arcade.color.WHITE, font_size = 10)
+			self.hud_line_count = len(lines)
+		elif (left, top) != self.hud_origin:
+			#same text, the viewport has scrolled since it was placed
+			shift_x = left - self.hud_origin[0]
+			shift_y = top - self.hud_origin[1]
+			for sprite in self.hud_text.sprite_list[:self.hud_text.count]:
+				sprite.center_x += shift_x
+				sprite.center_y += shift_y
+		self.hud_origin = (left, top)
+
+		arcade.draw_lrtb_rectangle_filled(left - 5, left + 420, top + 5, top - self.hud_line_count * 16 - 5,
+										  (0, 0, 0, 160))
+		self.hud_text.draw()
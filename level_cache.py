@@ -0,0 +1,341 @@
+"""
+Compiles Tiled maps into a compact binary cache so levels can be rebuilt
+without parsing the TMX XML again.
+
+A cache file holds a small header, a texture table, a layer table and three
+packed arrays with one entry per tile: its column, its row (counted from the
+bottom of the map) and an index into the texture table. Hit boxes are stored
+in the texture table, so rebuilding a level never has to scan image pixels.
+
+Compiling reads the tmx through private helpers of arcade 2.4's tilemap
+module (see _TILEMAP_HELPERS), so it needs arcade 2.4.x. Loading a cache
+that is already compiled only uses arcade's public API.
+"""
+import array
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+import arcade
+
+import atlas
+
+#bump this whenever the file layout changes so old caches get rebuilt
+CACHE_MAGIC = b"NAPPLVL\0"
+CACHE_VERSION = 1
+CACHE_DIRECTORY = "map/cache"
+
+#private arcade.tilemap functions compile_level relies on, arcade 2.4.x has them
+_TILEMAP_HELPERS = ("_get_tile_by_gid", "_create_sprite_from_tile", "_get_image_source",
+					"_get_image_info_from_tileset")
+
+#magic, version, tmx mtime, tmx size, tmx sha1, map width/height in tiles,
+#tile width/height, has background colour, background rgba,
+#texture count, layer count, tile count, offset of the tile arrays
+_HEADER = struct.Struct("<8sHqq20sIIIIB4BIIII")
+#where the tmx mtime sits in the header, right after the magic and version
+_MTIME = struct.Struct("<q")
+_MTIME_OFFSET = struct.calcsize("<8sH")
+
+#image x/y/width/height inside the source image, then flip flags
+_TEXTURE = struct.Struct("<iiiiB")
+
+#alpha, index of the layer's first tile, number of tiles
+_LAYER = struct.Struct("<BII")
+
+_FLIPPED_HORIZONTALLY = 1
+_FLIPPED_VERTICALLY = 2
+_FLIPPED_DIAGONALLY = 4
+
+
+def cache_path_for(map_name):
+	"""where the compiled cache for a tmx file lives"""
+	base = os.path.splitext(os.path.basename(map_name))[0]
+	return os.path.join(CACHE_DIRECTORY, base + ".lvl")
+
+
+def _file_hash(file_name):
+	with open(file_name, "rb") as file:
+		return hashlib.sha1(file.read()).digest()
+
+
+def _pack_string(text):
+	data = text.encode("utf-8")
+	return struct.pack("<H", len(data)) + data
+
+
+def _unpack_string(buffer, offset):
+	length, = struct.unpack_from("<H", buffer, offset)
+	offset += 2
+	return bytes(buffer[offset:offset + length]).decode("utf-8"), offset + length
+
+
+def compile_level(map_name, cache_name = None):
+	"""parses a tmx file once and writes its compiled cache, returns the cache path"""
+	if cache_name is None:
+		cache_name = cache_path_for(map_name)
+
+	missing = [name for name in _TILEMAP_HELPERS if not hasattr(arcade.tilemap, name)]
+	if missing:
+		raise RuntimeError(f"compiling '{map_name}' needs arcade 2.4.x, arcade {arcade.version.VERSION} "
+						   f"has no tilemap.{', tilemap.'.join(missing)}")
+
+	my_map = arcade.tilemap.read_tmx(map_name)
+	map_width, map_height = my_map.map_size
+	tile_width, tile_height = my_map.tile_size
+
+	#one texture table entry per distinct gid, flip bits included
+	textures = [ ]
+	texture_index = { }
+
+	layers = [ ]
+	columns = array.array("H")
+	rows = array.array("H")
+	texture_ids = array.array("H")
+
+	for layer in my_map.layers:
+		if not isinstance(layer, arcade.tilemap.pytiled_parser.objects.TileLayer):
+			continue
+
+		first = len(texture_ids)
+		for row_index, row in enumerate(layer.layer_data):
+			for column_index, gid in enumerate(row):
+				#check for empty square
+				if gid == 0:
+					continue
+
+				if gid not in texture_index:
+					tile = arcade.tilemap._get_tile_by_gid(my_map, gid)
+					if tile is None:
+						print(f"Warning, couldn't find tile for item {gid} in layer "
+							  f"'{layer.name}' in file '{map_name}'.")
+						continue
+					texture_index[gid] = len(textures)
+					textures.append(_texture_entry(my_map, tile))
+
+				columns.append(column_index)
+				rows.append(map_height - row_index - 1)
+				texture_ids.append(texture_index[gid])
+
+		alpha = 255
+		if layer.opacity:
+			alpha = int(layer.opacity * 255)
+		layers.append((layer.name, alpha, first, len(texture_ids) - first))
+
+	#texture and layer tables
+	tables = bytearray()
+	for image_file, image_x, image_y, width, height, flips, points, properties in textures:
+		tables += _pack_string(image_file)
+		tables += _TEXTURE.pack(image_x, image_y, width, height, flips)
+		tables += struct.pack("<H", len(points))
+		for point in points:
+			tables += struct.pack("<ff", *point)
+		tables += _pack_string(json.dumps(properties))
+	for name, alpha, first, count in layers:
+		tables += _pack_string(name)
+		tables += _LAYER.pack(alpha, first, count)
+
+	#keep the packed arrays aligned so they can be viewed in place
+	arrays_offset = _HEADER.size + len(tables)
+	padding = (-arrays_offset) % 4
+	arrays_offset += padding
+
+	background = my_map.background_color
+	if background:
+		background = tuple(background) + (255,) * (4 - len(background))
+
+	stat = os.stat(map_name)
+	header = _HEADER.pack(CACHE_MAGIC, CACHE_VERSION,
+						  stat.st_mtime_ns, stat.st_size, _file_hash(map_name),
+						  map_width, map_height, tile_width, tile_height,
+						  1 if background else 0, *(background or (0, 0, 0, 0)),
+						  len(textures), len(layers), len(texture_ids), arrays_offset)
+
+	#write to a temporary file first so a crash never leaves half a cache behind
+	os.makedirs(os.path.dirname(cache_name) or ".", exist_ok = True)
+	temp_name = cache_name + ".tmp"
+	with open(temp_name, "wb") as file:
+		file.write(header)
+		file.write(tables)
+		file.write(b"\0" * padding)
+		file.write(columns.tobytes())
+		file.write(rows.tobytes())
+		file.write(texture_ids.tobytes())
+	os.replace(temp_name, cache_name)
+	return cache_name
+
+
+def _texture_entry(my_map, tile):
+	"""builds one sprite for a tile so its size, hit box and properties can be stored"""
+	sprite = arcade.tilemap._create_sprite_from_tile(my_map, tile)
+	map_directory = os.path.dirname(my_map.tmx_file)
+	image_file = arcade.tilemap._get_image_source(tile, None, map_directory)
+	image_x, image_y, width, height = arcade.tilemap._get_image_info_from_tileset(tile)
+
+	flips = 0
+	if tile.flipped_horizontally:
+		flips |= _FLIPPED_HORIZONTALLY
+	if tile.flipped_vertically:
+		flips |= _FLIPPED_VERTICALLY
+	if tile.flipped_diagonally:
+		flips |= _FLIPPED_DIAGONALLY
+
+	points = [tuple(point) for point in sprite.get_hit_box()]
+	return (os.path.normpath(str(image_file)), image_x, image_y, width, height,
+			flips, points, sprite.properties)
+
+
+def is_cache_valid(map_name, cache_name = None):
+	"""checks the cache against the tmx mtime, falling back to its hash"""
+	if cache_name is None:
+		cache_name = cache_path_for(map_name)
+	if not os.path.exists(cache_name):
+		return False
+
+	with open(cache_name, "rb") as file:
+		data = file.read(_HEADER.size)
+	if len(data) < _HEADER.size:
+		return False
+	header = _HEADER.unpack(data)
+	magic, version, mtime_ns, size, digest = header[:5]
+	if magic != CACHE_MAGIC or version != CACHE_VERSION:
+		return False
+
+	stat = os.stat(map_name)
+	if stat.st_mtime_ns == mtime_ns and stat.st_size == size:
+		return True
+	#the file was touched, it is only stale if its contents changed
+	if stat.st_size != size or _file_hash(map_name) != digest:
+		return False
+	#same contents, store the new mtime so the next load skips the hash
+	try:
+		with open(cache_name, "r+b") as file:
+			file.seek(_MTIME_OFFSET)
+			file.write(_MTIME.pack(stat.st_mtime_ns))
+	except OSError:
+		pass
+	return True
+
+
+class CompiledLevel:
+	"""a memory mapped level cache that can rebuild the level's sprite lists"""
+	def __init__(self, cache_name):
+		with open(cache_name, "rb") as file:
+			self._mmap = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+		buffer = memoryview(self._mmap)
+
+		header = _HEADER.unpack_from(buffer, 0)
+		(magic, version, mtime_ns, size, digest,
+		 self.width, self.height, self.tile_width, self.tile_height, has_background) = header[:10]
+		background = header[10:14]
+		texture_count, layer_count, tile_count, arrays_offset = header[14:]
+		self.background_color = background if has_background else None
+
+		offset = _HEADER.size
+		self.textures = [ ]
+		for i in range(texture_count):
+			image_file, offset = _unpack_string(buffer, offset)
+			image_x, image_y, width, height, flips = _TEXTURE.unpack_from(buffer, offset)
+			offset += _TEXTURE.size
+			point_count, = struct.unpack_from("<H", buffer, offset)
+			offset += 2
+			points = list(struct.iter_unpack("<ff", buffer[offset:offset + point_count * 8]))
+			offset += point_count * 8
+			properties, offset = _unpack_string(buffer, offset)
+			self.textures.append((image_file, image_x, image_y, width, height,
+								  flips, points, json.loads(properties)))
+
+		self.layers = { }
+		for i in range(layer_count):
+			name, offset = _unpack_string(buffer, offset)
+			self.layers[name] = _LAYER.unpack_from(buffer, offset)
+			offset += _LAYER.size
+
+		#the tile arrays are viewed straight out of the mapped file
+		stride = tile_count * 2
+		self.columns = buffer[arrays_offset:arrays_offset + stride].cast("H")
+		self.rows = buffer[arrays_offset + stride:arrays_offset + 2 * stride].cast("H")
+		self.texture_ids = buffer[arrays_offset + 2 * stride:arrays_offset + 3 * stride].cast("H")
+
+		self._loaded_textures = { }
+		self._hit_box_extents = { }
+
+	def _texture(self, index):
+		"""loads each texture once, from the spritesheets when they have the whole image"""
+		texture = self._loaded_textures.get(index)
+		if texture is None:
+			image_file, image_x, image_y, width, height, flips, points, properties = self.textures[index]
+			flipped = {"flipped_horizontally": bool(flips & _FLIPPED_HORIZONTALLY),
+					   "flipped_vertically": bool(flips & _FLIPPED_VERTICALLY),
+					   "flipped_diagonally": bool(flips & _FLIPPED_DIAGONALLY)}
+			entry = atlas.registry().find(image_file)
+			if entry and image_x == 0 and image_y == 0 and entry[3:] == (width, height):
+				texture = atlas.load_texture(image_file, **flipped)
+			else:
+				texture = arcade.load_texture(image_file, image_x, image_y, width, height, **flipped)
+			self._loaded_textures[index] = texture
+		return texture
+
+	def layer_range(self, layer_name):
+		"""first tile index and tile count of a layer, (0, 0) if it does not exist"""
+		if layer_name not in self.layers:
+			return 0, 0
+		alpha, first, count = self.layers[layer_name]
+		return first, count
+
+	def tile_bounds(self, index, scaling = 1):
+		"""left, right, bottom and top of a tile's hit box, without building its sprite"""
+		texture_id = self.texture_ids[index]
+		extents = self._hit_box_extents.get((texture_id, scaling))
+		if extents is None:
+			image_file, image_x, image_y, width, height, flips, points, properties = self.textures[texture_id]
+			if flips & _FLIPPED_DIAGONALLY:
+				#the image is transposed
+				width, height = height, width
+			#measured from the tile's bottom left corner
+			extents = (width * scaling / 2 + min(point[0] for point in points) * scaling,
+					   width * scaling / 2 + max(point[0] for point in points) * scaling,
+					   height * scaling / 2 + min(point[1] for point in points) * scaling,
+					   height * scaling / 2 + max(point[1] for point in points) * scaling)
+			self._hit_box_extents[texture_id, scaling] = extents
+		left, right, bottom, top = extents
+		x = self.columns[index] * (self.tile_width * scaling)
+		y = self.rows[index] * (self.tile_height * scaling)
+		return x + left, x + right, y + bottom, y + top
+
+	def create_sprite(self, index, scaling = 1):
+		"""builds the sprite for a single tile in the packed arrays"""
+		texture_id = self.texture_ids[index]
+		points, properties = self.textures[texture_id][6:]
+		sprite = arcade.Sprite(scale = scaling)
+		sprite.texture = self._texture(texture_id)
+		sprite.set_hit_box(points)
+		sprite.properties = dict(properties)
+		sprite.center_x = self.columns[index] * (self.tile_width * scaling) + sprite.width / 2
+		sprite.center_y = self.rows[index] * (self.tile_height * scaling) + sprite.height / 2
+		return sprite
+
+	def sprite_list(self, layer_name, scaling = 1, use_spatial_hash = None):
+		"""rebuilds a layer as a sprite list, the same way process_layer would"""
+		sprite_list = arcade.SpriteList(use_spatial_hash = use_spatial_hash)
+		if layer_name not in self.layers:
+			print(f"Warning, no layer named '{layer_name}'.")
+			return sprite_list
+
+		alpha, first, count = self.layers[layer_name]
+		for index in range(first, first + count):
+			sprite = self.create_sprite(index, scaling)
+			if alpha != 255:
+				sprite.alpha = alpha
+			sprite_list.append(sprite)
+		return sprite_list
+
+
+def load_level(map_name):
+	"""loads a level from its cache, compiling the tmx first if the cache is stale"""
+	cache_name = cache_path_for(map_name)
+	if not is_cache_valid(map_name, cache_name):
+		compile_level(map_name, cache_name)
+	return CompiledLevel(cache_name)
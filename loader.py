@@ -0,0 +1,103 @@
+"""
+Loads levels in the background so the window never freezes.
+
+A level load decodes the spritesheets, compiles or maps the level cache and
+decodes the sound effects on a thread pool, then builds the level's GameWorld on a
+worker too. None of that touches OpenGL. The sprite lists only upload to the
+GPU the first time they are drawn, which always happens on the main thread.
+
+The menus start loading the level as soon as they are shown, so by the time
+the player presses ENTER it is usually ready and the game starts at once.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import atlas
+import audio
+import level_cache
+import world
+from constants import *
+
+#threads shared by every load, decoding images mostly runs outside the GIL
+LOADER_THREADS = 4
+
+_executor = None
+_lock = threading.Lock()
+
+#map name -> LevelLoad that nobody has taken yet
+_pending = { }
+
+
+def _get_executor():
+	global _executor
+	if _executor is None:
+		_executor = ThreadPoolExecutor(max_workers = LOADER_THREADS, thread_name_prefix = "loader")
+	return _executor
+
+
+class LevelLoad:
+	"""one level loading in the background, poll done() from the main thread"""
+	def __init__(self, map_name):
+		self.map_name = map_name
+		self.world = world.GameWorld(map_name)
+
+		#built on the main thread so the workers never race to create them
+		textures = atlas.registry()
+		sounds = audio.manager()
+
+		executor = _get_executor()
+		#(what the step is doing, future)
+		self.steps = [ ]
+		for image_file in textures.sheet_files():
+			self.steps.append((f"decoding {image_file}",
+							   executor.submit(textures.sheet, image_file)))
+		self.steps.append(("reading the level", executor.submit(level_cache.load_level, map_name)))
+		for name in audio.SOUNDS:
+			self.steps.append((f"loading sound {name}", executor.submit(sounds.load, name)))
+
+		#building the world waits for everything above, so it only reads caches
+		prerequisites = [future for label, future in self.steps]
+		self.steps.append(("building the level", executor.submit(self._build, prerequisites)))
+
+	def _build(self, prerequisites):
+		wait(prerequisites)
+		self.world.setup()
+		return self.world
+
+	@property
+	def progress(self):
+		"""fraction of the steps that are finished"""
+		return sum(future.done() for label, future in self.steps) / len(self.steps)
+
+	@property
+	def status(self):
+		"""what the first unfinished step is doing"""
+		for label, future in self.steps:
+			if not future.done():
+				return label
+		return "done"
+
+	def done(self):
+		return all(future.done() for label, future in self.steps)
+
+	def result(self):
+		"""waits for the load and returns the world, re-raising any error from a worker"""
+		for label, future in self.steps:
+			future.result()
+		return self.world
+
+
+def preload(map_name = DEFAULT_MAP_NAME):
+	"""starts loading a level if it isn't loading already"""
+	with _lock:
+		load = _pending.get(map_name)
+		if load is None:
+			load = _pending[map_name] = LevelLoad(map_name)
+		return load
+
+def take(map_name = DEFAULT_MAP_NAME):
+	"""hands over a level load for a new game, starting one if there isn't one"""
+	load = preload(map_name)
+	with _lock:
+		_pending.pop(map_name, None)
+	return load
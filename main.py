@@ -1,113 +1,49 @@
 import arcade
+import os
 import time
 
-#constants
-SCREEN_HEIGHT = 800 
-SCREEN_WIDTH = 1200
-SCREEN_TITLE = "NAPP"
-TILE_SCALING = 1
-GRID_SIZE = 64
-LASER_SCALING = 0.5
-
-#player constants
-PLAYER_MOVEMENT_SPEED = 5
-PLAYER_SWIM_SPEED = 2
-PLAYER_JUMP_SPEED = 15
-PLAYER_DASH_SPEED = 15
-GRAVITY = 0.5
-FLUID_GRAVITY = 0.3
-LASER_SPEED = 25
-
-#enemy constants
-ENEMY_PATROL_SPEED = 3
-ENEMY_LASER_SPEED = 5
-
-STARTING_POINT = 0
-UPDATES_PER_FRAME = 5
-
-# How many pixels to keep as a minimum margin between the character
-# and the edge of the screen.
-LEFT_VIEWPORT_MARGIN = 250
-RIGHT_VIEWPORT_MARGIN = 250
-BOTTOM_VIEWPORT_MARGIN = 50
-TOP_VIEWPORT_MARGIN = 250
-
-RIGHT_FACING = 0
-LEFT_FACING = 1
-
-def load_texture_pair(filename):
-	"""load a texture pair"""
-	return [
-		arcade.load_texture(filename),
-		arcade.load_texture(filename, mirrored= True)
-	]
-
-class PlayerCharacter(arcade.Sprite):
-	"""Player sprite"""
-	def __init__(self):
-		#set up parent class
-		super().__init__()
-
-		#character faces right by default
-		self.character_face_direction = RIGHT_FACING
-
-		self.cur_texture = 0
-		self.scale = TILE_SCALING
-
-		#load textures
-		#main directory where art is held
-		main_path = "art/PNG/Players/Player Grey/playerGrey"
-
-		#load textures for idle
-		self.idle_texture = load_texture_pair(f"{main_path}_stand.png")
-
-		#load textures for running/walking
-		self.run_textures = [ ]
-		for i in range(6):
-			texture = load_texture_pair(f"{main_path}_walk{i}.png")
-			self.run_textures.append(texture)
-		
-		#set initial texture, default idle, facing right
-		self.texture = self.idle_texture[0]
-
-		#create hitbox
-		self.set_hit_box(self.texture.hit_box_points)		
-	
-	def update_animation(self, delta_time: float = 1/60):
-		
-		#figure out if its right or left
-		if self.change_x < 0 and self.character_face_direction == RIGHT_FACING:
-			self.character_face_direction = LEFT_FACING
-		elif self.change_x > 0 and self.character_face_direction == LEFT_FACING:
-			self.character_face_direction = RIGHT_FACING
-
-		#idle animation
-		if self.change_x == 0:
-			self.texture = self.idle_texture[self.character_face_direction]
-			return
-		
-		#running animation
-		self.cur_texture += 1
-		if self.cur_texture > 5 * UPDATES_PER_FRAME:
-			self.cur_texture = 1
-		self.texture = self.run_textures[self.cur_texture//UPDATES_PER_FRAME][self.character_face_direction]
+import audio
+import culling
+import instrumentation
+import loader
+import replay
+import text_cache
+import timestep
+import world
+from constants import *
+
+def start_game(window, map_name = DEFAULT_MAP_NAME):
+	"""shows the game straight away if its level has loaded, otherwise the loading view"""
+	load = loader.take(map_name)
+	if load.done():
+		game_view = GameView(map_name, load)
+		game_view.setup()
+		window.show_view(game_view)
+	else:
+		window.show_view(LoadingView(load))
 
 class MenuView(arcade.View):
 	"""class that handles the menu view"""
 	def on_show(self):
 		"""called when switching to this view"""
 		arcade.set_background_color(arcade.color.WHITE)
+		#load the level while the player reads the menus
+		loader.preload()
 
-	def on_draw(self):
-		"""draw the menu"""
-		arcade.start_render()
-		arcade.draw_text("NAPP", SCREEN_WIDTH/2, SCREEN_HEIGHT/2, arcade.color.BLACK, font_size = 60,
+		#the text never changes, so it is laid out once
+		self.text = text_cache.TextBatch()
+		self.text.add("NAPP", SCREEN_WIDTH/2, SCREEN_HEIGHT/2, arcade.color.BLACK, font_size = 60,
 		anchor_x = "center")
-		arcade.draw_text("Not Another Puzzle Platformer", SCREEN_WIDTH/2, 
+		self.text.add("Not Another Puzzle Platformer", SCREEN_WIDTH/2, 
 		SCREEN_HEIGHT/2 - 70, arcade.color.BLACK, font_size= 30, anchor_x= "center")
-		arcade.draw_text("Press ENTER to see the instructions", SCREEN_WIDTH/2,
+		self.text.add("Press ENTER to see the instructions", SCREEN_WIDTH/2,
 		SCREEN_HEIGHT - 500, arcade.color.BLACK, font_size=20, anchor_x="center")
 
+	def on_draw(self):
+		"""draw the menu"""
+		arcade.start_render()
+		self.text.draw()
+
 	def on_key_press(self, key, modifiers):
 		"""press return to advance to instrucitons"""
 		if key == arcade.key.ENTER:
@@ -119,556 +55,264 @@ class InstructionsView(arcade.View):
 	def on_show(self):
 		arcade.set_background_color(arcade.color.WHITE)
 
-	def on_draw(self):
-		arcade.start_render()
-		arcade.draw_text("Play through the level and find the golden star. Jump your way across platforms.", 
+		self.text = text_cache.TextBatch()
+		self.text.add("Play through the level and find the golden star. Jump your way across platforms.", 
 		SCREEN_WIDTH/2, SCREEN_HEIGHT-50, arcade.color.BLACK, font_size= 20, anchor_x= "center")
-		arcade.draw_text("Use WASD or the arrow keys to move and jump.", SCREEN_WIDTH/2, 
+		self.text.add("Use WASD or the arrow keys to move and jump.", SCREEN_WIDTH/2, 
 		SCREEN_HEIGHT-100, arcade.color.BLACK, font_size= 20, anchor_x= "center")
-		arcade.draw_text("Find red gems to unlock special abilities. These include:", SCREEN_WIDTH/2,
+		self.text.add("Find red gems to unlock special abilities. These include:", SCREEN_WIDTH/2,
 		SCREEN_HEIGHT -150, arcade.color.BLACK, font_size=20, anchor_x="center")
-		arcade.draw_text("SPACE to dash. E to deflect lasers. ENTER to shoot.", SCREEN_WIDTH/2,
+		self.text.add("SPACE to dash. E to deflect lasers. ENTER to shoot.", SCREEN_WIDTH/2,
 		SCREEN_HEIGHT -200, arcade.color.BLACK, font_size=20, anchor_x="center")
-		arcade.draw_text("But you only get one ability use per gem. Good luck out there.", SCREEN_WIDTH/2,
+		self.text.add("But you only get one ability use per gem. Good luck out there.", SCREEN_WIDTH/2,
 		SCREEN_HEIGHT -250, arcade.color.BLACK, font_size=20, anchor_x="center")
-		arcade.draw_text("Press ENTER to start the game!", SCREEN_WIDTH/2,
+		self.text.add("Press ENTER to start the game!", SCREEN_WIDTH/2,
 		SCREEN_HEIGHT - 300, arcade.color.BLACK, font_size=20, anchor_x="center")
 
+	def on_draw(self):
+		arcade.start_render()
+		self.text.draw()
+
 	def on_key_press(self, key, modifiers):
 		"""use mouse to advance game"""
 		if key == arcade.key.ENTER:
-			game_view = GameView()
+			start_game(self.window)
+
+class LoadingView(arcade.View):
+	"""shown while a level is still loading in the background"""
+	def __init__(self, load):
+		super().__init__()
+		self.load = load
+		self.text = text_cache.TextBatch()
+
+	def on_show(self):
+		arcade.set_background_color(arcade.color.WHITE)
+
+	def on_draw(self):
+		arcade.start_render()
+		self.text.begin()
+		self.text.add("Loading...", SCREEN_WIDTH/2, SCREEN_HEIGHT/2 + 40, arcade.color.BLACK,
+		font_size= 30, anchor_x= "center")
+		#progress bar
+		arcade.draw_lrtb_rectangle_outline(SCREEN_WIDTH/4, SCREEN_WIDTH*3/4, SCREEN_HEIGHT/2,
+		SCREEN_HEIGHT/2 - 20, arcade.color.BLACK)
+		arcade.draw_lrtb_rectangle_filled(SCREEN_WIDTH/4, SCREEN_WIDTH/4 + SCREEN_WIDTH/2 * self.load.progress,
+		SCREEN_HEIGHT/2, SCREEN_HEIGHT/2 - 20, arcade.color.BLACK)
+		self.text.add(self.load.status, SCREEN_WIDTH/2, SCREEN_HEIGHT/2 - 50, arcade.color.BLACK,
+		font_size= 12, anchor_x= "center")
+		self.text.draw()
+
+	def on_update(self, delta_time):
+		if self.load.done():
+			game_view = GameView(self.load.map_name, self.load)
 			game_view.setup()
 			self.window.show_view(game_view)
-	
+
 class GameView(arcade.View):
 	"""
-	Main application class
+	Main application class, the game's rules live in world.GameWorld and this
+	view handles the keyboard, sound, scrolling and drawing
 	"""
 
-	def __init__(self):
+	#which input bit each key sets
+	KEY_INPUTS = {
+		arcade.key.UP: INPUT_UP,
+		arcade.key.W: INPUT_UP,
+		arcade.key.DOWN: INPUT_DOWN,
+		arcade.key.S: INPUT_DOWN,
+		arcade.key.LEFT: INPUT_LEFT,
+		arcade.key.A: INPUT_LEFT,
+		arcade.key.RIGHT: INPUT_RIGHT,
+		arcade.key.D: INPUT_RIGHT,
+		arcade.key.SPACE: INPUT_DASH,
+		arcade.key.RETURN: INPUT_SHOOT,
+		arcade.key.E: INPUT_PARRY
+	}
+
+	def __init__(self, map_name = DEFAULT_MAP_NAME, load = None):
+		"""load is a finished loader.LevelLoad, without one the level loads in setup"""
 		#call parent class
 		super().__init__()
 
-		#keeps track of frames
-		self.frame_count = 0
-
-		self.ability_count = 0
-
-		#track player state
-		self.in_fluid = False
-		self.START_X = 64
-		self.START_Y = (12*GRID_SIZE) +32
-
-		#track current state of what key is pressed
-		self.left_pressed = False
-		self.right_pressed = False
-		self.up_pressed = False
-		self.down_pressed = False
-		self.jump_needs_reset = False
-		self.dash_pressed = False
-		self.shoot_pressed = False
-		self.parry_pressed = False
-
-		#lists to keep track of sprites
-		self.wall_list = None
-		self.coin_list = None
-		self.player_list = None
-		self.bullet_list = None
-		self.ladder_list = None
-		self.gem_list = None
-		self.checkpoint_list = None
-		self.objective_list = None
-
+		if load:
+			self.world = load.result()
+		else:
+			self.world = world.GameWorld(map_name)
 
-		self.player_sprite = None
-		self.physics_engine = None 
+		#effects are decoded once and shared by every game view
+		self.audio = audio.manager()
+		self.culler = None
 
-		self.checkpoint = -1
+		#every run is recorded from the start of the level, F5 saves it
+		self.recorder = None
 
-		self.distance = 0
+		#frame timing HUD on F3 and streaming to a file on F4, off by default
+		self.instrumentation = instrumentation.Instrumentation(self)
 
-		#keeps track of scroll margins
-		self.view_bottom = 0
-		self.view_left = 0
+		#last viewport handed to arcade
+		self.viewport = (0, 0)
 
-		#load sounds
-		self.jump_sound = arcade.load_sound(":resources:sounds/jump1.wav")
+		#the world ticks at a fixed rate, drawing blends between ticks
+		self.timestep = timestep.FixedTimestep()
+		self.interpolator = timestep.Interpolator()
+		self.previous_view = (0, 0)
 
 	def setup(self):
-		#creates the sprite lists
-		self.player_list = arcade.SpriteList()
-		self.bullet_list = arcade.SpriteList()
-		self.wall_list = arcade.SpriteList(use_spatial_hash=True)
-		self.water_list = arcade.SpriteList()
-		self.ladder_list = arcade.SpriteList()
-		self.enemy_list = arcade.SpriteList()
-		self.projectile_enemy_list = arcade.SpriteList()
-		self.enemy_laser_list = arcade.SpriteList()
-		self.invisible_platform_list = arcade.SpriteList()
-		self.checkpoint_list = arcade.SpriteList()
-		self.gem_list = arcade.SpriteList()
-		self.objective_list = arcade.SpriteList()
-
-		self.ability_reset_count = 0
-
-		#sets up the player and drops it at a location
-		self.player_sprite = PlayerCharacter()
-		self.player_sprite.center_x = self.START_X
-		self.player_sprite.center_y = self.START_Y
-		self.player_list.append(self.player_sprite)
-
-
-		#load map from map editor
-
-		#name of map file to load
-		map_name = "map/world_map.tmx"
-		#name of the layer in the file that has the platform
-		platforms_layer_name = 'Platforms'
-		ladders_layer_name = 'Ladders'
-		invisible_platform_layer_name = 'Invisible Platforms'
-
-		#layer containing items that will cause death and a reset
-		water_layer_name = 'Water'
-
-		#layer containing general enemies loaded in
-		enemy_layer_name = 'Enemies'
-
-		#layer contaning enemies that shoot projectiles
-		projectile_enemy_layer_name = 'Projectile Enemies'
-
-		#layer containing checkpoint
-		checkpoint_layer_name = 'Checkpoint'
-
-		#layer containing gems
-		gem_layer_name = 'Gems'
-
-		#layer containing the objective
-		objective_layer_name = 'Objective'
-
-		#read in tiled map
-		my_map = arcade.tilemap.read_tmx(map_name)
-		
-
-
-		#brings in platforms tiles
-		self.wall_list = arcade.tilemap.process_layer(map_object = my_map,
-													  layer_name = platforms_layer_name,
-													  scaling = TILE_SCALING)
-
-		#brings in ladder tiles
-		self.ladder_list = arcade.tilemap.process_layer(map_object = my_map,
-														layer_name = ladders_layer_name,
-														scaling=  TILE_SCALING)
-		
-		#water layer
-		self.water_list = arcade.tilemap.process_layer(map_object = my_map,
-														layer_name = water_layer_name,
-														scaling = TILE_SCALING)
-
-
-		#brings in general enemies
-		self.enemy_list = arcade.tilemap.process_layer(map_object= my_map,
-														layer_name= enemy_layer_name,
-														scaling=TILE_SCALING)
-
-		#brings in enemies that shoot projectiles
-		self.projectile_enemy_list = arcade.tilemap.process_layer(map_object=my_map,
-																layer_name=projectile_enemy_layer_name,
-																scaling= TILE_SCALING)
-
-		#brings in platforms that pen in enemies
-		self.invisible_platform_list = arcade.tilemap.process_layer(map_object = my_map,
-																	layer_name= invisible_platform_layer_name,
-																	scaling=TILE_SCALING)
-
-		#brings in checkpoint layers
-		self.checkpoint_list = arcade.tilemap.process_layer(map_object=my_map,
-		layer_name=checkpoint_layer_name,
-		scaling=TILE_SCALING)
-
-		#brings in gems
-		self.gem_list = arcade.tilemap.process_layer(map_object=my_map,
-													layer_name= gem_layer_name,
-													scaling=TILE_SCALING)
-
-		#brings in the objective
-		self.objective_list = arcade.tilemap.process_layer(map_object=my_map,
-		layer_name=objective_layer_name,
-		scaling=TILE_SCALING)
-
-
-		#creates a list of all the platforms that the physics engine takes a note of
-		self.all_platform_list = arcade.SpriteList(use_spatial_hash=True)
-		for platform in self.wall_list:
-			self.all_platform_list.append(platform)
-
-		if my_map.background_color:
-			arcade.set_background_color(my_map.background_color)
-
-		#create physics engine
-		self.physics_engine = arcade.PhysicsEnginePlatformer(self.player_sprite,
-															 self.all_platform_list,
-															 gravity_constant = GRAVITY,
-															 ladders = self.ladder_list)
+		if not self.world.ready:
+			self.world.setup()
+		game = self.world
+		self.recorder = replay.InputRecorder(game.map_name)
+		self.viewport = (0, 0)
+
+		if game.background_color:
+			arcade.set_background_color(game.background_color)
+
+		#the music streams from disk and carries on across restarts
+		self.audio.play_music()
+
+		#the tile layers never move, so they are baked into static batches by
+		#region, or by chunk when streamed, and only the ones on screen are drawn
+		self.culler = culling.ViewCuller(SCREEN_WIDTH, SCREEN_HEIGHT)
+		for name, layer_name, tile_list in (("water", WATER_LAYER_NAME, game.water_list),
+											("walls", PLATFORMS_LAYER_NAME, game.wall_list),
+											("ladders", LADDERS_LAYER_NAME, game.ladder_list)):
+			if game.chunk_streamer:
+				self.culler.add_layer(name, game.chunk_streamer.layer(layer_name))
+			else:
+				self.culler.add_static(name, tile_list)
+		self.culler.add_dynamic("checkpoint", game.checkpoint_list)
+		self.culler.add_dynamic("player", game.player_list)
+		self.culler.add_dynamic("bullets", game.bullet_list)
+		self.culler.add_dynamic("enemies", game.enemy_list)
+		self.culler.add_dynamic("projectile enemies", game.projectile_enemy_list)
+		self.culler.add_dynamic("gems", game.gem_list)
+		self.culler.add_dynamic("objective", game.objective_list)
+		self.culler.add_dynamic("enemy lasers", game.enemy_laser_list)
 
 	def on_show(self):
 		arcade.set_background_color(arcade.csscolor.AZURE)
 
-	def process_keychange(self):
-		# Process up/down
-		if self.up_pressed and not self.down_pressed:
-			if self.physics_engine.is_on_ladder():
-				self.player_sprite.change_y = PLAYER_MOVEMENT_SPEED
-			elif self.physics_engine.can_jump() and not self.jump_needs_reset:
-				self.player_sprite.change_y = PLAYER_JUMP_SPEED
-				self.jump_needs_reset = True
-				arcade.play_sound(self.jump_sound)
-		elif self.down_pressed and not self.up_pressed:
-			if self.physics_engine.is_on_ladder():
-				self.player_sprite.change_y = -PLAYER_MOVEMENT_SPEED
-
-		# Process up/down when on a ladder and no movement
-		if self.physics_engine.is_on_ladder():
-			if not self.up_pressed and not self.down_pressed:
-				self.player_sprite.change_y = 0
-			elif self.up_pressed and self.down_pressed:
-				self.player_sprite.change_y = 0
-
-		# Process left/right
-		if self.right_pressed and not self.left_pressed:
-			self.player_sprite.change_x = PLAYER_MOVEMENT_SPEED
-		elif self.left_pressed and not self.right_pressed:
-			self.player_sprite.change_x = -PLAYER_MOVEMENT_SPEED
-		else:
-			self.player_sprite.change_x = 0
-
-		#process dash
-		if self.dash_pressed and self.right_pressed and self.ability_count > 0:
-			self.player_sprite.change_x = PLAYER_DASH_SPEED
-		elif self.dash_pressed and self.left_pressed and self.ability_count >0:
-			self.player_sprite.change_x = -PLAYER_DASH_SPEED
-		
-		#process shooting
-		if self.shoot_pressed and self.left_pressed and self.ability_count > 0:
-			#creates laser
-			laser = arcade.Sprite("art/PNG/lasers/laserBlueHorizontal.png", scale=LASER_SCALING)
-			#position the laser
-			laser.center_x = self.player_sprite.center_x
-			laser.center_y = self.player_sprite.center_y
-			#gives laser speed and direction
-			laser.change_x = -LASER_SPEED
-			self.bullet_list.append(laser)
-			#removes ability after being used once
-			self.ability_count -=1
-		elif self.shoot_pressed and self.ability_count > 0:
-			#creates laser
-			laser = arcade.Sprite("art/PNG/lasers/laserBlueHorizontal.png", scale=LASER_SCALING)
-			#position the laser
-			laser.center_x = self.player_sprite.center_x
-			laser.center_y = self.player_sprite.center_y
-			#gives laser speed and direction
-			laser.change_x = LASER_SPEED
-			self.bullet_list.append(laser)
-			#removes ability after being used once
-			self.ability_count -=1
-
-		#process swimming
-		if self.in_fluid == True:
-			#reduces gravity to give swimming a floatier feel
-			self.physics_engine = arcade.PhysicsEnginePlatformer(self.player_sprite,
-			self.all_platform_list,
-			gravity_constant= FLUID_GRAVITY,
-			ladders=self.ladder_list)
-			#process underwater movement left/right/up/down
-			if self.left_pressed:
-				self.player_sprite.change_x = -PLAYER_SWIM_SPEED
-			elif self.right_pressed:
-				self.player_sprite.change_x = PLAYER_SWIM_SPEED
-			elif self.up_pressed:
-				self.player_sprite.change_y = PLAYER_SWIM_SPEED
-			elif self.down_pressed:
-				self.player_sprite.change_y = -PLAYER_SWIM_SPEED
-			#process underwater dash
-			elif self.dash_pressed and self.right_pressed:
-				self.player_sprite.change_x = PLAYER_DASH_SPEED
-			elif self.dash_pressed and self.left_pressed:
-				self.player_sprite.change_x = -PLAYER_DASH_SPEED
-			#underwater parry should work regardless, test this out
-		else:
-			#returns physics back to normal
-			self.physics_engine = arcade.PhysicsEnginePlatformer(self.player_sprite,
-															 self.all_platform_list,
-															 gravity_constant = GRAVITY,
-															 ladders = self.ladder_list)
+	def restart(self):
+		"""puts the level back as it was loaded, reusing everything already built"""
+		self.world.restart()
+		self.recorder = replay.InputRecorder(self.world.map_name)
+		self.timestep.reset()
+		self.interpolator.reset()
+		self.previous_view = (0, 0)
+		self.viewport = (0, 0)
+		arcade.set_viewport(0, SCREEN_WIDTH, 0, SCREEN_HEIGHT)
 
 	def on_key_press(self, key, modifiers):
 		"""called whenever a key is pressed"""
-		if key == arcade.key.UP or key == arcade.key.W:
-			self.up_pressed = True
-		elif key == arcade.key.DOWN or key == arcade.key.S:
-			self.down_pressed = True
-		elif key == arcade.key.LEFT or key == arcade.key.A:
-			self.left_pressed = True
-		elif key == arcade.key.RIGHT or key == arcade.key.D:
-			self.right_pressed = True
-		elif key == arcade.key.SPACE:
-			self.dash_pressed = True
-		elif key == arcade.key.RETURN:
-			self.shoot_pressed = True
-		elif key == arcade.key.E:
-			self.parry_pressed = True
-
-		self.process_keychange()
+		if key == arcade.key.F3:
+			self.instrumentation.toggle_hud()
+		elif key == arcade.key.F4:
+			self.instrumentation.toggle_stream()
+		elif key == arcade.key.F5:
+			self.save_replay()
+
+		flag = self.KEY_INPUTS.get(key, 0)
+		if self.world.input_state & flag == flag:
+			#keys that are unknown or already held still re-apply the held keys
+			self.send_input(self.world.input_state, refresh = True)
+		else:
+			self.send_input(self.world.input_state | flag)
+		self.handle_events()
 
 	def on_key_release(self, key, modifiers):
 		"""Called when the user releases a key. """
-
-		if key == arcade.key.UP or key == arcade.key.W:
-			self.up_pressed = False
-			self.jump_needs_reset = False
-		elif key == arcade.key.DOWN or key == arcade.key.S:
-			self.down_pressed = False
-		elif key == arcade.key.LEFT or key == arcade.key.A:
-			self.left_pressed = False
-		elif key == arcade.key.RIGHT or key == arcade.key.D:
-			self.right_pressed = False
-		elif key == arcade.key.SPACE:
-			self.dash_pressed = False
-			if self.ability_count > 0:
-				self.ability_count -= 1
-			print(self.ability_count)
-		elif key == arcade.key.RETURN:
-			self.shoot_pressed = False
-		elif key == arcade.key.E:
-			self.parry_pressed = False
+		state = self.world.input_state & ~self.KEY_INPUTS.get(key, 0)
+		if state != self.world.input_state:
+			self.send_input(state)
+
+	def send_input(self, state, refresh = False):
+		"""hands the held keys to the world, recording them on the way"""
+		self.recorder.input(state, refresh)
+		self.world.apply_input(state, refresh)
+
+	def save_replay(self):
+		"""writes the run so far to the replays folder"""
+		os.makedirs("replays", exist_ok = True)
+		file_name = f"replays/replay_{int(time.time())}.rep"
+		self.recorder.save(file_name)
+		print(f"replay saved to {file_name}")
+
+	def handle_events(self):
+		"""plays sounds and switches views for what happened in the world"""
+		for event in self.world.take_events():
+			if event == 'jump':
+				self.audio.play("jump")
+			elif event == 'win':
+				win_view = WinView(self)
+				self.window.show_view(win_view)
 
 	def on_draw(self):
 		"""render the screen"""
+		#draw the moving sprites and the camera part way between the last two
+		#ticks, by however far the time left over has got to the next one
+		alpha = self.timestep.alpha
+		previous_left, previous_bottom = self.previous_view
+		view_left = int(previous_left + (self.world.view_left - previous_left) * alpha)
+		view_bottom = int(previous_bottom + (self.world.view_bottom - previous_bottom) * alpha)
+
+		#scroll if the camera moved
+		viewport = (view_left, view_bottom)
+		if viewport != self.viewport:
+			self.viewport = viewport
+			arcade.set_viewport(view_left,
+								SCREEN_WIDTH + view_left,
+								view_bottom,
+								SCREEN_HEIGHT + view_bottom)
+
 		arcade.start_render()
-		self.water_list.draw()
-		self.wall_list.draw()
-		self.ladder_list.draw()
-		self.checkpoint_list.draw()
-		self.player_list.draw()
-		self.bullet_list.draw()
-		self.enemy_list.draw()
-		self.projectile_enemy_list.draw()
-		self.gem_list.draw()
-		self.objective_list.draw()
-		self.enemy_laser_list.draw()
-		#move to draw function and draw individually
-
-
-	def reset_position(self):
-		#move the player to start
-		self.player_sprite.center_x = self.START_X
-		self.player_sprite.center_y = self.START_Y
-
-		#reset camera to start
-		self.view_left = 0
-		self.view_bottom = 0
-		changed_viewport = 0
-		self.ability_count += self.ability_reset_count
-		self.ability_reset_count = 0
+		self.interpolator.apply(alpha)
+		#draws water, walls, ladders, checkpoint, player, bullets, enemies,
+		#projectile enemies, gems, objective and enemy lasers, in that order,
+		#leaving out tile batches that are off screen
+		self.culler.draw(view_left, view_bottom)
+		self.interpolator.undo()
+		if self.instrumentation.hud_visible:
+			self.instrumentation.draw_hud()
 
 	def on_update(self, delta_time):
-		""" Movement and game logic """
-		self.frame_count += 1
-
-		# Move the player with the physics engine
-		self.physics_engine.update()
-
-		#check if the player is in water, water is always at a certain level, so
-		#can just check if player is below this level
-
-		if self.player_sprite.center_y < 9 * GRID_SIZE:
-			self.in_fluid = True
-		else:
-			self.in_fluid = False
-
-		# Update animations
-		if self.physics_engine.can_jump():
-			self.player_sprite.can_jump = False
-		else:
-			self.player_sprite.can_jump = True
-
-		if self.physics_engine.is_on_ladder() and not self.physics_engine.can_jump():
-			self.player_sprite.is_on_ladder = True
-			self.process_keychange()
-		else:
-			self.player_sprite.is_on_ladder = False
-			self.process_keychange()
-
-		self.player_list.update_animation(delta_time)
-
-		self.bullet_list.update()
-
-		#remove lasers if they go offscreen to save memory
-		for laser in self.bullet_list:
-			if laser.center_x + 18 > self.view_left + SCREEN_WIDTH:
-				laser.remove_from_sprite_lists()
-				print('laser removed')
-			elif laser.center_x - 18 < self.view_left:
-				laser.remove_from_sprite_lists()
-				print('laser removed')
-
-		#check to see if enemies were hit by player laser, in which case they are 
-		#destroyed
-		for laser in self.bullet_list:
-			enemy_hit_list = arcade.check_for_collision_with_list(laser, self.enemy_list)
-			projectile_enemy_hit_list = arcade.check_for_collision_with_list(laser, self.projectile_enemy_list)
-			if len(enemy_hit_list) > 0:
-				laser.remove_from_sprite_lists()
-				for enemy in enemy_hit_list:
-					enemy.remove_from_sprite_lists()
-				continue
-			elif len(projectile_enemy_hit_list) > 0:
-				laser.remove_from_sprite_lists()
-				for enemy in projectile_enemy_hit_list:
-					enemy.remove_from_sprite_lists()
-				continue
-
-		#check to see if gems were contacted by player sprite, in which case the 
-		#player gains an ability point
-		gem_hit_list = arcade.check_for_collision_with_list(self.player_sprite, self.gem_list)
-		for gem in gem_hit_list:
-			self.ability_reset_count += 1
-			gem.remove_from_sprite_lists()
-			#add the gems collected to a list so they can be recalled upon reset
-			self.ability_count += 1
-
-		#make enemies patrol on platforms
-		#create invisible platforms in foreground, i.e. platforms we do not call in
-		#draw, and then if enemy collides with these, they turn around
-		for enemy in self.enemy_list:
-			if enemy.change_x >0.5 and arcade.check_for_collision_with_list(enemy, self.invisible_platform_list):
-				enemy.change_x = -ENEMY_PATROL_SPEED 
-			elif enemy.change_x <-0.5 and arcade.check_for_collision_with_list(enemy, self.invisible_platform_list):
-				enemy.change_x = ENEMY_PATROL_SPEED
-			elif enemy.change_x == 0:
-				enemy.change_x = ENEMY_PATROL_SPEED
-
-
-		self.frame_count +=1
-		for enemy in self.projectile_enemy_list:
-			if self.frame_count % 240 == 0:
-				enemy_laser = arcade.Sprite("art/PNG/lasers/laserRedVertical.png", scale=LASER_SCALING)
-				enemy_laser.center_x = enemy.center_x
-				enemy_laser.center_y = enemy.center_y - 54
-				enemy_laser.change_y = -ENEMY_LASER_SPEED
-				self.enemy_laser_list.append(enemy_laser)
-
-		for laser in self.enemy_laser_list:
-			projectile_enemy_hit_list = arcade.check_for_collision_with_list(laser, self.projectile_enemy_list)
-			#removes laser if it hits a platform
-			if arcade.check_for_collision_with_list(laser, self.wall_list):
-				laser.remove_from_sprite_lists()
-			if len(projectile_enemy_hit_list) >0:
-				laser.remove_from_sprite_lists()
-				for enemy in projectile_enemy_hit_list:
-					enemy.remove_from_sprite_lists()
-				continue
-			#gets distance between player and laser, then creates parry mechanic
-			self.distance = arcade.get_distance_between_sprites(laser, self.player_sprite)
-			if self.parry_pressed and self.distance < 80:
-				laser.change_y = ENEMY_LASER_SPEED
-
-		self.enemy_laser_list.update()
-		self.projectile_enemy_list.update()
-
-		self.enemy_list.update()
-
-		#----TRACK DEATH EVENTS----#
-
-		#check if player fell off map, this also works for the player falls in
-		#water, as the water level is always nine grid blocks above 0
-		if self.player_sprite.center_y < 1 * GRID_SIZE:
-			self.reset_position()
-
-		# print(self.player_sprite.center_y)
-
-		#check if player came into contact with general/type enemy, and then 'dies'
-		if arcade.check_for_collision_with_list(self.player_sprite, self.enemy_list):
-			self.reset_position()
-		
-		if arcade.check_for_collision_with_list(self.player_sprite, self.projectile_enemy_list):
-			self.reset_position()
-
-		if arcade.check_for_collision_with_list(self.player_sprite, self.enemy_laser_list):
-			self.reset_position()
-
-		#checks to see if the player hit the checkpoint, in which case their
-		#starting coordinates are reset to the checkpoint
-		if arcade.check_for_collision_with_list(self.player_sprite, self.checkpoint_list):
-			print('checkpoint collision detectedd')
-			#coordinates should roughly be 2400, 992
-			self.START_X = self.checkpoint_list[0].center_x
-			self.START_Y = self.checkpoint_list[0].center_y
-			print(self.START_X)
-
-		#checks to see if player has found the objective and has won the game!
-		if arcade.check_for_collision_with_list(self.player_sprite, self.objective_list):
-			win_view = WinView()
-			self.window.show_view(win_view)
-
-		# Track if we need to change the viewport
-		changed = False
-
-        # Scroll left
-		left_boundary = self.view_left + LEFT_VIEWPORT_MARGIN
-		if self.player_sprite.left < left_boundary:
-			self.view_left -= left_boundary - self.player_sprite.left
-			changed = True
-
-        # Scroll right
-		right_boundary = self.view_left + SCREEN_WIDTH - RIGHT_VIEWPORT_MARGIN
-		if self.player_sprite.right > right_boundary:
-			self.view_left += self.player_sprite.right - right_boundary
-			changed = True
-
-		# Scroll up
-		top_boundary = self.view_bottom + SCREEN_HEIGHT - TOP_VIEWPORT_MARGIN
-		if self.player_sprite.top > top_boundary:
-			self.view_bottom += self.player_sprite.top - top_boundary
-			changed = True
-
-        # Scroll down
-		bottom_boundary = self.view_bottom + BOTTOM_VIEWPORT_MARGIN
-		if self.player_sprite.bottom < bottom_boundary:
-			self.view_bottom -= bottom_boundary - self.player_sprite.bottom
-			changed = True
-
-		if changed:
-            # Only scroll to integers. Otherwise we end up with pixels that
-            # don't line up on the screen
-			self.view_bottom = int(self.view_bottom)
-			self.view_left = int(self.view_left)
-
-            # Do the scrolling
-			arcade.set_viewport(self.view_left,
-								SCREEN_WIDTH + self.view_left,
-								self.view_bottom,
-								SCREEN_HEIGHT + self.view_bottom)
+		""" Movement and game logic, run as however many fixed ticks are due """
+		game = self.world
+		for tick in range(self.timestep.advance(delta_time)):
+			self.interpolator.capture(game.player_list,
+									  (game.enemy_store, game.projectile_enemy_store,
+									   game.bullet_store, game.enemy_laser_store))
+			self.previous_view = (game.view_left, game.view_bottom)
+			game.step(self.timestep.tick_time)
+			self.recorder.end_frame(game)
+			self.handle_events()
+			if game.won:
+				break
 
 class WinView(arcade.View):
 	"""class containing the game won screen"""
+	def __init__(self, game_view):
+		super().__init__()
+		#the finished game, restarting puts its level back in place
+		self.game_view = game_view
+
 	def on_show(self):
 		arcade.set_background_color(arcade.color.WHITE)
 
-	def on_draw(self):
-		arcade.start_render()
-		arcade.draw_text("Congratulations!", 
+		self.text = text_cache.TextBatch()
+		self.text.add("Congratulations!", 
 		SCREEN_WIDTH/2, SCREEN_HEIGHT-100, arcade.color.BLACK, font_size= 30, anchor_x= "center")
-		arcade.draw_text("Press R to restart or press ESC to quit.", SCREEN_WIDTH/2, 
+		self.text.add("Press R to restart or press ESC to quit.", SCREEN_WIDTH/2, 
 		SCREEN_HEIGHT/2, arcade.color.BLACK, font_size= 15, anchor_x= "center")
 
+	def on_draw(self):
+		arcade.start_render()
+		self.text.draw()
+
 	def on_key_press(self, key, modifiers):
 		"""use mouse to advance game"""
 		if key == arcade.key.R:
-			game_view = GameView()
-			game_view.setup()
-			self.window.show_view(game_view)
+			self.game_view.restart()
+			self.window.show_view(self.game_view)
 		elif key == arcade.key.ESCAPE:
 			arcade.close_window()
 
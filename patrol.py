@@ -0,0 +1,87 @@
+"""
+Patrol limits worked out from the 'Invisible Platforms' layer.
+
+Enemies walk left and right until they run into a tile of the invisible
+platform layer, then turn round. Those tiles never move, so instead of hit
+testing every enemy against them every tick, each enemy's row is scanned
+once when the level loads. The nearest marker on either side gives the
+centre x past which the enemy would overlap it, and the world only has to
+compare positions against those limits.
+
+	python patrol.py [maps...]
+
+reports every enemy that is missing a marker on either side, or that starts
+out overlapping one.
+"""
+import math
+import sys
+
+#limits of an enemy with no marker on a side, it walks on forever that way
+NO_BOUNDS = (-math.inf, math.inf)
+
+
+def _extents(sprite):
+	"""left, right, bottom and top of a sprite's hit box"""
+	points = sprite.get_adjusted_hit_box()
+	return (min(point[0] for point in points), max(point[0] for point in points),
+			min(point[1] for point in points), max(point[1] for point in points))
+
+def scan(enemy, markers):
+	"""
+	casts a ray left and right along an enemy's row, returns the lowest and
+	highest centre x it can reach without overlapping a marker, and the
+	markers it overlaps where it stands
+	"""
+	left, right, bottom, top = _extents(enemy)
+	min_x, max_x = NO_BOUNDS
+	overlapping = [ ]
+	for marker in markers:
+		marker_left, marker_right, marker_bottom, marker_top = marker
+		#touching edges don't count as a hit, same as arcade's collision checks
+		if marker_bottom >= top or marker_top <= bottom:
+			continue
+		if marker_left >= right:
+			max_x = min(max_x, marker_left - (right - enemy.center_x))
+		elif marker_right <= left:
+			min_x = max(min_x, marker_right - (left - enemy.center_x))
+		else:
+			overlapping.append(marker)
+	return (min_x, max_x), overlapping
+
+def patrol_bounds(enemies, platforms):
+	"""enemy -> (min x, max x) for every enemy, scanning against the platform tiles"""
+	markers = [_extents(platform) for platform in platforms]
+	return {enemy: scan(enemy, markers)[0] for enemy in enemies}
+
+def problems(enemies, platforms):
+	"""a line for every enemy that won't patrol between two markers"""
+	markers = [_extents(platform) for platform in platforms]
+	lines = [ ]
+	for enemy in enemies:
+		(min_x, max_x), overlapping = scan(enemy, markers)
+		where = f"enemy at ({enemy.center_x:.0f}, {enemy.center_y:.0f})"
+		if overlapping:
+			lines.append(f"{where} starts inside {len(overlapping)} marker(s)")
+		if min_x == -math.inf:
+			lines.append(f"{where} has no marker on its left")
+		if max_x == math.inf:
+			lines.append(f"{where} has no marker on its right")
+	return lines
+
+
+def main():
+	"""loads each map and reports enemies missing their patrol markers"""
+	import world
+	from constants import DEFAULT_MAP_NAME
+
+	for map_name in sys.argv[1:] or [DEFAULT_MAP_NAME]:
+		game = world.GameWorld(map_name)
+		game.setup()
+		lines = problems(game.enemy_list, game.invisible_platform_list)
+		for line in lines:
+			print(f"{map_name}: {line}")
+		print(f"{map_name}: {len(game.enemy_list)} enemies, {len(lines)} problem(s)")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,398 @@
+"""
+Checks that a level can be finished, without running the game.
+
+The level's 'Platforms', 'Ladders' and 'Water' layers are turned into a
+movement graph over its tiles. A node is a tile the player can stay in: one
+with ground or the top of a ladder under it, a ladder or water. Edges are
+the moves between them, climbing, swimming, and walking or jumping off to
+wherever the player comes down. How high and how far a jump goes is worked
+out once per map by following it tick by tick with PLAYER_JUMP_SPEED,
+GRAVITY and the walking speed, and again with PLAYER_DASH_SPEED for jumps
+that need a dash, which costs an ability. Jumps off the bottom of a pool use
+FLUID_GRAVITY and the swimming speed.
+
+A jump is checked against the tiles in its way as an arch: straight up
+from the take off tile, across, then straight down to where it lands. That
+misses the odd jump that only works along a tight curve, never the other
+way round.
+
+The edges are built on a process pool, one task per square of
+REACHABILITY_REGION_SIZE tiles. The graph is then searched from the start,
+counting the fewest abilities needed to get to every tile, and the report
+lists:
+	- pickups that can't be reached, and any that need more abilities than
+	  there are gems to be had on the way
+	- dead ends, tiles the player can get to but never get from to the
+	  objective, falling off the bottom of the map counts as a way out
+
+	python reachability.py [maps...] [--workers N]
+
+exits with 1 if any map has a problem, so it can gate every map change.
+"""
+import pyglet
+
+#no window is ever opened, so don't let pyglet create a hidden one on import
+pyglet.options['shadow_window'] = False
+
+import collections
+import concurrent.futures
+import math
+import sys
+import time
+
+import level_cache
+import terrain
+from constants import *
+
+#hit box of the player's standing texture, at TILE_SCALING
+PLAYER_WIDTH = 36 * TILE_SCALING
+PLAYER_HEIGHT = 45 * TILE_SCALING
+
+#where a move ends when the player falls off the bottom of the map
+DEATH = -1
+
+#set up in every worker by _start_worker
+_width = 0
+_cells = None
+_settle = None
+_jumps = None
+_swim_jumps = None
+
+
+class JumpReach:
+	"""how far a jump can go, by the free tiles above the take off tile and how much higher it lands"""
+	def __init__(self, speed, gravity, depth, cell_width, cell_height, cost = 0):
+		self.cost = cost
+		#lowest rise looked up, a fall from the top of the map to its bottom
+		self.depth = depth
+
+		#the highest the player's box can reach, in tiles above the take off tile
+		apex = PLAYER_JUMP_SPEED ** 2 / (2 * gravity)
+		self.max_headroom = max(0, math.ceil((apex + PLAYER_HEIGHT) / cell_height) - 1)
+
+		#headroom -> columns, indexed by rise + depth
+		self.columns = [self._follow(speed, gravity, (headroom + 1) * cell_height,
+									 cell_width, cell_height)
+						for headroom in range(self.max_headroom + 1)]
+
+	def _follow(self, speed, gravity, ceiling, cell_width, cell_height):
+		"""
+		follows a jump under a ceiling, returns how many tiles to the side it
+		can land at most for every rise, -1 where it can't get that high
+		"""
+		#rise -> columns at the last tick the player's feet were in that tile
+		last = { }
+		x = y = 0.0
+		change_y = PLAYER_JUMP_SPEED
+		while y >= -self.depth * cell_height:
+			#same order as the physics engine, gravity then the move
+			change_y -= gravity
+			y += change_y
+			if y + PLAYER_HEIGHT > ceiling:
+				y = ceiling - PLAYER_HEIGHT
+				change_y = 0
+			x += speed
+			#the player can take off with its box hanging over the edge of the
+			#take off tile and lands as soon as its box reaches over the landing tile
+			last[math.floor(y / cell_height)] = math.ceil((cell_width + PLAYER_WIDTH + x) / cell_width) - 1
+
+		#a tile can be landed on from anywhere the feet came down past it
+		columns = [-1] * (self.depth + self.max_headroom + 1)
+		farthest = -1
+		for rise in range(self.max_headroom, -self.depth - 1, -1):
+			farthest = max(farthest, last.get(rise, -1))
+			columns[rise + self.depth] = farthest
+		return columns
+
+
+def _is_standable(cells, width, index):
+	"""whether the player can stay in a tile, without falling out of it"""
+	if index < width or cells[index] & TERRAIN_SOLID:
+		return False
+	if cells[index] & (TERRAIN_LADDER | TERRAIN_WATER):
+		return True
+	return bool(cells[index - width] & (TERRAIN_SOLID | TERRAIN_LADDER))
+
+def settle_map(cells, width, height):
+	"""for every open tile, the tile the player comes to rest in falling from it, DEATH off the bottom"""
+	settle = [DEATH] * (width * height)
+	for column in range(width):
+		resting = DEATH
+		for row in range(height):
+			index = row * width + column
+			if cells[index] & TERRAIN_SOLID:
+				resting = DEATH
+				continue
+			if _is_standable(cells, width, index):
+				resting = index
+			settle[index] = resting
+	return settle
+
+
+def _start_worker(width, cells, settle, jumps, swim_jumps):
+	global _width, _cells, _settle, _jumps, _swim_jumps
+	_width = width
+	_cells = cells
+	_settle = settle
+	_jumps = jumps
+	_swim_jumps = swim_jumps
+
+def _headroom(index, most):
+	"""free tiles straight above a tile, up to most"""
+	headroom = 0
+	index += _width
+	while headroom < most and index < len(_cells) and not _cells[index] & TERRAIN_SOLID:
+		headroom += 1
+		index += _width
+	return headroom
+
+def _add_edge(edges, target, cost):
+	if cost < edges.get(target, math.inf):
+		edges[target] = cost
+
+def _step(edges, index, column_step, row_step):
+	"""moves one tile across or up and down, then falls to rest"""
+	column = index % _width + column_step
+	target = index + column_step + row_step * _width
+	if not 0 <= column < _width or not 0 <= target < len(_cells) or _cells[target] & TERRAIN_SOLID:
+		return
+	_add_edge(edges, _settle[target], 0)
+
+def _jump(edges, index, reach):
+	"""every tile a jump off a tile can land in, up onto higher tiles or down past lower ones"""
+	column = index % _width
+	row = index // _width
+	headroom = _headroom(index, reach.max_headroom)
+	columns = reach.columns[headroom]
+	farthest = max(columns)
+	for lift in range(headroom + 1):
+		#row the jump goes across in, straight above the take off tile
+		across = index + lift * _width
+		for step in (-1, 1):
+			for distance in range(1, farthest + 1):
+				if not 0 <= column + step * distance < _width:
+					break
+				passing = across + step * distance
+				if _cells[passing] & TERRAIN_SOLID:
+					break
+				target = _settle[passing]
+				rise = -reach.depth if target == DEATH else target // _width - row
+				if distance <= columns[rise + reach.depth]:
+					_add_edge(edges, target, reach.cost)
+
+def _region_edges(indices):
+	"""node -> {target: abilities used} for every node of a region"""
+	result = [ ]
+	for index in indices:
+		edges = { }
+		cell = _cells[index]
+		below = _cells[index - _width]
+		if cell & TERRAIN_LADDER:
+			#climbing, or stepping off the side
+			for column_step, row_step in ((0, 1), (0, -1), (-1, 0), (1, 0)):
+				_step(edges, index, column_step, row_step)
+		elif cell & TERRAIN_WATER:
+			for column_step, row_step in ((0, 1), (0, -1), (-1, 0), (1, 0)):
+				_step(edges, index, column_step, row_step)
+			if below & TERRAIN_SOLID:
+				_jump(edges, index, _swim_jumps)
+		elif below & TERRAIN_SOLID:
+			for reach in _jumps:
+				_jump(edges, index, reach)
+		else:
+			#on top of a ladder, climbing back down or stepping off the side
+			for column_step, row_step in ((0, -1), (-1, 0), (1, 0)):
+				_step(edges, index, column_step, row_step)
+		edges.pop(index, None)
+		result.append((index, edges))
+	return result
+
+
+def build_graph(terrain_map, workers = None, region_size = REACHABILITY_REGION_SIZE):
+	"""node -> {target: abilities used} for every tile the player can stay in"""
+	width = terrain_map.width
+	height = terrain_map.height
+	cells = bytes(terrain_map.cells)
+	settle = settle_map(cells, width, height)
+	jumps = (JumpReach(PLAYER_MOVEMENT_SPEED, GRAVITY, height, terrain_map.cell_width,
+					   terrain_map.cell_height),
+			 JumpReach(PLAYER_DASH_SPEED, GRAVITY, height, terrain_map.cell_width,
+					   terrain_map.cell_height, cost = 1))
+	swim_jumps = JumpReach(PLAYER_SWIM_SPEED, FLUID_GRAVITY, height, terrain_map.cell_width,
+						   terrain_map.cell_height)
+
+	regions = [ ]
+	for first_row in range(0, height, region_size):
+		for first_column in range(0, width, region_size):
+			indices = [row * width + column
+					   for row in range(first_row, min(height, first_row + region_size))
+					   for column in range(first_column, min(width, first_column + region_size))
+					   if _is_standable(cells, width, row * width + column)]
+			if indices:
+				regions.append(indices)
+
+	graph = { }
+	with concurrent.futures.ProcessPoolExecutor(max_workers = workers, initializer = _start_worker,
+												initargs = (width, cells, settle, jumps, swim_jumps)) as pool:
+		for region in pool.map(_region_edges, regions):
+			graph.update(region)
+	return graph, settle
+
+
+def fewest_abilities(graph, start):
+	"""node -> fewest abilities used getting there from start, for every node that can be reached"""
+	used = {start: 0}
+	queue = collections.deque([start])
+	while queue:
+		index = queue.popleft()
+		for target, cost in graph.get(index, { }).items():
+			total = used[index] + cost
+			if total < used.get(target, math.inf):
+				used[target] = total
+				#free moves go to the front, so nodes come out in order of abilities used
+				if cost:
+					queue.append(target)
+				else:
+					queue.appendleft(target)
+	return used
+
+def can_finish(graph, goals, start):
+	"""every node the goals can be reached from, including by falling off the map and starting over"""
+	sources = collections.defaultdict(list)
+	for index, edges in graph.items():
+		for target in edges:
+			sources[target].append(index)
+	finished = set(goals)
+	queue = collections.deque(finished)
+	while queue:
+		index = queue.popleft()
+		#falling off the map goes back to the start
+		previous = sources[index] + (sources[DEATH] if index == start else [ ])
+		for source in previous:
+			if source not in finished:
+				finished.add(source)
+				queue.append(source)
+	return finished
+
+
+def _pickups(level, layer_name, terrain_map):
+	"""tile indices each pickup of a layer covers"""
+	first, count = level.layer_range(layer_name)
+	pickups = [ ]
+	for index in range(first, first + count):
+		left, right, bottom, top = level.tile_bounds(index, TILE_SCALING)
+		pickups.append([row * terrain_map.width + column
+						for row in range(terrain_map._row(bottom), math.ceil(top / terrain_map.cell_height))
+						for column in range(terrain_map._column(left), math.ceil(right / terrain_map.cell_width))])
+	return pickups
+
+def _touching(index, terrain_map, reach):
+	"""nodes the player can touch a tile from, in it or jumping up from below"""
+	cells = terrain_map.cells
+	width = terrain_map.width
+	for lift in range(reach.max_headroom + 1):
+		if index < 0 or cells[index] & TERRAIN_SOLID:
+			return
+		yield index
+		index -= width
+
+def _where(index, terrain_map):
+	return f"tile ({index % terrain_map.width}, {index // terrain_map.width})"
+
+
+def analyze(map_name, workers = None):
+	"""the problems with a level, and a summary of it, as lines of text"""
+	import world
+
+	level = level_cache.load_level(map_name)
+	terrain_map = terrain.from_level(level, {PLATFORMS_LAYER_NAME: TERRAIN_SOLID,
+											 LADDERS_LAYER_NAME: TERRAIN_LADDER,
+											 WATER_LAYER_NAME: TERRAIN_WATER}, TILE_SCALING)
+	graph, settle = build_graph(terrain_map, workers)
+
+	game = world.GameWorld(map_name)
+	#a start above the top of the map drops in from its top row
+	row = min(terrain_map.height - 1, terrain_map._row(game.START_Y - PLAYER_HEIGHT / 2))
+	start = settle[row * terrain_map.width + terrain_map._column(game.START_X)]
+	used = fewest_abilities(graph, start)
+
+	#fewest abilities needed for each pickup, inf when it can't be reached
+	reach = JumpReach(PLAYER_MOVEMENT_SPEED, GRAVITY, terrain_map.height, terrain_map.cell_width,
+					  terrain_map.cell_height)
+	def needed(pickup):
+		return min((used.get(node, math.inf) for index in pickup
+					for node in _touching(index, terrain_map, reach)), default = math.inf)
+
+	problems = [ ]
+	named = [ ]
+	for name, layer_name in (("gem", GEM_LAYER_NAME), ("checkpoint", CHECKPOINT_LAYER_NAME),
+							 ("objective", OBJECTIVE_LAYER_NAME)):
+		named += [(name, pickup, needed(pickup)) for pickup in _pickups(level, layer_name, terrain_map)]
+	gems = [abilities for name, pickup, abilities in named if name == "gem"]
+	for name, pickup, abilities in named:
+		if abilities == math.inf:
+			problems.append(f"{name} at {_where(pickup[0], terrain_map)} can't be reached")
+		elif abilities:
+			#each gem gives one ability, so there have to be enough on the way
+			on_the_way = sum(1 for gem in gems if gem < abilities)
+			if on_the_way < abilities:
+				problems.append(f"{name} at {_where(pickup[0], terrain_map)} needs {abilities} "
+								f"abilities, only {on_the_way} gem(s) can be reached before it")
+
+	objectives = _pickups(level, OBJECTIVE_LAYER_NAME, terrain_map)
+	if not objectives:
+		problems.append("there is no objective")
+	else:
+		goals = {node for pickup in objectives for index in pickup
+				 for node in _touching(index, terrain_map, reach) if node in graph}
+		finished = can_finish(graph, goals, start)
+		stuck = {index for index in used if index != DEATH and index not in finished}
+		#groups the dead ends into areas joined by moves either way, biggest first
+		neighbours = collections.defaultdict(list)
+		for index in stuck:
+			for target in graph[index]:
+				if target in stuck:
+					neighbours[index].append(target)
+					neighbours[target].append(index)
+		areas = [ ]
+		while stuck:
+			area = [stuck.pop()]
+			for index in area:
+				for target in neighbours[index]:
+					if target in stuck:
+						stuck.remove(target)
+						area.append(target)
+			areas.append(area)
+		for area in sorted(areas, key = len, reverse = True):
+			problems.append(f"dead end of {len(area)} tile(s) around {_where(min(area), terrain_map)}, "
+							f"the objective can't be reached from it")
+
+	reached = [abilities for name, pickup, abilities in named if abilities != math.inf]
+	summary = (f"{len([index for index in used if index != DEATH])} of {len(graph)} tiles reachable, "
+			   f"{len(reached)} of {len(named)} pickups, needing at most "
+			   f"{max(reached, default = 0)} abilities, {len(problems)} problem(s)")
+	return problems, summary
+
+
+def main():
+	"""analyzes each map, exits with 1 if any of them has a problem"""
+	arguments = sys.argv[1:]
+	workers = None
+	if "--workers" in arguments:
+		at = arguments.index("--workers")
+		workers = int(arguments[at + 1])
+		del arguments[at:at + 2]
+
+	failed = False
+	for map_name in arguments or [DEFAULT_MAP_NAME]:
+		started = time.perf_counter()
+		problems, summary = analyze(map_name, workers)
+		for line in problems:
+			print(f"{map_name}: {line}")
+		print(f"{map_name}: {summary} in {time.perf_counter() - started:.1f}s")
+		failed = failed or bool(problems)
+	sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,162 @@
+"""
+Records the input of a play session and replays it on a fixed timestep.
+
+	python replay.py replays/replay_1700000000.rep [--realtime]
+
+A replay holds, for every simulated frame, the input states that were applied
+before that frame was stepped. The world is deterministic for a given input
+stream, so replaying the file from a fresh level reproduces the same player
+trajectory. A checksum of the trajectory is stored to prove it, which makes
+replays usable as repeatable performance workloads.
+
+File layout: a short header (magic, version, map name, frame count,
+trajectory checksum) followed by the zlib compressed frames. Each frame is a
+count byte followed by that many input bytes, where the low seven bits are
+the input bitmask and the top bit marks a key press that did not change the
+held keys but still re-applied them.
+"""
+import struct
+import time
+import zlib
+
+REPLAY_MAGIC = b"NAPPREP\0"
+REPLAY_VERSION = 1
+
+#magic, version, frame count, trajectory checksum
+_HEADER = struct.Struct("<8sHII")
+
+_REFRESH = 0x80
+
+#replays are always stepped at this rate, whatever the recording ran at
+REPLAY_FRAME_TIME = 1/60
+
+
+def trajectory_checksum(checksum, game):
+	"""folds the player's position after a frame into a running checksum"""
+	position = struct.pack("<ff", game.player_sprite.center_x, game.player_sprite.center_y)
+	return zlib.crc32(position, checksum)
+
+
+class InputRecorder:
+	"""collects the input applied before each frame of a session"""
+	def __init__(self, map_name):
+		self.map_name = map_name
+		self.frames = bytearray()
+		self.frame_count = 0
+		self.checksum = 0
+		self._pending = bytearray()
+
+	def input(self, state, refresh = False):
+		"""called with every input state handed to the world between frames"""
+		self._pending.append(state | (_REFRESH if refresh else 0))
+
+	def end_frame(self, game):
+		"""called once the world has stepped a frame"""
+		#a frame with more than 255 key changes is not something a person can do
+		pending = self._pending[:255]
+		self.frames.append(len(pending))
+		self.frames += pending
+		self._pending = bytearray()
+		self.frame_count += 1
+		self.checksum = trajectory_checksum(self.checksum, game)
+
+	def save(self, file_name):
+		name = self.map_name.encode("utf-8")
+		with open(file_name, "wb") as file:
+			file.write(_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, self.frame_count, self.checksum))
+			file.write(struct.pack("<H", len(name)) + name)
+			file.write(zlib.compress(bytes(self.frames)))
+
+
+class Replay:
+	"""a recorded session that can be fed back into a world"""
+	def __init__(self, map_name, frame_count, checksum, frames):
+		self.map_name = map_name
+		self.frame_count = frame_count
+		self.checksum = checksum
+		self.frames = frames
+
+	@classmethod
+	def load(cls, file_name):
+		with open(file_name, "rb") as file:
+			data = file.read()
+		magic, version, frame_count, checksum = _HEADER.unpack_from(data, 0)
+		if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+			raise ValueError(f"{file_name} is not a version {REPLAY_VERSION} replay")
+		offset = _HEADER.size
+		length, = struct.unpack_from("<H", data, offset)
+		offset += 2
+		map_name = data[offset:offset + length].decode("utf-8")
+		frames = zlib.decompress(data[offset + length:])
+		return cls(map_name, frame_count, checksum, frames)
+
+	def inputs(self):
+		"""yields the input bytes to apply before each frame"""
+		offset = 0
+		for frame in range(self.frame_count):
+			count = self.frames[offset]
+			yield self.frames[offset + 1:offset + 1 + count]
+			offset += 1 + count
+
+	def play(self, game, realtime = False, on_frame = None):
+		"""
+		steps a freshly set up world through the recording on a fixed timestep,
+		returns the trajectory checksum so it can be compared with the recording
+		"""
+		checksum = 0
+		next_frame = time.perf_counter()
+		for frame_inputs in self.inputs():
+			for value in frame_inputs:
+				game.apply_input(value & ~_REFRESH, refresh = bool(value & _REFRESH))
+			game.step(REPLAY_FRAME_TIME)
+			game.take_events()
+			checksum = trajectory_checksum(checksum, game)
+			if on_frame:
+				on_frame(game)
+
+			#wait for the next tick when replaying at the recorded speed
+			if realtime:
+				next_frame += REPLAY_FRAME_TIME
+				delay = next_frame - time.perf_counter()
+				if delay > 0:
+					time.sleep(delay)
+		return checksum
+
+
+def main():
+	import argparse
+
+	import pyglet
+	#no window is ever opened, so don't let pyglet create a hidden one on import
+	pyglet.options['shadow_window'] = False
+	import world
+
+	parser = argparse.ArgumentParser(description = "replay a recorded session without a window")
+	parser.add_argument("replay")
+	parser.add_argument("--realtime", action = "store_true", help = "step at 60 frames a second")
+	args = parser.parse_args()
+
+	replay = Replay.load(args.replay)
+	game = world.GameWorld(replay.map_name)
+	game.setup()
+
+	frame_times = [ ]
+	last = [time.perf_counter()]
+
+	def on_frame(game):
+		now = time.perf_counter()
+		frame_times.append(now - last[0])
+		last[0] = now
+
+	checksum = replay.play(game, realtime = args.realtime, on_frame = on_frame)
+	matched = checksum == replay.checksum
+	if frame_times:
+		frame_times.sort()
+		print(f"{len(frame_times)} frames, mean {sum(frame_times) / len(frame_times) * 1000:.3f}ms, "
+			  f"worst {frame_times[-1] * 1000:.3f}ms")
+	print("trajectory matches the recording" if matched else "trajectory DIFFERS from the recording")
+	return 0 if matched else 1
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
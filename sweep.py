@@ -0,0 +1,181 @@
+"""
+Tries out many tunings of the movement constants at once, without a window.
+
+	python sweep.py --set GRAVITY=0.3:0.7:5 --set FLUID_GRAVITY=0.1,0.2,0.3
+	python sweep.py --map map/world_map.tmx --set PLAYER_JUMP_SPEED=12:18:7 --output jumps.csv
+
+Every --set gives one of MOVEMENT_CONSTANTS either a list of values or a
+start:stop:count range, both ends included, and every combination of them
+is a tuning. Each tuning gets a fresh GameWorld on the real level, and a
+set of scripted moves is played through the player's physics engine: a jump
+standing still, a running jump, a dash jump and a swim up from the bottom
+of the level's deepest water with a stroke every SWIM_STROKE_FRAMES. The
+tunings are shared out between worker processes and the results are
+written to a csv table, one row per tuning, with a blank where a move
+couldn't be made on the level. Without --output the table goes into
+sweeps/, named after when the sweep started.
+"""
+import pyglet
+
+#no window is ever opened, so don't let pyglet create a hidden one on import
+pyglet.options['shadow_window'] = False
+
+import argparse
+import concurrent.futures
+import csv
+import itertools
+import os
+import time
+
+import world
+from constants import *
+
+#one simulated frame, the rules assume 60 updates a second
+FRAME_TIME = 1/60
+
+#longest the player gets to land, on the way to the start or after a jump
+SETTLE_FRAMES = 600
+
+#the swim lasts this long, pressing up once every SWIM_STROKE_FRAMES
+SWIM_FRAMES = 120
+SWIM_STROKE_FRAMES = 20
+
+COLUMNS = ("jump_height", "air_time", "running_jump_distance", "dash_jump_distance",
+		   "swim_ascent_rate")
+
+
+def parse_range(text):
+	"""'NAME=a,b,c' or 'NAME=start:stop:count' as the name and its values"""
+	name, _, values = text.partition("=")
+	if name not in MOVEMENT_CONSTANTS:
+		raise argparse.ArgumentTypeError(f"{name} is not one of {', '.join(MOVEMENT_CONSTANTS)}")
+	try:
+		if ":" in values:
+			start, stop, count = values.split(":")
+			start, stop, count = float(start), float(stop), int(count)
+			if count < 2:
+				return name, [start]
+			return name, [round(start + (stop - start) * i / (count - 1), 6) for i in range(count)]
+		return name, [float(value) for value in values.split(",")]
+	except ValueError:
+		raise argparse.ArgumentTypeError(f"can't read the values of {text}")
+
+def tunings(ranges):
+	"""every combination of the values of the ranges, as name -> value"""
+	names = [name for name, values in ranges]
+	return [dict(zip(names, combination))
+			for combination in itertools.product(*(values for name, values in ranges))]
+
+
+def _step(game, state):
+	game.apply_input(state)
+	game.update_physics(FRAME_TIME)
+
+def _land(game):
+	"""steps with nothing pressed until the player is on the ground, False if they never are"""
+	for frame in range(SETTLE_FRAMES):
+		_step(game, 0)
+		if game.physics_engine.can_jump() and game.player_sprite.change_y == 0:
+			return True
+	return False
+
+def _jump(game, held):
+	"""
+	jumps from the start holding some keys the whole way, returns how high
+	and how far it went and how many frames it was in the air, None if the
+	player couldn't land before or after
+	"""
+	game.reset_position()
+	game.player_sprite.change_x = game.player_sprite.change_y = 0
+	if not _land(game):
+		return None
+	ground_x = game.player_sprite.center_x
+	ground_y = highest = game.player_sprite.center_y
+
+	_step(game, held | INPUT_UP)
+	frames = 1
+	while frames < SETTLE_FRAMES:
+		highest = max(highest, game.player_sprite.center_y)
+		if game.physics_engine.can_jump() and game.player_sprite.change_y <= 0:
+			break
+		_step(game, held)
+		frames += 1
+	else:
+		return None
+	_step(game, 0)
+	return highest - ground_y, abs(game.player_sprite.center_x - ground_x), frames
+
+def _swim(game):
+	"""average speed the player rises at swimming up from the bottom of the water, None with no water"""
+	start = game.terrain.deepest(TERRAIN_WATER, avoid = TERRAIN_SOLID)
+	if start is None:
+		return None
+	game.player_sprite.center_x, game.player_sprite.center_y = start
+	game.player_sprite.change_x = game.player_sprite.change_y = 0
+	_step(game, 0)
+	if not game.in_fluid:
+		return None
+	start_y = game.player_sprite.center_y
+	for frame in range(SWIM_FRAMES):
+		_step(game, INPUT_UP if frame % SWIM_STROKE_FRAMES == 0 else 0)
+		if not game.in_fluid:
+			break
+	return (game.player_sprite.center_y - start_y) / ((frame + 1) * FRAME_TIME)
+
+def measure(job):
+	"""plays the scripted moves on a fresh world with a tuning, returns a row of the results table"""
+	map_name, tuning = job
+	game = world.GameWorld(map_name, tuning)
+	game.setup()
+	row = dict(tuning)
+
+	jump = _jump(game, 0)
+	if jump:
+		row["jump_height"] = round(jump[0], 1)
+		row["air_time"] = round(jump[2] * FRAME_TIME, 3)
+	running_jump = _jump(game, INPUT_RIGHT)
+	if running_jump:
+		row["running_jump_distance"] = round(running_jump[1], 1)
+	#a dash costs an ability
+	game.ability_count = 1
+	dash_jump = _jump(game, INPUT_RIGHT | INPUT_DASH)
+	if dash_jump:
+		row["dash_jump_distance"] = round(dash_jump[1], 1)
+	swim_ascent_rate = _swim(game)
+	if swim_ascent_rate is not None:
+		row["swim_ascent_rate"] = round(swim_ascent_rate, 1)
+	return row
+
+
+def main():
+	parser = argparse.ArgumentParser(description = "measure the player's moves for many tunings")
+	parser.add_argument("--map", default = DEFAULT_MAP_NAME)
+	parser.add_argument("--set", dest = "ranges", type = parse_range, action = "append", default = [ ],
+						metavar = "NAME=VALUES", help = "values to try, a,b,c or start:stop:count")
+	parser.add_argument("--workers", type = int, default = None,
+						help = "worker processes, one per core by default")
+	parser.add_argument("--output", default = None, help = "where to save the csv table")
+	args = parser.parse_args()
+
+	jobs = [(args.map, tuning) for tuning in tunings(args.ranges)]
+	names = [name for name, values in args.ranges]
+
+	output = args.output
+	if output is None:
+		os.makedirs("sweeps", exist_ok = True)
+		output = time.strftime("sweeps/%Y%m%d_%H%M%S.csv")
+
+	start = time.perf_counter()
+	with open(output, "w", newline = "") as file:
+		writer = csv.DictWriter(file, fieldnames = names + list(COLUMNS))
+		writer.writeheader()
+		with concurrent.futures.ProcessPoolExecutor(max_workers = args.workers) as pool:
+			for row in pool.map(measure, jobs, chunksize = 4):
+				writer.writerow(row)
+				print(", ".join(f"{name} {row.get(name, '-')}" for name in names + list(COLUMNS)))
+
+	print(f"{len(jobs)} tuning(s) in {time.perf_counter() - start:.1f}s, written to {output}")
+
+
+if __name__ == "__main__":
+	main()
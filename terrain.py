@@ -0,0 +1,184 @@
+"""
+A tile-grid occupancy map of the level's terrain.
+
+Every tile of the level gets a byte in a flat array, indexed by
+row * width + column with rows counted from the bottom of the map. The
+byte's bits say what the tile holds: solid ground, a ladder or water. It
+is built from the compiled level at load time, so asking what is at a
+point, inside a box or along a ray looks at a handful of bytes instead of
+querying sprite lists.
+
+A tile's bits cover every cell its hit box reaches into. A box that finds
+no bits can't be touching any of those tiles, so callers skip the exact hit
+box check. When bits are found, the sprites are checked exactly as before.
+"""
+import math
+
+import numpy
+
+#boxes are widened by this much, so rounding never hides a tile the exact
+#check would have hit
+TERRAIN_SLACK = 0.01
+
+
+class TerrainMap:
+	"""flags of every tile of a level, see the TERRAIN_ constants"""
+	def __init__(self, width, height, cell_width, cell_height):
+		self.width = width
+		self.height = height
+		self.cell_width = cell_width
+		self.cell_height = cell_height
+		self.cells = bytearray(width * height)
+
+	def _column(self, x):
+		return int(x // self.cell_width)
+
+	def _row(self, y):
+		return int(y // self.cell_height)
+
+	def mark(self, column, row, flags):
+		if 0 <= column < self.width and 0 <= row < self.height:
+			self.cells[row * self.width + column] |= flags
+
+	def flags_at(self, x, y):
+		"""flags of the tile under a point, nothing outside the map"""
+		column = self._column(x)
+		row = self._row(y)
+		if 0 <= column < self.width and 0 <= row < self.height:
+			return self.cells[row * self.width + column]
+		return 0
+
+	def box_flags(self, left, right, bottom, top):
+		"""flags of every tile a box reaches into, combined"""
+		first_column = max(0, self._column(left))
+		last_column = min(self.width - 1, self._column(right))
+		first_row = max(0, self._row(bottom))
+		last_row = min(self.height - 1, self._row(top))
+		flags = 0
+		cells = self.cells
+		for row in range(first_row, last_row + 1):
+			start = row * self.width
+			for index in range(start + first_column, start + last_column + 1):
+				flags |= cells[index]
+		return flags
+
+	def boxes_flags(self, left, right, bottom, top):
+		"""box_flags of many boxes at once, given as NumPy arrays of their edges"""
+		flags = numpy.zeros(len(left), dtype = numpy.uint8)
+		if not len(left):
+			return flags
+		cells = numpy.frombuffer(self.cells, dtype = numpy.uint8)
+		first_column = numpy.maximum(0, numpy.floor_divide(left, self.cell_width).astype(numpy.int64))
+		last_column = numpy.minimum(self.width - 1, numpy.floor_divide(right, self.cell_width).astype(numpy.int64))
+		first_row = numpy.maximum(0, numpy.floor_divide(bottom, self.cell_height).astype(numpy.int64))
+		last_row = numpy.minimum(self.height - 1, numpy.floor_divide(top, self.cell_height).astype(numpy.int64))
+		columns = last_column - first_column
+		rows = last_row - first_row
+		first = first_row * self.width + first_column
+		#boxes are small next to a tile, so step through the few cells each one covers
+		for column_step in range(int(columns.max()) + 1):
+			for row_step in range(int(rows.max()) + 1):
+				inside = (columns >= column_step) & (rows >= row_step)
+				flags[inside] |= cells[first[inside] + (row_step * self.width + column_step)]
+		return flags
+
+	def deepest(self, flags, avoid = 0):
+		"""
+		centre of the lowest tile of the tallest column of tiles with any of
+		the flags and none of avoid, e.g. the bottom of the deepest water,
+		None if no tile has them
+		"""
+		best = None
+		best_depth = 0
+		for column in range(self.width):
+			depth = 0
+			for row in range(self.height - 1, -1, -1):
+				cell = self.cells[row * self.width + column]
+				if cell & flags and not cell & avoid:
+					depth += 1
+					if depth > best_depth:
+						best = (column, row)
+						best_depth = depth
+				else:
+					depth = 0
+		if best is None:
+			return None
+		return (best[0] + 0.5) * self.cell_width, (best[1] + 0.5) * self.cell_height
+
+	def sprite_flags(self, sprite, offset_y = 0):
+		"""flags of every tile a sprite's hit box reaches into"""
+		points = sprite.get_adjusted_hit_box()
+		return self.box_flags(min(point[0] for point in points) - TERRAIN_SLACK,
+							  max(point[0] for point in points) + TERRAIN_SLACK,
+							  min(point[1] for point in points) + offset_y - TERRAIN_SLACK,
+							  max(point[1] for point in points) + offset_y + TERRAIN_SLACK)
+
+	def raycast(self, x, y, direction_x, direction_y, flags, max_distance = math.inf):
+		"""
+		walks the tiles along a ray, returns how far it goes before it enters
+		a tile with any of the flags, or None if it leaves the map or runs out
+		"""
+		length = math.hypot(direction_x, direction_y)
+		if length == 0:
+			return None
+		direction_x /= length
+		direction_y /= length
+
+		column = self._column(x)
+		row = self._row(y)
+		step_column = 1 if direction_x > 0 else -1
+		step_row = 1 if direction_y > 0 else -1
+
+		#distance along the ray to the next column and row boundary, and
+		#between two boundaries
+		if direction_x:
+			next_x = (column + (step_column > 0)) * self.cell_width
+			to_column = (next_x - x) / direction_x
+			per_column = self.cell_width / abs(direction_x)
+		else:
+			to_column = per_column = math.inf
+		if direction_y:
+			next_y = (row + (step_row > 0)) * self.cell_height
+			to_row = (next_y - y) / direction_y
+			per_row = self.cell_height / abs(direction_y)
+		else:
+			to_row = per_row = math.inf
+
+		distance = 0.0
+		while distance <= max_distance:
+			if 0 <= column < self.width and 0 <= row < self.height:
+				if self.cells[row * self.width + column] & flags:
+					return distance
+			elif ((column < 0 and step_column < 0) or (column >= self.width and step_column > 0) or
+				  (row < 0 and step_row < 0) or (row >= self.height and step_row > 0)):
+				return None
+			if to_column < to_row:
+				distance = to_column
+				to_column += per_column
+				column += step_column
+			else:
+				distance = to_row
+				to_row += per_row
+				row += step_row
+		return None
+
+
+def from_level(level, layer_flags, scaling = 1):
+	"""builds the terrain map of a compiled level, layer_flags is layer name -> flags"""
+	cell_width = level.tile_width * scaling
+	cell_height = level.tile_height * scaling
+	terrain = TerrainMap(level.width, level.height, cell_width, cell_height)
+	for layer_name, flags in layer_flags.items():
+		first, count = level.layer_range(layer_name)
+		for index in range(first, first + count):
+			left, right, bottom, top = level.tile_bounds(index, scaling)
+			#touching an edge isn't a hit, so a hit box ending on a cell
+			#boundary doesn't reach into the next cell
+			first_column = terrain._column(left)
+			last_column = max(first_column, math.ceil(right / cell_width) - 1)
+			first_row = terrain._row(bottom)
+			last_row = max(first_row, math.ceil(top / cell_height) - 1)
+			for row in range(first_row, last_row + 1):
+				for column in range(first_column, last_column + 1):
+					terrain.mark(column, row, flags)
+	return terrain
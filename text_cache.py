@@ -0,0 +1,119 @@
+"""
+Text rendered once and drawn in batches.
+
+arcade.draw_text lays out and draws every string on its own, and its cache
+only ever empties when it gets huge. TextCache renders each distinct string,
+colour and font size to a texture once, and keeps the most recently used
+TEXT_CACHE_SIZE of them. TextBatch puts a view's text on sprites in a single
+sprite list, so it all goes to the GPU in one draw. Views with fixed text fill
+a batch once, the loading view refills its batch every frame and mostly hits
+the cache. The profiler HUD refills its own a few times a second, through a
+small cache of its own.
+"""
+import collections
+
+import arcade
+
+from constants import *
+
+_cache = None
+
+
+class TextCache:
+	"""textures of rendered text, the least recently used are dropped first"""
+	def __init__(self, capacity = TEXT_CACHE_SIZE):
+		self.capacity = capacity
+		#(text, colour, font size, font name) -> texture, oldest first
+		self.textures = collections.OrderedDict()
+
+		#keeps track of how well the cache is sized
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def texture(self, text, color, font_size = 12, font_name = arcade.DEFAULT_FONT_NAMES):
+		"""the texture of a string, rendered the first time it is asked for"""
+		rgb = tuple(color[:3])
+		key = (text, rgb, font_size, font_name)
+		texture = self.textures.get(key)
+		if texture is not None:
+			self.hits += 1
+			self.textures.move_to_end(key)
+			return texture
+
+		self.misses += 1
+		image = arcade.get_text_image(text, rgb + (255,), font_size, font_name = font_name)
+		texture = arcade.Texture(f"text:{rgb}:{font_size}:{font_name}:{text}", image)
+		self.textures[key] = texture
+		if len(self.textures) > self.capacity:
+			self.textures.popitem(last = False)
+			self.evictions += 1
+		return texture
+
+	def stats(self):
+		return {
+			"hits": self.hits,
+			"misses": self.misses,
+			"evictions": self.evictions,
+			"size": len(self.textures)
+		}
+
+
+class TextBatch:
+	"""a view's text as sprites in one sprite list, drawn with one call"""
+	def __init__(self, cache = None):
+		self.cache = cache or text_cache()
+		self.sprite_list = arcade.SpriteList()
+		#sprites in use since the last begin, the rest are dropped on draw
+		self.count = 0
+
+	def begin(self):
+		"""starts over, for text that changes from frame to frame"""
+		self.count = 0
+
+	def add(self, text, start_x, start_y, color, font_size = 12, anchor_x = "left",
+			anchor_y = "baseline"):
+		"""adds a string, placed the same way arcade.draw_text places it"""
+		texture = self.cache.texture(text, color, font_size)
+		if self.count < len(self.sprite_list):
+			sprite = self.sprite_list[self.count]
+			sprite.texture = texture
+		else:
+			sprite = arcade.Sprite()
+			sprite.texture = texture
+			self.sprite_list.append(sprite)
+		self.count += 1
+
+		if anchor_x == "left":
+			sprite.center_x = start_x + sprite.width / 2
+		elif anchor_x == "center":
+			sprite.center_x = start_x
+		elif anchor_x == "right":
+			sprite.center_x = start_x - sprite.width / 2
+		else:
+			raise ValueError(f"anchor_x should be 'left', 'center', or 'right'. Not '{anchor_x}'")
+
+		if anchor_y == "top":
+			sprite.center_y = start_y - sprite.height / 2
+		elif anchor_y == "center":
+			sprite.center_y = start_y
+		elif anchor_y in ("bottom", "baseline"):
+			sprite.center_y = start_y + sprite.height / 2
+		else:
+			raise ValueError(f"anchor_y should be 'top', 'center', 'bottom', or 'baseline'. Not '{anchor_y}'")
+
+		sprite.alpha = color[3] if len(color) > 3 else 255
+		return sprite
+
+	def draw(self):
+		while len(self.sprite_list) > self.count:
+			self.sprite_list.pop()
+		self.sprite_list.draw()
+
+
+def text_cache():
+	"""the text cache shared by every view"""
+	global _cache
+	if _cache is None:
+		_cache = TextCache()
+	return _cache
@@ -0,0 +1,121 @@
+"""
+Fixed-timestep scheduling for GameView.
+
+The window calls on_update once per rendered frame, whatever the display's
+refresh rate or however long the last frame took. FixedTimestep turns that
+time into a whole number of simulation ticks, so the world always moves at
+TICK_RATE ticks a second. Time left over carries on to the next frame, and
+after a long stall at most MAX_TICKS_PER_FRAME ticks are run.
+
+Since drawing falls between ticks, Interpolator blends moving sprites from
+where they were before the latest tick towards where they are now, by how
+far the leftover time has got towards the next tick. Sprites in an entity
+store have their positions copied into arrays kept from tick to tick, and
+only the awake ones are blended, so parked lasers and sleeping enemies cost
+nothing.
+"""
+import numpy
+
+from constants import *
+
+
+class FixedTimestep:
+	"""an accumulator that hands out fixed length ticks"""
+	def __init__(self, tick_rate = TICK_RATE, max_ticks = MAX_TICKS_PER_FRAME):
+		self.tick_time = 1 / tick_rate
+		self.max_ticks = max_ticks
+		self.accumulator = 0.0
+
+		#keeps track of how the game is keeping up
+		self.ticks = 0
+		self.dropped_time = 0.0
+
+	def advance(self, delta_time):
+		"""adds a frame's time and returns how many ticks to run for it"""
+		self.accumulator += delta_time
+		ticks = int(self.accumulator / self.tick_time)
+		if ticks > self.max_ticks:
+			#too far behind, let go of the time that can't be caught up
+			self.dropped_time += (ticks - self.max_ticks) * self.tick_time
+			ticks = self.max_ticks
+			self.accumulator = self.accumulator % self.tick_time
+		else:
+			self.accumulator -= ticks * self.tick_time
+		self.ticks += ticks
+		return ticks
+
+	@property
+	def alpha(self):
+		"""how far the leftover time is towards the next tick, from 0 to 1"""
+		return min(1.0, self.accumulator / self.tick_time)
+
+	def reset(self):
+		self.accumulator = 0.0
+
+
+class Interpolator:
+	"""blends sprites between their last two ticks while they are drawn"""
+	def __init__(self, max_distance = MAX_INTERPOLATION_DISTANCE):
+		self.max_distance = max_distance
+
+		#sprite -> position before the latest tick, for sprites outside a store
+		self.previous = { }
+
+		#entity store -> x, y and whether each slot was awake before the latest tick
+		self.previous_stores = { }
+
+		#sprite -> real position, while blended positions are being drawn
+		self.current = { }
+
+	def capture(self, sprites, stores = ()):
+		"""call before every tick with the sprites that move, and the entity stores of the rest"""
+		for sprite in sprites:
+			self.previous[sprite] = (sprite.center_x, sprite.center_y)
+		for store in stores:
+			arrays = self.previous_stores.get(store)
+			#only allocates again when the store has grown
+			if arrays is None or len(arrays[0]) != len(store.x):
+				arrays = self.previous_stores[store] = (numpy.empty_like(store.x), numpy.empty_like(store.y),
+														numpy.empty_like(store.alive))
+			previous_x, previous_y, awake = arrays
+			numpy.copyto(previous_x, store.x)
+			numpy.copyto(previous_y, store.y)
+			numpy.logical_and(store.alive, store.awake, out = awake)
+
+	def _blend(self, sprite, x, y, previous_x, previous_y, alpha):
+		if abs(x - previous_x) > self.max_distance or abs(y - previous_y) > self.max_distance:
+			return
+		self.current[sprite] = (x, y)
+		sprite.center_x = previous_x + (x - previous_x) * alpha
+		sprite.center_y = previous_y + (y - previous_y) * alpha
+
+	def apply(self, alpha):
+		"""moves the sprites to their blended positions, call undo after drawing"""
+		self.current.clear()
+		if alpha >= 1.0:
+			return
+		for sprite, (previous_x, previous_y) in self.previous.items():
+			x = sprite.center_x
+			y = sprite.center_y
+			if x != previous_x or y != previous_y:
+				self._blend(sprite, x, y, previous_x, previous_y, alpha)
+		for store, (previous_x, previous_y, awake) in self.previous_stores.items():
+			if len(awake) != len(store.x):
+				continue
+			#sprites that were awake going into the tick and moved in it
+			moved = awake & store.alive & ((store.x != previous_x) | (store.y != previous_y))
+			for slot in numpy.flatnonzero(moved):
+				self._blend(store.sprites[slot], float(store.x[slot]), float(store.y[slot]),
+							float(previous_x[slot]), float(previous_y[slot]), alpha)
+
+	def undo(self):
+		"""puts the sprites back where the simulation has them"""
+		for sprite, (x, y) in self.current.items():
+			sprite.center_x = x
+			sprite.center_y = y
+		self.current.clear()
+
+	def reset(self):
+		self.previous = { }
+		self.previous_stores = { }
+		self.current = { }
@@ -0,0 +1,176 @@
+"""
+Trigger zones, areas of the level that do something when the player goes
+into or out of them.
+
+Zones are built once when the level loads: one per gem, checkpoint and
+objective tile, and one per run of water tiles along a row of the terrain
+map. Each zone is filed under every cell of a grid its box reaches into.
+A frame only tests the zones filed under the handful of cells the player's
+box covers, so it costs the same however many pickups the level has.
+
+A zone's kind picks its handlers. The enter handler runs on the frame the
+player starts overlapping a zone and the exit handler on the frame they
+stop, never on the frames in between. One shot zones, like gems, take
+themselves out of the index once they have fired.
+"""
+import collections
+
+import arcade
+
+
+class Zone:
+	"""an area of the level, tested against the player's hit box, sprite or centre"""
+	def __init__(self, kind, left, right, bottom, top, sprite = None, one_shot = False, point = False):
+		self.kind = kind
+		self.left = left
+		self.right = right
+		self.bottom = bottom
+		self.top = top
+		#zones with a sprite get arcade's exact hit box check, point zones hold
+		#the player when their centre is inside, with the far edges left out
+		self.sprite = sprite
+		self.point = point
+		self.one_shot = one_shot
+		#set when first added, zones that fire together are handled in this order
+		self.order = None
+
+
+def sprite_zone(kind, sprite, one_shot = False):
+	"""a zone covering a sprite's hit box, that only holds the player when the hit boxes overlap"""
+	points = sprite.get_adjusted_hit_box()
+	return Zone(kind, min(point[0] for point in points), max(point[0] for point in points),
+				min(point[1] for point in points), max(point[1] for point in points),
+				sprite = sprite, one_shot = one_shot)
+
+def terrain_zones(kind, terrain_map, flags):
+	"""point zones over the tiles of a terrain map with any of the flags, one per run along a row"""
+	zones = [ ]
+	width = terrain_map.width
+	for row in range(terrain_map.height):
+		column = 0
+		while column < width:
+			if not terrain_map.cells[row * width + column] & flags:
+				column += 1
+				continue
+			first = column
+			while column < width and terrain_map.cells[row * width + column] & flags:
+				column += 1
+			zones.append(Zone(kind, first * terrain_map.cell_width, column * terrain_map.cell_width,
+							  row * terrain_map.cell_height, (row + 1) * terrain_map.cell_height,
+							  point = True))
+	return zones
+
+
+class TriggerIndex:
+	"""static zones filed by grid cell, with the handlers of each kind of zone"""
+	def __init__(self, cell_size):
+		self.cell_size = cell_size
+
+		#(column, row) -> zones filed under that cell
+		self.cells = { }
+		#zone -> cells it is filed under, for every zone in the index
+		self.zones = { }
+		self.added = 0
+
+		#kind -> (enter handler, exit handler)
+		self.handlers = { }
+
+		#zones holding the player since the last update, and how many of each kind
+		self.inside = set()
+		self.touching_counts = collections.Counter()
+
+		#exact hit box checks run during the last update
+		self.checks = 0
+
+	def on(self, kind, enter = None, exit = None):
+		"""sets the handlers for a kind of zone, each is called with the zone"""
+		self.handlers[kind] = (enter, exit)
+
+	def add(self, zone):
+		if zone in self.zones:
+			return
+		if zone.order is None:
+			zone.order = self.added
+			self.added += 1
+		keys = [(column, row)
+				for column in range(int(zone.left // self.cell_size), int(zone.right // self.cell_size) + 1)
+				for row in range(int(zone.bottom // self.cell_size), int(zone.top // self.cell_size) + 1)]
+		for key in keys:
+			self.cells.setdefault(key, [ ]).append(zone)
+		self.zones[zone] = keys
+
+	def add_list(self, zones):
+		for zone in zones:
+			self.add(zone)
+
+	def remove(self, zone):
+		"""takes a zone out of the index, safe to call for zones that aren't in it"""
+		keys = self.zones.pop(zone, None)
+		if keys is None:
+			return
+		for key in keys:
+			self.cells[key].remove(zone)
+		if zone in self.inside:
+			self.inside.remove(zone)
+			self.touching_counts[zone.kind] -= 1
+
+	def touching(self, kind):
+		"""how many zones of a kind hold the player"""
+		return self.touching_counts[kind]
+
+	def update(self, sprite):
+		"""tests the zones near a sprite and runs the handlers of the ones it went into or out of"""
+		self.checks = 0
+		points = sprite.get_adjusted_hit_box()
+		left = min(point[0] for point in points)
+		right = max(point[0] for point in points)
+		bottom = min(point[1] for point in points)
+		top = max(point[1] for point in points)
+		x = sprite.center_x
+		y = sprite.center_y
+
+		nearby = set()
+		for column in range(int(left // self.cell_size), int(right // self.cell_size) + 1):
+			for row in range(int(bottom // self.cell_size), int(top // self.cell_size) + 1):
+				nearby.update(self.cells.get((column, row), ()))
+
+		inside = set()
+		for zone in nearby:
+			if zone.point:
+				if zone.left <= x < zone.right and zone.bottom <= y < zone.top:
+					inside.add(zone)
+			elif zone.left <= right and zone.right >= left and zone.bottom <= top and zone.top >= bottom:
+				if zone.sprite is None:
+					inside.add(zone)
+				else:
+					self.checks += 1
+					if arcade.check_for_collision(sprite, zone.sprite):
+						inside.add(zone)
+
+		entered = sorted(inside - self.inside, key = lambda zone: zone.order)
+		exited = sorted(self.inside - inside, key = lambda zone: zone.order)
+		self.inside = inside
+		for zone in exited:
+			self.touching_counts[zone.kind] -= 1
+			enter, exit = self.handlers.get(zone.kind, (None, None))
+			if exit:
+				exit(zone)
+		for zone in entered:
+			self.touching_counts[zone.kind] += 1
+			enter, exit = self.handlers.get(zone.kind, (None, None))
+			if enter:
+				enter(zone)
+			if zone.one_shot:
+				self.remove(zone)
+
+	def snapshot(self):
+		"""the zones in the index and the ones holding the player, for restore"""
+		return list(self.zones), set(self.inside)
+
+	def restore(self, state):
+		zones, inside = state
+		for zone in list(self.zones):
+			self.remove(zone)
+		self.add_list(zones)
+		self.inside = set(inside)
+		self.touching_counts = collections.Counter(zone.kind for zone in self.inside)
@@ -0,0 +1,915 @@
+"""
+The game's rules, separated from the window.
+
+GameWorld owns the level's sprite lists, the physics engine and the player's
+held keys, and steps physics, enemies, projectiles, pickups, deaths and
+checkpoints one frame at a time. It never draws, plays sounds or touches the
+viewport, so it can run without a window or GL context; things the window
+needs to react to are left in GameWorld.events.
+
+Only enemies near the viewport are simulated. The rest sleep until the
+viewport comes within activity_margin of them, see entities.py. Lasers that
+get that far from the viewport go back to their pools.
+"""
+import arcade
+import numpy
+
+import animation
+import atlas
+import chunks
+import entities
+import level_cache
+import patrol
+import terrain
+import triggers
+from constants import *
+
+#GameWorld attributes a frame or a key press can change, saved by snapshot
+SNAPSHOT_ATTRIBUTES = ("frame_count", "ability_count", "ability_reset_count", "in_fluid", "won",
+					   "START_X", "START_Y", "input_state", "left_pressed", "right_pressed",
+					   "up_pressed", "down_pressed", "jump_needs_reset", "dash_pressed",
+					   "shoot_pressed", "parry_pressed", "view_left", "view_bottom")
+
+class PlayerCharacter(arcade.Sprite):
+	"""Player sprite"""
+	def __init__(self, animator):
+		#set up parent class
+		super().__init__()
+
+		#character faces right by default
+		self.character_face_direction = RIGHT_FACING
+
+		self.scale = TILE_SCALING
+
+		#load textures
+		#main directory where art is held
+		main_path = "art/PNG/Players/Player Grey/playerGrey"
+
+		#clip for idle
+		self.idle_clip = animation.Clip([atlas.load_texture_pair(f"{main_path}_stand.png")],
+										[PLAYER_RUN_FRAME_TIME])
+
+		#clip for running/walking
+		self.run_clip = animation.Clip([atlas.load_texture_pair(f"{main_path}_walk{i}.png")
+										for i in range(6)],
+									   [PLAYER_RUN_FRAME_TIME] * 6)
+		
+		#set initial texture, default idle, facing right
+		self.texture = self.idle_clip.frames[0][RIGHT_FACING]
+
+		#create hitbox
+		self.set_hit_box(self.texture.hit_box_points)
+
+		#the animator moves the frames on, this only picks the clip
+		self.animator = animator
+		animator.add(self, self.idle_clip)
+	
+	def update_animation(self, delta_time: float = 1/60):
+		
+		#figure out if its right or left
+		if self.change_x < 0 and self.character_face_direction == RIGHT_FACING:
+			self.character_face_direction = LEFT_FACING
+		elif self.change_x > 0 and self.character_face_direction == LEFT_FACING:
+			self.character_face_direction = RIGHT_FACING
+		self.animator.face(self, self.character_face_direction)
+
+		#idle animation
+		if self.change_x == 0:
+			self.animator.play(self, self.idle_clip)
+		#running animation
+		else:
+			self.animator.play(self, self.run_clip)
+
+class ProjectilePool:
+	"""fixed set of projectile sprites that get recycled instead of rebuilt"""
+	def __init__(self, sprite_list, texture, size, scale = LASER_SCALING, store = None):
+		self.sprite_list = sprite_list
+		self.texture = texture
+		self.scale = scale
+
+		#flying sprites are tracked by this entity store
+		self.store = store
+
+		#sprites currently flying and sprites waiting to be fired
+		self.active = [ ]
+		self.free = [ ]
+
+		#keeps track of how well the pool is sized
+		self.hits = 0
+		self.misses = 0
+		self.growth = 0
+
+		for i in range(size):
+			self.free.append(self._create())
+
+	def _create(self):
+		"""builds a new parked sprite and adds it to the sprite list for good"""
+		sprite = arcade.Sprite(scale = self.scale)
+		sprite.texture = self.texture
+		self._park(sprite)
+		self.sprite_list.append(sprite)
+		return sprite
+
+	def _park(self, sprite):
+		#hide the sprite away from the level so it is never drawn or hit
+		sprite.alpha = 0
+		sprite.change_x = 0
+		sprite.change_y = 0
+		sprite.center_x = PARKED_POSITION
+		sprite.center_y = PARKED_POSITION
+
+	def acquire(self, center_x, center_y, change_x = 0, change_y = 0):
+		"""takes a parked sprite, or grows the pool if none are left, and fires it"""
+		if self.free:
+			sprite = self.free.pop()
+			self.hits += 1
+		else:
+			sprite = self._create()
+			self.misses += 1
+			self.growth += 1
+		sprite.center_x = center_x
+		sprite.center_y = center_y
+		sprite.change_x = change_x
+		sprite.change_y = change_y
+		sprite.alpha = 255
+		self.active.append(sprite)
+		if self.store is not None:
+			self.store.add(sprite)
+		return sprite
+
+	def release(self, sprite):
+		"""parks a sprite so it can be fired again, safe to call twice"""
+		if sprite not in self.active:
+			return
+		self.active.remove(sprite)
+		if self.store is not None:
+			self.store.remove(sprite)
+		self._park(sprite)
+		self.free.append(sprite)
+
+	def release_all(self):
+		for sprite in self.active[:]:
+			self.release(sprite)
+
+	def stats(self):
+		"""pool hits, misses and growth, along with how big the pool is"""
+		return {
+			"hits": self.hits,
+			"misses": self.misses,
+			"growth": self.growth,
+			"active": len(self.active),
+			"size": len(self.active) + len(self.free)
+		}
+
+class FluidPhysicsEngine(arcade.PhysicsEnginePlatformer):
+	"""platformer physics engine that can swap its gravity when in water"""
+	def __init__(self, player_sprite, platforms, ladders = None, terrain = None,
+				 gravity = GRAVITY, fluid_gravity = FLUID_GRAVITY):
+		super().__init__(player_sprite, platforms, gravity_constant = gravity, ladders = ladders)
+		self._in_fluid = False
+		self.gravity = gravity
+		self.fluid_gravity = fluid_gravity
+
+		#when there is a terrain map, it rules out ladders and ground without
+		#querying the sprite lists
+		self.terrain = terrain
+
+	@property
+	def in_fluid(self):
+		return self._in_fluid
+
+	@in_fluid.setter
+	def in_fluid(self, value):
+		#reduces gravity in water to give swimming a floatier feel, rather than
+		#building a new engine every time the player enters or leaves water
+		self._in_fluid = value
+		if value:
+			self.gravity_constant = self.fluid_gravity
+		else:
+			self.gravity_constant = self.gravity
+
+	def is_on_ladder(self):
+		if self.terrain and not self.terrain.sprite_flags(self.player_sprite) & TERRAIN_LADDER:
+			return False
+		return super().is_on_ladder()
+
+	def can_jump(self, y_distance = 5):
+		if self.terrain and not self.terrain.sprite_flags(self.player_sprite, -y_distance) & TERRAIN_SOLID:
+			#nothing under the player, same answer arcade gives for an empty hit list
+			return self.allow_multi_jump and self.jumps_since_ground < self.allowed_jumps
+		return super().can_jump(y_distance)
+
+
+class GameWorld:
+	"""the state and rules of one level, stepped once per frame"""
+
+	def __init__(self, map_name = DEFAULT_MAP_NAME, tuning = None):
+		#name of map file to load
+		self.map_name = map_name
+
+		#movement constants, tuning gives some of them other values by name
+		self.movement = dict(MOVEMENT_CONSTANTS)
+		for name, value in (tuning or { }).items():
+			if name not in MOVEMENT_CONSTANTS:
+				raise ValueError(f"{name} is not a movement constant, "
+								 f"expected one of {', '.join(MOVEMENT_CONSTANTS)}")
+			self.movement[name] = value
+
+		#keeps track of frames
+		self.frame_count = 0
+
+		self.ability_count = 0
+
+		#track player state
+		self.in_fluid = False
+		self.won = False
+		self.START_X = 64
+		self.START_Y = (12*GRID_SIZE) +32
+
+		#enemies this far outside the viewport are put to sleep, lasers released
+		self.activity_margin = ACTIVE_REGION_MARGIN
+
+		#track current state of what key is pressed, the bitmask holds the
+		#same thing as the flags so whole frames of input can be applied at once
+		self.input_state = 0
+		self.left_pressed = False
+		self.right_pressed = False
+		self.up_pressed = False
+		self.down_pressed = False
+		self.jump_needs_reset = False
+		self.dash_pressed = False
+		self.shoot_pressed = False
+		self.parry_pressed = False
+
+		#lists to keep track of sprites
+		self.wall_list = None
+		self.player_list = None
+		self.bullet_list = None
+		self.ladder_list = None
+		self.gem_list = None
+		self.checkpoint_list = None
+		self.objective_list = None
+
+		self.player_sprite = None
+		self.physics_engine = None 
+		self.chunk_streamer = None
+		self.background_color = None
+
+		#keeps track of scroll margins
+		self.view_bottom = 0
+		self.view_left = 0
+
+		#things that happened during the last step or key change that the
+		#window may want to react to, e.g. 'jump', 'death', 'checkpoint', 'win'
+		self.events = [ ]
+
+		#diagnostics only go somewhere while instrumentation is attached
+		self.instrumentation = None
+
+		#set once setup has built the level
+		self.ready = False
+
+	def setup(self):
+		#creates the sprite lists
+		self.player_list = arcade.SpriteList()
+		self.bullet_list = arcade.SpriteList()
+		self.enemy_laser_list = arcade.SpriteList()
+
+		self.ability_reset_count = 0
+
+		#pickups and water as zones that fire when the player enters or leaves them
+		self.triggers = triggers.TriggerIndex(GRID_SIZE)
+		self.triggers.on("gems", enter = self.collect_gem)
+		self.triggers.on("checkpoint", enter = self.reach_checkpoint)
+		self.triggers.on("objective", enter = self.reach_objective)
+		self.triggers.on("water", enter = self.update_fluid, exit = self.update_fluid)
+
+		#enemies and lasers move and collide as arrays, see entities.py
+		self.enemy_store = entities.EntityStore()
+		self.projectile_enemy_store = entities.EntityStore()
+		self.bullet_store = entities.EntityStore()
+		self.enemy_laser_store = entities.EntityStore()
+
+		#load laser textures once and build the projectile pools
+		self.player_laser_texture = atlas.load_texture("art/PNG/lasers/laserBlueHorizontal.png")
+		self.enemy_laser_texture = atlas.load_texture("art/PNG/lasers/laserRedVertical.png")
+		self.bullet_pool = ProjectilePool(self.bullet_list, self.player_laser_texture,
+										  PLAYER_LASER_POOL_SIZE,
+										  store = self.bullet_store)
+		self.enemy_laser_pool = ProjectilePool(self.enemy_laser_list, self.enemy_laser_texture,
+											   ENEMY_LASER_POOL_SIZE,
+											   store = self.enemy_laser_store)
+
+		#every animated sprite's frames move on together, see animation.py
+		self.animator = animation.Animator()
+
+		#sets up the player and drops it at a location
+		self.player_sprite = PlayerCharacter(self.animator)
+		self.player_sprite.center_x = self.START_X
+		self.player_sprite.center_y = self.START_Y
+		self.player_list.append(self.player_sprite)
+
+		#read in the compiled level, the tmx is only parsed again when it changes
+		my_map = level_cache.load_level(self.map_name)
+
+		#large levels stream their platforms, ladders and water in chunks around
+		#the viewport instead of loading them all at once
+		streamed = max(my_map.width, my_map.height) >= CHUNKED_WORLD_MIN_SIZE
+
+		if streamed:
+			self.wall_list = arcade.SpriteList(use_spatial_hash=True)
+			self.ladder_list = arcade.SpriteList()
+			self.water_list = arcade.SpriteList()
+		else:
+			#brings in platforms tiles
+			self.wall_list = my_map.sprite_list(PLATFORMS_LAYER_NAME, TILE_SCALING,
+												use_spatial_hash = True)
+
+			#brings in ladder tiles
+			self.ladder_list = my_map.sprite_list(LADDERS_LAYER_NAME, TILE_SCALING)
+			
+			#water layer
+			self.water_list = my_map.sprite_list(WATER_LAYER_NAME, TILE_SCALING)
+
+		#brings in general enemies
+		self.enemy_list = my_map.sprite_list(ENEMY_LAYER_NAME, TILE_SCALING)
+
+		#brings in enemies that shoot projectiles
+		self.projectile_enemy_list = my_map.sprite_list(PROJECTILE_ENEMY_LAYER_NAME, TILE_SCALING)
+
+		#brings in platforms that pen in enemies
+		self.invisible_platform_list = my_map.sprite_list(INVISIBLE_PLATFORM_LAYER_NAME, TILE_SCALING)
+
+		#brings in checkpoint layers
+		self.checkpoint_list = my_map.sprite_list(CHECKPOINT_LAYER_NAME, TILE_SCALING)
+
+		#brings in gems
+		self.gem_list = my_map.sprite_list(GEM_LAYER_NAME, TILE_SCALING)
+
+		#brings in the objective
+		self.objective_list = my_map.sprite_list(OBJECTIVE_LAYER_NAME, TILE_SCALING)
+
+		#creates a list of all the platforms that the physics engine takes a note of
+		self.all_platform_list = arcade.SpriteList(use_spatial_hash=True)
+		for platform in self.wall_list:
+			self.all_platform_list.append(platform)
+
+		self.chunk_streamer = None
+		if streamed:
+			self.chunk_streamer = chunks.ChunkStreamer(my_map,
+													   {PLATFORMS_LAYER_NAME: [self.wall_list, self.all_platform_list],
+													    LADDERS_LAYER_NAME: [self.ladder_list],
+													    WATER_LAYER_NAME: [self.water_list]},
+													   SCREEN_WIDTH, SCREEN_HEIGHT,
+													   scaling = TILE_SCALING)
+			self.chunk_streamer.update(self.view_left, self.view_bottom)
+
+		#enemies play the cycle of the tile they were placed as, a little out of step
+		#with each other, texture name -> (clip, facing, frame) of every frame of every
+		#cycle, names rather than textures since a level may load the same image by
+		#another path
+		self.enemy_clips = { }
+		for name in ENEMY_CYCLES:
+			pairs = [atlas.load_texture_pair(f"art/PNG/Enemies/{name}_{i}.png")
+					 for i in range(1, ENEMY_CYCLE_FRAMES + 1)]
+			clip = animation.Clip(pairs, [ENEMY_FRAME_TIME] * len(pairs))
+			for frame, (right, left) in enumerate(pairs):
+				self.enemy_clips[right.name] = (clip, RIGHT_FACING, frame)
+				self.enemy_clips[left.name] = (clip, LEFT_FACING, frame)
+		for sprite_list in (self.enemy_list, self.projectile_enemy_list):
+			for i, enemy in enumerate(sprite_list):
+				self.animate_enemy(enemy, elapsed = i * ENEMY_FRAME_TIME / 2)
+
+		#enemies go into entity stores along with how far they patrol
+		self.patrol_bounds = patrol.patrol_bounds(self.enemy_list, self.invisible_platform_list)
+		for enemy in self.enemy_list:
+			self.enemy_store.add(enemy, *self.patrol_bounds[enemy])
+		for i, enemy in enumerate(self.projectile_enemy_list):
+			self.projectile_enemy_store.add(enemy, timer = self.fire_timer(i))
+
+		#what every tile of the level holds, for queries that shouldn't need sprites
+		self.terrain = terrain.from_level(my_map,
+										  {PLATFORMS_LAYER_NAME: TERRAIN_SOLID,
+										   LADDERS_LAYER_NAME: TERRAIN_LADDER,
+										   WATER_LAYER_NAME: TERRAIN_WATER},
+										  TILE_SCALING)
+
+		#the pickups never move and each one only fires once
+		self.triggers.add_list(triggers.sprite_zone("gems", gem, one_shot = True) for gem in self.gem_list)
+		self.triggers.add_list(triggers.sprite_zone("checkpoint", checkpoint, one_shot = True)
+							   for checkpoint in self.checkpoint_list)
+		self.triggers.add_list(triggers.sprite_zone("objective", objective, one_shot = True)
+							   for objective in self.objective_list)
+		#the player is in water when their centre is on a water tile
+		self.triggers.add_list(triggers.terrain_zones("water", self.terrain, TERRAIN_WATER))
+
+		#height of the level in pixels, lasers that leave it go back to their pool
+		self.map_height = my_map.height * my_map.tile_height * TILE_SCALING
+
+		self.background_color = my_map.background_color
+
+		#create physics engine, this lives for the whole level and swaps its
+		#gravity when the player is in water
+		self.physics_engine = FluidPhysicsEngine(self.player_sprite,
+												 self.all_platform_list,
+												 ladders = self.ladder_list,
+												 terrain = self.terrain,
+												 gravity = self.movement["GRAVITY"],
+												 fluid_gravity = self.movement["FLUID_GRAVITY"])
+		self.ready = True
+
+		#the level as it was loaded, restart puts it back without reloading
+		self.initial_state = self.snapshot()
+
+	def _dynamic_lists(self):
+		"""
+		sprite lists that lose sprites during play, with the entity store that
+		tracks them, the pickups' trigger zones are snapshotted separately
+		"""
+		return [(self.enemy_list, self.enemy_store),
+				(self.projectile_enemy_list, self.projectile_enemy_store),
+				(self.gem_list, None),
+				(self.checkpoint_list, None),
+				(self.objective_list, None)]
+
+	def snapshot(self):
+		"""records everything playing the level can change, for restore"""
+		player = self.player_sprite
+		return {
+			"lists": [(sprite_list, tracker,
+					   [(sprite, sprite.center_x, sprite.center_y, sprite.change_x, sprite.change_y)
+						for sprite in sprite_list])
+					  for sprite_list, tracker in self._dynamic_lists()],
+			"player": (player.center_x, player.center_y, player.change_x, player.change_y,
+					   player.character_face_direction),
+			"animation": self.animator.snapshot(),
+			"triggers": self.triggers.snapshot(),
+			"sleep": [(store, {sprite: store.sleep_state(sprite) for sprite in store.slots})
+					  for store in (self.enemy_store, self.projectile_enemy_store)],
+			"attributes": {name: getattr(self, name) for name in SNAPSHOT_ATTRIBUTES}
+		}
+
+	def restore(self, state):
+		"""puts the level back the way it was when the snapshot was taken"""
+		self.bullet_pool.release_all()
+		self.enemy_laser_pool.release_all()
+
+		#rebuild each list in its old order, so the level plays out the same way
+		for sprite_list, tracker, sprites in state["lists"]:
+			for sprite in list(sprite_list):
+				sprite_list.remove(sprite)
+				if tracker is not None:
+					tracker.remove(sprite)
+			for sprite, center_x, center_y, change_x, change_y in sprites:
+				sprite.center_x = center_x
+				sprite.center_y = center_y
+				sprite.change_x = change_x
+				sprite.change_y = change_y
+				sprite_list.append(sprite)
+				if tracker is not None:
+					tracker.add(sprite, *self.patrol_bounds.get(sprite, patrol.NO_BOUNDS))
+
+		player = self.player_sprite
+		(player.center_x, player.center_y, player.change_x, player.change_y,
+		 player.character_face_direction) = state["player"]
+		self.animator.restore(state["animation"])
+		self.triggers.restore(state["triggers"])
+		for store, sleep_states in state["sleep"]:
+			for sprite, sleep_state in sleep_states.items():
+				store.set_sleep_state(sprite, sleep_state)
+
+		for name, value in state["attributes"].items():
+			setattr(self, name, value)
+		self.physics_engine.in_fluid = self.in_fluid
+		self.physics_engine.jumps_since_ground = 0
+		self.events = [ ]
+
+		if self.chunk_streamer:
+			self.chunk_streamer.update(self.view_left, self.view_bottom)
+
+	def restart(self):
+		"""starts the level over, in a few milliseconds rather than a reload"""
+		self.restore(self.initial_state)
+
+	@property
+	def collision_checks(self):
+		"""exact hit box checks run during the last step"""
+		return (self.triggers.checks + self.bullet_store.checks + self.enemy_laser_store.checks +
+				self.enemy_store.checks + self.projectile_enemy_store.checks)
+
+	@property
+	def sleeping(self):
+		"""enemies asleep outside the active region"""
+		return self.enemy_store.sleeping() + self.projectile_enemy_store.sleeping()
+
+	def fire_timer(self, i):
+		"""ticks until the i-th projectile enemy first fires, spread across the interval"""
+		return ENEMY_FIRE_INTERVAL - (i * ENEMY_FIRE_STAGGER) % ENEMY_FIRE_INTERVAL
+
+	def animate_enemy(self, enemy, elapsed = 0.0):
+		"""plays the cycle an enemy's tile belongs to from its frame, other tiles stay still"""
+		found = self.enemy_clips.get(enemy.texture.name)
+		if found is None:
+			return
+		clip, facing, frame = found
+		self.animator.add(enemy, clip, facing, elapsed + sum(clip.frame_times[:frame]))
+
+	def add_enemy(self, enemy, shoots = False):
+		"""adds an enemy to the level after setup, e.g. one spawned during play"""
+		#the animation frames differ in size, keep the hit box of the one it has
+		enemy.set_hit_box(enemy.get_hit_box())
+		self.animate_enemy(enemy)
+		if shoots:
+			self.projectile_enemy_store.add(enemy, timer = self.fire_timer(len(self.projectile_enemy_list)))
+			self.projectile_enemy_list.append(enemy)
+		else:
+			self.patrol_bounds.update(patrol.patrol_bounds([enemy], self.invisible_platform_list))
+			self.enemy_list.append(enemy)
+			self.enemy_store.add(enemy, *self.patrol_bounds[enemy])
+
+	def log(self, message):
+		"""a diagnostic message, dropped unless instrumentation is attached"""
+		if self.instrumentation:
+			self.instrumentation.message(message)
+
+	def take_events(self):
+		"""hands over the events since the last call and clears them"""
+		events = self.events
+		self.events = [ ]
+		return events
+
+	def apply_input(self, state, refresh = False):
+		"""
+		sets the held keys from an input bitmask, the same way pressing and
+		releasing the keys one at a time would, refresh is for a key press that
+		does not change the held keys but still re-applies them
+		"""
+		pressed = state & ~self.input_state
+		released = self.input_state & ~state
+		self.input_state = state
+
+		self.left_pressed = bool(state & INPUT_LEFT)
+		self.right_pressed = bool(state & INPUT_RIGHT)
+		self.up_pressed = bool(state & INPUT_UP)
+		self.down_pressed = bool(state & INPUT_DOWN)
+		self.dash_pressed = bool(state & INPUT_DASH)
+		self.shoot_pressed = bool(state & INPUT_SHOOT)
+		self.parry_pressed = bool(state & INPUT_PARRY)
+
+		if released & INPUT_UP:
+			self.jump_needs_reset = False
+		if released & INPUT_DASH:
+			if self.ability_count > 0:
+				self.ability_count -= 1
+			self.log(f'ability count {self.ability_count}')
+
+		if pressed or refresh:
+			self.process_keychange()
+
+	def process_keychange(self):
+		movement = self.movement
+
+		# Process up/down
+		if self.up_pressed and not self.down_pressed:
+			if self.physics_engine.is_on_ladder():
+				self.player_sprite.change_y = movement["PLAYER_MOVEMENT_SPEED"]
+			elif self.physics_engine.can_jump() and not self.jump_needs_reset:
+				self.player_sprite.change_y = movement["PLAYER_JUMP_SPEED"]
+				self.jump_needs_reset = True
+				self.events.append('jump')
+		elif self.down_pressed and not self.up_pressed:
+			if self.physics_engine.is_on_ladder():
+				self.player_sprite.change_y = -movement["PLAYER_MOVEMENT_SPEED"]
+
+		# Process up/down when on a ladder and no movement
+		if self.physics_engine.is_on_ladder():
+			if not self.up_pressed and not self.down_pressed:
+				self.player_sprite.change_y = 0
+			elif self.up_pressed and self.down_pressed:
+				self.player_sprite.change_y = 0
+
+		# Process left/right
+		if self.right_pressed and not self.left_pressed:
+			self.player_sprite.change_x = movement["PLAYER_MOVEMENT_SPEED"]
+		elif self.left_pressed and not self.right_pressed:
+			self.player_sprite.change_x = -movement["PLAYER_MOVEMENT_SPEED"]
+		else:
+			self.player_sprite.change_x = 0
+
+		#process dash
+		if self.dash_pressed and self.right_pressed and self.ability_count > 0:
+			self.player_sprite.change_x = movement["PLAYER_DASH_SPEED"]
+		elif self.dash_pressed and self.left_pressed and self.ability_count >0:
+			self.player_sprite.change_x = -movement["PLAYER_DASH_SPEED"]
+		
+		#process shooting
+		if self.shoot_pressed and self.left_pressed and self.ability_count > 0:
+			#fires a laser from the pool at the player's position, heading left
+			self.bullet_pool.acquire(self.player_sprite.center_x,
+									 self.player_sprite.center_y,
+									 change_x = -LASER_SPEED)
+			#removes ability after being used once
+			self.ability_count -=1
+		elif self.shoot_pressed and self.ability_count > 0:
+			#fires a laser from the pool at the player's position, heading right
+			self.bullet_pool.acquire(self.player_sprite.center_x,
+									 self.player_sprite.center_y,
+									 change_x = LASER_SPEED)
+			#removes ability after being used once
+			self.ability_count -=1
+
+		#process swimming
+		if self.in_fluid == True:
+			#process underwater movement left/right/up/down
+			if self.left_pressed:
+				self.player_sprite.change_x = -movement["PLAYER_SWIM_SPEED"]
+			elif self.right_pressed:
+				self.player_sprite.change_x = movement["PLAYER_SWIM_SPEED"]
+			elif self.up_pressed:
+				self.player_sprite.change_y = movement["PLAYER_SWIM_SPEED"]
+			elif self.down_pressed:
+				self.player_sprite.change_y = -movement["PLAYER_SWIM_SPEED"]
+			#process underwater dash
+			elif self.dash_pressed and self.right_pressed:
+				self.player_sprite.change_x = movement["PLAYER_DASH_SPEED"]
+			elif self.dash_pressed and self.left_pressed:
+				self.player_sprite.change_x = -movement["PLAYER_DASH_SPEED"]
+			#underwater parry should work regardless, test this out
+
+	def kill_enemy(self, enemy):
+		"""removes a destroyed enemy from the level, its entity store and the animator"""
+		enemy.remove_from_sprite_lists()
+		self.enemy_store.remove(enemy)
+		self.projectile_enemy_store.remove(enemy)
+		self.animator.remove(enemy)
+
+	def die(self):
+		"""the player touched something deadly or fell off the map"""
+		self.events.append('death')
+		self.reset_position()
+
+	def reset_position(self):
+		#move the player to start
+		self.player_sprite.center_x = self.START_X
+		self.player_sprite.center_y = self.START_Y
+
+		#reset camera to start
+		self.view_left = 0
+		self.view_bottom = 0
+		self.ability_count += self.ability_reset_count
+		self.ability_reset_count = 0
+
+	def step(self, delta_time = 1/60):
+		""" Movement and game logic for one frame """
+		self.update_physics(delta_time)
+		self.update_projectiles()
+		self.update_enemies()
+		self.update_collisions()
+		self.update_activity()
+		self.update_animation(delta_time)
+		self.update_viewport()
+
+	def update_physics(self, delta_time):
+		"""moves the player and works out whether they are swimming or climbing"""
+		self.frame_count += 1
+
+		# Move the player with the physics engine
+		self.physics_engine.update()
+
+		#fires the pickups and water the player went into or out of, see the
+		#handlers below
+		self.triggers.update(self.player_sprite)
+
+		# Update animations
+		if self.physics_engine.can_jump():
+			self.player_sprite.can_jump = False
+		else:
+			self.player_sprite.can_jump = True
+
+		if self.physics_engine.is_on_ladder() and not self.physics_engine.can_jump():
+			self.player_sprite.is_on_ladder = True
+			self.process_keychange()
+		else:
+			self.player_sprite.is_on_ladder = False
+			self.process_keychange()
+
+		self.player_sprite.update_animation(delta_time)
+
+	def update_projectiles(self):
+		"""moves the lasers and sends the ones that left back to their pools"""
+		bullets = self.bullet_store
+		lasers = self.enemy_laser_store
+		bullets.move()
+		lasers.move()
+
+		#send lasers back to the pool if they go offscreen
+		slots = bullets.active()
+		x = bullets.x[slots]
+		offscreen = (x + 18 > self.view_left + SCREEN_WIDTH) | (x - 18 < self.view_left)
+		for slot in slots[offscreen]:
+			self.bullet_pool.release(bullets.sprites[slot])
+			self.log('laser removed')
+
+		#enemy lasers that leave the level go back to their pool too
+		slots = lasers.active()
+		off_level = ((lasers.y[slots] + lasers.top[slots] < 0) |
+					 (lasers.y[slots] + lasers.bottom[slots] > self.map_height))
+		for slot in slots[off_level]:
+			self.enemy_laser_pool.release(lasers.sprites[slot])
+
+	def update_enemies(self):
+		"""moves the enemies and lets the projectile enemies fire"""
+		self.projectile_enemy_store.move()
+		self.enemy_store.move()
+
+		#each enemy counts down to its next shot while it is awake
+		for enemy in self.projectile_enemy_store.countdown(ENEMY_FIRE_INTERVAL):
+			self.enemy_laser_pool.acquire(enemy.center_x,
+										  enemy.center_y - 54,
+										  change_y = -ENEMY_LASER_SPEED)
+
+	def update_collisions(self):
+		"""answers every overlap for the frame and applies the rules that follow"""
+		#----BROAD PHASE----#
+
+		#answer every projectile and enemy overlap for this frame in one go, as
+		#batches of arrays, the pickups were handled by their triggers
+		for store in (self.bullet_store, self.enemy_laser_store,
+					  self.enemy_store, self.projectile_enemy_store):
+			store.checks = 0
+		bullet_hits = { }
+		for laser, enemy in self.bullet_store.collide(self.enemy_store):
+			bullet_hits.setdefault(laser, ([ ], [ ]))[0].append(enemy)
+		for laser, enemy in self.bullet_store.collide(self.projectile_enemy_store):
+			bullet_hits.setdefault(laser, ([ ], [ ]))[1].append(enemy)
+		enemy_laser_hits = { }
+		for laser, enemy in self.enemy_laser_store.collide(self.projectile_enemy_store):
+			enemy_laser_hits.setdefault(laser, [ ]).append(enemy)
+		deadly = (self.enemy_store.collide_sprite(self.player_sprite) +
+				  self.projectile_enemy_store.collide_sprite(self.player_sprite))
+		deadly_lasers = self.enemy_laser_store.collide_sprite(self.player_sprite)
+
+		#check to see if enemies were hit by player laser, in which case they are 
+		#destroyed
+		for laser, (enemies, projectile_enemies) in bullet_hits.items():
+			if enemies:
+				self.bullet_pool.release(laser)
+				for enemy in enemies:
+					self.kill_enemy(enemy)
+			elif projectile_enemies:
+				self.bullet_pool.release(laser)
+				for enemy in projectile_enemies:
+					self.kill_enemy(enemy)
+
+		#make enemies patrol on platforms
+		#invisible platforms in foreground, i.e. platforms we do not call in draw,
+		#mark where enemies turn around, see patrol.py
+		#sleeping enemies stay as they are, they catch up when they wake
+		enemies = self.enemy_store
+		change_x = enemies.change_x
+		patrolling = enemies.alive & enemies.awake
+		turn_left = patrolling & (change_x > 0.5) & (enemies.x > enemies.max_x)
+		turn_right = patrolling & (change_x < -0.5) & (enemies.x < enemies.min_x)
+		start = patrolling & (change_x == 0)
+		for slot in numpy.flatnonzero(turn_left):
+			enemies.set_velocity(slot, -ENEMY_PATROL_SPEED, enemies.change_y[slot])
+		for slot in numpy.flatnonzero(turn_right | start):
+			enemies.set_velocity(slot, ENEMY_PATROL_SPEED, enemies.change_y[slot])
+
+		#sends lasers back to the pool if they hit a platform, the terrain map
+		#answers for every laser at once and only lasers on solid tiles need
+		#checking against the platforms themselves
+		lasers = self.enemy_laser_store
+		slots = lasers.active()
+		on_solid = self.terrain.boxes_flags(*lasers.bounds(slots)) & TERRAIN_SOLID
+		for laser in [lasers.sprites[slot] for slot in slots[on_solid != 0]]:
+			if arcade.check_for_collision_with_list(laser, self.wall_list):
+				self.enemy_laser_pool.release(laser)
+		for laser, enemies in enemy_laser_hits.items():
+			self.enemy_laser_pool.release(laser)
+			for enemy in enemies:
+				self.kill_enemy(enemy)
+
+		#lasers close to the player get sent back up when they parry
+		if self.parry_pressed:
+			lasers = self.enemy_laser_store
+			slots = lasers.active()
+			distance = numpy.hypot(lasers.x[slots] - self.player_sprite.center_x,
+								   lasers.y[slots] - self.player_sprite.center_y)
+			for slot in slots[distance < 80]:
+				lasers.set_velocity(slot, lasers.change_x[slot], ENEMY_LASER_SPEED)
+
+		#----TRACK DEATH EVENTS----#
+
+		#check if player fell off map, this also works when the player sinks to
+		#the bottom of the water
+		if self.player_sprite.center_y < 1 * GRID_SIZE:
+			self.die()
+
+		# print(self.player_sprite.center_y)
+
+		#check if player came into contact with general/type enemy, and then 'dies',
+		#leaving out anything a laser already destroyed this frame
+		if deadly_lasers or any(enemy.sprite_lists for enemy in deadly):
+			self.die()
+
+	#----TRIGGER HANDLERS----#
+
+	def collect_gem(self, zone):
+		"""the player touched a gem, in which case they gain an ability point"""
+		zone.sprite.remove_from_sprite_lists()
+		#count the gems collected so they can be recalled upon reset
+		self.ability_reset_count += 1
+		self.ability_count += 1
+
+	def reach_checkpoint(self, zone):
+		"""the player got to the checkpoint, so they start again from there"""
+		#coordinates should roughly be 2400, 992
+		checkpoint = self.checkpoint_list[0]
+		#the checkpoint is made of several tiles, only the first one reached counts
+		if (self.START_X, self.START_Y) == (checkpoint.center_x, checkpoint.center_y):
+			return
+		self.START_X = checkpoint.center_x
+		self.START_Y = checkpoint.center_y
+		self.log(f'checkpoint reached, start moved to {self.START_X}')
+		self.events.append('checkpoint')
+
+	def reach_objective(self, zone):
+		"""the player has found the objective and has won the game!"""
+		self.won = True
+		self.events.append('win')
+
+	def update_fluid(self, zone):
+		"""the player went into or out of some water, gravity changes while they are in it"""
+		self.in_fluid = self.triggers.touching("water") > 0
+		self.physics_engine.in_fluid = self.in_fluid
+
+	def update_activity(self):
+		"""
+		puts enemies far from the viewport to sleep and wakes the ones it comes
+		near, lasers that far out go back to their pools
+		"""
+		margin = self.activity_margin
+		left = self.view_left - margin
+		right = self.view_left + SCREEN_WIDTH + margin
+		bottom = self.view_bottom - margin
+		top = self.view_bottom + SCREEN_HEIGHT + margin
+		#a laser that flew this far is never coming back into view
+		for pool in (self.bullet_pool, self.enemy_laser_pool):
+			for laser in pool.store.outside(left, right, bottom, top):
+				pool.release(laser)
+		for store in (self.enemy_store, self.projectile_enemy_store):
+			asleep, woken = store.schedule(left, right, bottom, top, self.frame_count)
+			#sleeping enemies are never on screen, so their animations can stop too
+			for sprite in asleep:
+				if sprite in self.animator:
+					self.animator.pause(sprite)
+			for sprite in woken:
+				if sprite in self.animator:
+					self.animator.pause(sprite, False)
+
+	def update_animation(self, delta_time):
+		"""moves every animated sprite's frames on by delta_time"""
+		self.animator.update(delta_time)
+
+	def update_viewport(self):
+		"""scrolls the camera after the player and streams chunks around it"""
+		# Track if we need to change the viewport
+		changed = False
+
+        # Scroll left
+		left_boundary = self.view_left + LEFT_VIEWPORT_MARGIN
+		if self.player_sprite.left < left_boundary:
+			self.view_left -= left_boundary - self.player_sprite.left
+			changed = True
+
+        # Scroll right
+		right_boundary = self.view_left + SCREEN_WIDTH - RIGHT_VIEWPORT_MARGIN
+		if self.player_sprite.right > right_boundary:
+			self.view_left += self.player_sprite.right - right_boundary
+			changed = True
+
+		# Scroll up
+		top_boundary = self.view_bottom + SCREEN_HEIGHT - TOP_VIEWPORT_MARGIN
+		if self.player_sprite.top > top_boundary:
+			self.view_bottom += self.player_sprite.top - top_boundary
+			changed = True
+
+        # Scroll down
+		bottom_boundary = self.view_bottom + BOTTOM_VIEWPORT_MARGIN
+		if self.player_sprite.bottom < bottom_boundary:
+			self.view_bottom -= bottom_boundary - self.player_sprite.bottom
+			changed = True
+
+		if changed:
+            # Only scroll to integers. Otherwise we end up with pixels that
+            # don't line up on the screen, the window does the actual scrolling
+			self.view_bottom = int(self.view_bottom)
+			self.view_left = int(self.view_left)
+
+		#load the chunks around the new viewport and prefetch the ones the
+		#player is heading towards
+		if self.chunk_streamer:
+			self.chunk_streamer.update(self.view_left, self.view_bottom,
+									   self.player_sprite.change_x,
+									   self.player_sprite.change_y)